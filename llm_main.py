@@ -20,34 +20,34 @@ def parse_args():
     #===experiment===
     parser.add_argument('--model', type=str, default='gpt-3.5-turbo-0301')
     parser.add_argument('--max_episodes', type=int, default=1)
+    parser.add_argument('--num_envs', type=int, default=1, help='episodes played at once, each in its own worker process')
     args = parser.parse_args()
 
     return args
 
 
-if __name__ == "__main__":
-    args = parse_args()
-    
-    env = LLMEnvWrapper()
-    task_info = env.env_handler.config_loader.config.task
-    for episode in range(0, args.max_episodes):
-        obs, info = env.reset()
+class Episode:
+    def __init__(self, args, episode, info, task_info):
+        self.args = args
+        self.episode = episode
         agent_num = len(info)
+        self.agent_num = agent_num
         env_agent_name_list = []
         for key in info.keys():
             env_agent_name_list.append(key)
+        self.env_agent_name_list = env_agent_name_list
         if agent_num == 4:
             agent_name_list = ['carpenter_0','carpenter_1','miner_0','miner_1']
             player2name = {'player_0':'carpenter_0','player_1':'carpenter_1','player_2':'miner_0','player_3':'miner_1'}
         if agent_num == 8:
             agent_name_list = ['carpenter_0','carpenter_1','carpenter_2','carpenter_3','miner_0','miner_1','miner_2','miner_3']
             player2name = {'player_0':'carpenter_0','player_1':'carpenter_1','player_2':'carpenter_2','player_3':'carpenter_3','player_4':'miner_0','player_5':'miner_1','player_6':'miner_2','player_7':'miner_3'}
-        terminated_point = info[env_agent_name_list[0]]["max_length"] 
+        self.terminated_point = info[env_agent_name_list[0]]["max_length"] 
         agents = []
         physical_agents = []
-        pre_action = [0 for _ in range(agent_num)]
-        pre_position = [0 for _ in range(agent_num)]
-        reward_total = [0 for _ in range(agent_num)]
+        self.pre_action = [0 for _ in range(agent_num)]
+        self.pre_position = [0 for _ in range(agent_num)]
+        self.reward_total = [0 for _ in range(agent_num)]
         if "contract" in args.task_name:
             phase1_length = 5 * info[env_agent_name_list[0]]["group_num"]
             for agent_id in range(agent_num):
@@ -79,50 +79,91 @@ if __name__ == "__main__":
                 agent = PhysicalAgent(info=info[agent_name], task_info = task_info, agent_id=agent_id, agent_name=agent_name, agent_name_list=agent_name_list, env_agent_name_list = env_agent_name_list, player2name=player2name, task=args.task_name, model=args.model)
                 agent.reset()
                 physical_agents.append(agent)
+        self.agents = agents
+        self.physical_agents = physical_agents
+        self.phase1_length = phase1_length
 
-        for step in range(0, terminated_point):
-            if step == phase1_length:
-                agents = physical_agents
-            if step >= phase1_length:
+    def act(self, step, obs):
+        args, episode, phase1_length = self.args, self.episode, self.phase1_length
+        if step == phase1_length:
+            self.agents = self.physical_agents
+        if step >= phase1_length:
+            with open(f'{OUTPUT_DIR}output_{args.task_name}_physical_{episode}.txt', 'a', encoding='utf-8') as file:
+                print(step, file=file)
+        else:
+            with open(f'{OUTPUT_DIR}output_{args.task_name}_{episode}.txt', 'a', encoding='utf-8') as file:
+                print(step, file=file)
+        actions = {}
+        for agent_id in range(self.agent_num):
+            agent = self.agents[agent_id]
+            agent_name = agent.agent_name
+            llm_obs = agent.update_obs(obs[agent_name], self.pre_position, self.pre_action)
+            agent.update_policy(llm_obs)
+            action = agent.Action.action
+            agent.Action.new()
+
+            self.pre_action[agent_id] = copy.deepcopy(action)
+            self.pre_position[agent_id] = copy.deepcopy(llm_obs['current_pos'])
+            actions[agent_name] = action
+            if step >= phase1_length-1:
                 with open(f'{OUTPUT_DIR}output_{args.task_name}_physical_{episode}.txt', 'a', encoding='utf-8') as file:
-                    print(step, file=file)
+                    print(f"agent {agent.agent_name_list[agent.env_agent_name_list.index(agent_name)]}'s current plan is {agent.current_plan}",file=file)
+                    print(f"agent {agent.agent_name_list[agent.env_agent_name_list.index(agent_name)]}'s action is {action}",file=file)
             else:
                 with open(f'{OUTPUT_DIR}output_{args.task_name}_{episode}.txt', 'a', encoding='utf-8') as file:
-                    print(step, file=file)
-            actions = {}
-            for agent_id in range(agent_num):
-                agent = agents[agent_id]
-                agent_name = agent.agent_name
-                llm_obs = agent.update_obs(obs[agent_name], pre_position, pre_action)
-                agent.update_policy(llm_obs)
-                action = agent.Action.action
-                agent.Action.new()
+                    print(f"agent {agent.agent_name_list[agent.env_agent_name_list.index(agent_name)]}'s current plan is {agent.current_plan}",file=file)
+                    print(f"agent {agent.agent_name_list[agent.env_agent_name_list.index(agent_name)]}'s action is {action}",file=file)
+        return actions
 
-                pre_action[agent_id] = copy.deepcopy(action)
-                pre_position[agent_id] = copy.deepcopy(llm_obs['current_pos'])
-                actions[agent_name] = action
-                if step >= phase1_length-1:
-                    with open(f'{OUTPUT_DIR}output_{args.task_name}_physical_{episode}.txt', 'a', encoding='utf-8') as file:
-                        print(f"agent {agent.agent_name_list[agent.env_agent_name_list.index(agent_name)]}'s current plan is {agent.current_plan}",file=file)
-                        print(f"agent {agent.agent_name_list[agent.env_agent_name_list.index(agent_name)]}'s action is {action}",file=file)
-                else:
-                    with open(f'{OUTPUT_DIR}output_{args.task_name}_{episode}.txt', 'a', encoding='utf-8') as file:
-                        print(f"agent {agent.agent_name_list[agent.env_agent_name_list.index(agent_name)]}'s current plan is {agent.current_plan}",file=file)
-                        print(f"agent {agent.agent_name_list[agent.env_agent_name_list.index(agent_name)]}'s action is {action}",file=file)
-            next_obs, reward, terminated, truncated, info = env.step(actions)
-            obs = next_obs
-            for agent_id in range(agent_num):
-                reward_total[agent_id] += reward[env_agent_name_list[agent_id]]
-            if step >= phase1_length:
-                with open(f'{OUTPUT_DIR}output_{args.task_name}_physical_{episode}.txt', 'a', encoding='utf-8') as file:
-                    print("########## RESULT ###########",file=file)
-                    print("Step: ", step,file=file)
-                    print("Reward: ", reward,file=file)
+    def record(self, step, reward):
+        args, episode = self.args, self.episode
+        for agent_id in range(self.agent_num):
+            self.reward_total[agent_id] += reward[self.env_agent_name_list[agent_id]]
+        if step >= self.phase1_length:
+            with open(f'{OUTPUT_DIR}output_{args.task_name}_physical_{episode}.txt', 'a', encoding='utf-8') as file:
+                print("########## RESULT ###########",file=file)
+                print("Step: ", step,file=file)
+                print("Reward: ", reward,file=file)
+        else:
+            with open(f'{OUTPUT_DIR}output_{args.task_name}_{episode}.txt', 'a', encoding='utf-8') as file:
+                print("########## RESULT ###########",file=file)
+                print("Step: ", step,file=file)
+                print("Reward: ", reward,file=file)
+
+    def finish(self):
+        with open(f'{OUTPUT_DIR}output_{self.args.task_name}_physical_{self.episode}.txt', 'a', encoding='utf-8') as file:
+            print(f"eps {self.episode} final payoff {self.reward_total}",file=file)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    
+    # With --num_envs, episodes are played num_envs at a time in the worker processes of a ParallelEnvPool
+    env = LLMEnvWrapper(num_envs=args.num_envs) if args.num_envs > 1 else LLMEnvWrapper()
+    task_info = env.env_handler.config_loader.config.task
+    for first_episode in range(0, args.max_episodes, args.num_envs):
+        if args.num_envs > 1:
+            obs_list, info_list = env.reset()
+        else:
+            obs, info = env.reset()
+            obs_list, info_list = [obs], [info]
+        # The last round may use only some of the environments; the others stand still
+        episodes = [
+            Episode(args, episode, info, task_info)
+            for episode, info in zip(range(first_episode, args.max_episodes), info_list)
+        ]
+        terminated_point = episodes[0].terminated_point
+        for step in range(0, terminated_point):
+            actions = [episode.act(step, obs) for episode, obs in zip(episodes, obs_list)]
+            if args.num_envs > 1:
+                actions += [{} for _ in range(args.num_envs - len(episodes))]
+                obs_list, reward_list, terminated_list, truncated_list, info_list = env.step(actions)
             else:
-                with open(f'{OUTPUT_DIR}output_{args.task_name}_{episode}.txt', 'a', encoding='utf-8') as file:
-                    print("########## RESULT ###########",file=file)
-                    print("Step: ", step,file=file)
-                    print("Reward: ", reward,file=file)
+                next_obs, reward, terminated, truncated, info = env.step(actions[0])
+                obs_list, reward_list = [next_obs], [reward]
+            for episode, reward in zip(episodes, reward_list):
+                episode.record(step, reward)
 
-        with open(f'{OUTPUT_DIR}output_{args.task_name}_physical_{episode}.txt', 'a', encoding='utf-8') as file:
-            print(f"eps {episode} final payoff {reward_total}",file=file)
\ No newline at end of file
+        for episode in episodes:
+            episode.finish()
+    env.close()
@@ -8,6 +8,7 @@ import ray
 from ray.tune.logger import pretty_print, UnifiedLogger
 from ray.tune.registry import register_env
 from ray.rllib.algorithms.a3c import A3CConfig
+from ray.rllib.algorithms.callbacks import DefaultCallbacks
 from ray.rllib.algorithms.dqn import DQNConfig
 from ray.rllib.algorithms.ppo import PPOConfig, PPOTorchPolicy
 from ray.rllib.algorithms.r2d2 import R2D2Config, R2D2TorchPolicy
@@ -15,6 +16,8 @@ from ray.rllib.models import ModelCatalog
 from ray.rllib.policy.policy import PolicySpec
 
 from ..wrapper.rllib_env_wrapper import RllibEnvWrapper, get_spaces_and_model_config
+from ..wrapper.rllib_vector_env_wrapper import RllibVectorEnvWrapper
+from ...utils.task_cache import TaskCache
 from ..network.gnn_network import TorchGRNNModel, TorchGCNNModel
 from ..network.centralized_network import CentralizedCriticModel
 from ..policy import RandomPolicy, PPOProsocialPolicy, CCPPOTorchPolicy, DQNMaskTorchPolicy
@@ -24,14 +27,34 @@ ModelCatalog.register_custom_model('glstm_model', TorchGRNNModel)
 ModelCatalog.register_custom_model('centralized_model', CentralizedCriticModel)
 
 
+class StepOverlapCallbacks(DefaultCallbacks):
+    '''Reports how much of the env stepping the async vector env hid behind inference during every episode.'''
+    def on_episode_start(self, *, worker, base_env, policies, episode, **kwargs):
+        episode.user_data['step_timings'] = base_env.timings()
+
+    def on_episode_end(self, *, worker, base_env, policies, episode, **kwargs):
+        episode.custom_metrics['env_step_overlap'] = base_env.overlap(episode.user_data['step_timings'])
+
+
 def train(args):
     """contract training function"""
     env_name = "AdaSociety"
-    env_config = {'env_dir': args.env_dir}
-    register_env(env_name, lambda config: RllibEnvWrapper(config))
-    dummy_env = RllibEnvWrapper(env_config)
-    model_config_dict, obs_space_dict, action_space_dict = get_spaces_and_model_config(dummy_env, args)
     ray.init()
+    env_config = {
+        'env_dir': args.env_dir,
+        'world_pool_size': args.world_pool_size,
+        'replenish_world_pool': args.replenish_world_pool,
+        'obs_mode': args.obs_mode,
+        'reuse_buffers': args.reuse_buffers,
+        'async_step': args.async_step,
+        # Parsed once here, the rollout workers attach to it from the object store
+        'task_cache': ray.put(TaskCache(args.env_dir)),
+    }
+    if args.vector_env:
+        register_env(env_name, lambda config: RllibVectorEnvWrapper(config))
+    else:
+        register_env(env_name, lambda config: RllibEnvWrapper(config))
+    model_config_dict, obs_space_dict, action_space_dict = get_spaces_and_model_config(env_config, args)
 
     if args.lstm:
         player_model_name = 'glstm_model'
@@ -154,6 +177,8 @@ def train(args):
         policy_mapping_fn = policy_mapping_fn,
         policies_to_train = policies_to_train,
     )
+    if args.vector_env and args.async_step:
+        algo_config = algo_config.callbacks(StepOverlapCallbacks)
 
     def custom_logger_creator(config):
         timestr = datetime.today().strftime("%Y-%m-%d_%H-%M-%S")
@@ -1,17 +1,38 @@
 from ...env.environment import Environment
+from ...agent.env_handler import task_spaces
+from ...utils.task_cache import TaskCache
 from ray.rllib.env.multi_agent_env import MultiAgentEnv
 from gymnasium.spaces import Box
 from pydoc import locate
+import ray
+
+
+def get_task_cache(config):
+    '''The TaskCache of an env config, fetched from the Ray object store if put there.'''
+    task_cache = config.get('task_cache')
+    if isinstance(task_cache, ray.ObjectRef):
+        task_cache = ray.get(task_cache)
+    return task_cache
+
 
 class RllibEnvWrapper(MultiAgentEnv):
     def __init__(self, config) -> None:
-        self.env = Environment(config['env_dir'])
+        self.env = Environment(
+            config['env_dir'],
+            world_pool_size=config.get('world_pool_size', 0),
+            replenish_world_pool=config.get('replenish_world_pool', False),
+            obs_mode=config.get('obs_mode', 'dict'),
+            task_cache=get_task_cache(config),
+        )
         EnvHandler = locate(self.env.config_loader.task['env_handler'])
-        self.env_handler = EnvHandler(config['env_dir'])
+        self.env_handler = EnvHandler(
+            reuse_buffers=config.get('reuse_buffers', False),
+            config_loader=self.env.config_loader,
+        )
         self.get_spaces()
 
     def reset(self, *, seed=None, options=None):
-        obs, info = self.env.reset()
+        obs, info = self.env.reset(seed=seed, options=options)
         self.env_handler.on_reset(obs, info)
         obs_dict, _, _, _, info_dict = self.env_handler.on_update(obs, {}, {}, {}, info)
         return obs_dict, info_dict
@@ -23,19 +44,12 @@ class RllibEnvWrapper(MultiAgentEnv):
         return obs, reward, terminated, truncated, info
 
     def get_spaces(self):
-        dummy_env = Environment()
-        obs, info = dummy_env.reset()
-        self.env_handler.on_reset(obs, info)
-        self.observation_space = {
-            _id: agent.observation_space for _id, agent in self.env_handler.agent_dict.items()
-        }
-        self.action_space = {
-            _id: agent.action_space for _id, agent in self.env_handler.agent_dict.items()
-        }
-
-def get_spaces_and_model_config(dummy_env: MultiAgentEnv, args):
-    observation_space = dummy_env.observation_space
-    action_space = dummy_env.action_space
+        self.observation_space, self.action_space = task_spaces(self.env.config_loader.config, self.env.game_editor)
+
+def get_spaces_and_model_config(env_config, args):
+    # The spaces only need the task's config and map, not an environment
+    task_cache = get_task_cache(env_config) or TaskCache(env_config['env_dir'])
+    observation_space, action_space = task_spaces(task_cache.config, task_cache.game_editor())
     model_config_dict = {}
     for player, Dict_space in observation_space.items():
         model_config_dict[player] = {}
@@ -45,6 +59,6 @@ def get_spaces_and_model_config(dummy_env: MultiAgentEnv, args):
             model_config_dict[player][name + '_shape'] = space.shape
         model_config_dict[player]['lstm_state_size'] = args.lstm_state_size
         model_config_dict[player]['select_group'] = args.select_group
-        model_config_dict[player]['group_num'] = len(dummy_env.env.config_loader.config.task.static.social.groups)
+        model_config_dict[player]['group_num'] = len(task_cache.config.task.static.social.groups)
         model_config_dict[player]['player_num'] = len(observation_space)
     return model_config_dict, observation_space, action_space
\ No newline at end of file
@@ -0,0 +1,266 @@
+from ...env.environment import Environment
+from .rllib_env_wrapper import get_task_cache, task_spaces
+from ray.rllib.env.base_env import BaseEnv
+from concurrent.futures import ThreadPoolExecutor
+from pydoc import locate
+import time
+import numpy as np
+
+
+class RllibVectorEnvWrapper(BaseEnv):
+    '''
+    K games of one task behind RLlib's BaseEnv, stepped together. The games
+    share one parsed config, GameEditor and world pool, and their agents'
+    observations are stacked as (K, P, ...) arrays in `agent_ids` order, so
+    one step of all games hands out one array per observation key.
+    RLlib sizes the wrapper to `num_envs_per_worker` through `to_base_env`.
+
+    With `async_step`, the games are split in two halves polled in turn:
+    `send_actions` steps a half in a background thread while the policies
+    run on the other one, and `overlap` reports how much of the stepping
+    was hidden that way.
+    '''
+    def __init__(self, config, num_envs=None):
+        self.config = config
+        self.reuse_buffers = config.get('reuse_buffers', False)
+        self.envs = []
+        self.env_handlers = []
+        self.agent_ids = []
+        # Stacked observation buffers of every set of games polled together
+        self._buffers = {}
+        # Results of the last reset or step of every game, handed out by `poll`
+        self._ready = {}
+        # Games not reset yet, which wait for a seed until the first `poll`
+        self._fresh = []
+        self.async_step = config.get('async_step', False)
+        self._executor = ThreadPoolExecutor(max_workers=1) if self.async_step else None
+        self._pending = {}
+        self._group = 0
+        self.step_time = 0.0
+        self.wait_time = 0.0
+        self._seed = None
+        self.resize(num_envs or config.get('num_envs', 1))
+        self.get_spaces()
+
+    @property
+    def num_envs(self):
+        return len(self.envs)
+
+    def resize(self, num_envs):
+        template = self.envs[0] if self.envs else None
+        task_cache = get_task_cache(self.config) if template is None else None
+        while len(self.envs) < num_envs:
+            env = Environment(
+                self.config['env_dir'],
+                world_pool_size=self.config.get('world_pool_size', 0),
+                replenish_world_pool=self.config.get('replenish_world_pool', False),
+                obs_mode=self.config.get('obs_mode', 'dict'),
+                template=template,
+                task_cache=task_cache,
+            )
+            template = template or env
+            EnvHandler = locate(env.config_loader.task['env_handler'])
+            # The stacked arrays are copies, so the agents can always fill the same buffers
+            self.envs.append(env)
+            self.env_handlers.append(EnvHandler(reuse_buffers=True, config_loader=env.config_loader))
+            self._fresh.append(len(self.envs) - 1)
+        self.agent_ids = list(self.envs[0].static_infos())
+        self._buffers = {}
+
+    def to_base_env(self, make_env=None, num_envs=1, **kwargs):
+        self.resize(num_envs)
+        return self
+
+    def get_spaces(self):
+        env = self.envs[0]
+        self._observation_space, self._action_space = task_spaces(env.config_loader.config, env.game_editor)
+
+    @property
+    def observation_space(self):
+        return self._observation_space
+
+    @property
+    def action_space(self):
+        return self._action_space
+
+    def get_agent_ids(self):
+        return set(self.agent_ids)
+
+    def reset(self, *, seed=None, options=None):
+        '''
+        Resets every game, the k-th one from `seed + k`. RLlib seeds the
+        wrapper this way and then starts sampling from `poll`, so the first
+        `poll` hands out the same observations.
+        '''
+        self._seed = seed
+        self._reset(range(self.num_envs), seed=seed, options=options)
+        obs, *_ = self._results(sorted(self._ready), keep=True)
+        return obs, {env_id: {} for env_id in obs}
+
+    def try_reset(self, env_id=None, *, seed=None, options=None):
+        if env_id is None:
+            env_ids = list(range(self.num_envs))
+        elif isinstance(env_id, int):
+            env_ids = [env_id]
+        else:
+            env_ids = list(env_id)
+        self._reset(env_ids, seed=seed, options=options)
+        obs, *_ = self._results(env_ids)
+        return obs, {env_id: {} for env_id in obs}
+
+    def poll(self):
+        if self._fresh:
+            self._reset(list(self._fresh), seed=self._seed)
+        env_ids = sorted(self._ready) if self._executor is None else self._next_group()
+        obs, rewards, terminateds, truncateds = self._results(env_ids)
+        infos = {env_id: {} for env_id in obs}
+        return obs, rewards, terminateds, truncateds, infos, {}
+
+    def send_actions(self, action_dict):
+        for env_id, actions in action_dict.items():
+            action_ids = [actions[_id] for _id in self.agent_ids]
+            if self._executor is None:
+                self._step(env_id, action_ids)
+            else:
+                self._pending[env_id] = self._executor.submit(self._step, env_id, action_ids)
+
+    def timings(self):
+        '''Seconds spent stepping the games, and waiting for them in `poll`, so far.'''
+        return self.step_time, self.wait_time
+
+    def overlap(self, since=(0.0, 0.0)):
+        '''
+        Share of the stepping time hidden behind the policies in async mode
+        since the `timings` of `since`: 1 if `poll` never waited for a game,
+        0 if it waited for all of it.
+        '''
+        step_time = self.step_time - since[0]
+        if not step_time:
+            return 0.0
+        return max(0.0, 1 - (self.wait_time - since[1]) / step_time)
+
+    def step_batch(self, action_ids):
+        '''
+        Steps every game with a (K, P) array of action ids. Returns every
+        observation key as one (K, P, ...) array, and (K, P) reward,
+        terminated and truncated arrays, where all players of a game that
+        ended are terminated and truncated. Games stepped in the background
+        would race with it, so it is not available with `async_step`.
+        '''
+        if self._executor is not None:
+            raise RuntimeError('step_batch steps the games synchronously, which async_step does not allow')
+        for env_id, actions in enumerate(action_ids):
+            self._step(env_id, actions)
+        results = self._take(range(self.num_envs))
+        obs, reward, terminated, truncated = self._stack(results, tuple(range(self.num_envs)))
+        ended = np.array([result[4:] for result in results], dtype=bool)
+        return obs, reward, terminated | ended[:, :1], truncated | ended[:, 1:]
+
+    def policy_batches(self, obs, policy_mapping_fn):
+        '''
+        Regroups stacked (K, P, ...) observations per policy. Every policy
+        gets the columns of its agents, and their observations flattened to
+        (K * len(columns), ...) game by game, ready for one forward pass.
+        '''
+        columns = {}
+        for p, _id in enumerate(self.agent_ids):
+            columns.setdefault(policy_mapping_fn(_id, None, None), []).append(p)
+        return {
+            policy_id: (cols, {
+                key: array[:, cols].reshape(-1, *array.shape[2:]) for key, array in obs.items()
+            }) for policy_id, cols in columns.items()
+        }
+
+    def get_sub_environments(self, as_dict=False):
+        if as_dict:
+            return dict(enumerate(self.envs))
+        return list(self.envs)
+
+    def try_render(self, env_id=None):
+        return self.envs[env_id or 0].render()
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self.envs and self.envs[0].world_pool is not None:
+            self.envs[0].world_pool.close()
+
+    def _next_group(self):
+        # The half of the games whose turn it is, once none of them is still stepping
+        for _ in range(2):
+            group = [
+                env_id for env_id in range(self._group, self.num_envs, 2)
+                if env_id in self._ready or env_id in self._pending
+            ]
+            self._group = 1 - self._group
+            if group:
+                start = time.perf_counter()
+                for env_id in group:
+                    if env_id in self._pending:
+                        self._pending.pop(env_id).result()
+                self.wait_time += time.perf_counter() - start
+                return group
+        return []
+
+    def _reset(self, env_ids, seed=None, options=None):
+        for env_id in env_ids:
+            if env_id in self._pending:
+                # A game still stepping in the background finishes its step before it is reset
+                start = time.perf_counter()
+                self._pending.pop(env_id).result()
+                self.wait_time += time.perf_counter() - start
+            env, env_handler = self.envs[env_id], self.env_handlers[env_id]
+            obs, info = env.reset(seed=None if seed is None else seed + env_id, options=options)
+            env_handler.on_reset(obs, info)
+            if env_id in self._fresh:
+                self._fresh.remove(env_id)
+            assert env_handler.agent_ids == self.agent_ids, 'games of one task must have the same agents'
+            self._ready[env_id] = (*env_handler.on_update_batch(obs, {}, {}, {}, info)[:4], False, False)
+
+    def _step(self, env_id, action_ids):
+        start = time.perf_counter()
+        env, env_handler = self.envs[env_id], self.env_handlers[env_id]
+        obs, reward, terminated, truncated, info = env.step(env_handler.on_predict_batch(action_ids))
+        # The episode ends with the game, whatever the players' flags
+        self._ready[env_id] = (
+            *env_handler.on_update_batch(obs, reward, terminated, truncated, info)[:4],
+            terminated['__all__'],
+            truncated['__all__'],
+        )
+        self.step_time += time.perf_counter() - start
+
+    def _take(self, env_ids, keep=False):
+        if keep:
+            return [self._ready[env_id] for env_id in env_ids]
+        return [self._ready.pop(env_id) for env_id in env_ids]
+
+    def _stack(self, results, env_ids):
+        # Every observation key of the games as one array, a fresh one unless
+        # the caller asked for reused buffers, kept for every set of games
+        if self.reuse_buffers and env_ids not in self._buffers:
+            self._buffers[env_ids] = {
+                key: np.empty((len(env_ids), *array.shape), dtype=array.dtype) for key, array in results[0][0].items()
+            }
+        buffers = self._buffers.get(env_ids, {})
+        obs = {
+            key: np.stack([result[0][key] for result in results], out=buffers.get(key))
+            for key in results[0][0]
+        }
+        reward, terminated, truncated = (np.stack([result[i] for result in results]) for i in (1, 2, 3))
+        return obs, reward, terminated, truncated
+
+    def _results(self, env_ids, keep=False):
+        # MultiEnvDicts of per-agent views of the stacked arrays
+        if not env_ids:
+            return {}, {}, {}, {}
+        results = self._take(env_ids, keep=keep)
+        obs, reward, terminated, truncated = self._stack(results, tuple(env_ids))
+        obs_dict, reward_dict, terminated_dict, truncated_dict = {}, {}, {}, {}
+        for k, (env_id, result) in enumerate(zip(env_ids, results)):
+            obs_dict[env_id] = {
+                _id: {key: array[k, p] for key, array in obs.items()} for p, _id in enumerate(self.agent_ids)
+            }
+            reward_dict[env_id] = dict(zip(self.agent_ids, reward[k].tolist()))
+            terminated_dict[env_id] = dict(zip(self.agent_ids, terminated[k].tolist()), __all__=bool(result[4]))
+            truncated_dict[env_id] = dict(zip(self.agent_ids, truncated[k].tolist()), __all__=bool(result[5]))
+        return obs_dict, reward_dict, terminated_dict, truncated_dict
@@ -0,0 +1,32 @@
+import numpy as np
+
+
+def gather_agents(agents, ref_point):
+    '''
+    Stacks what the masks of every agent depend on: the channels of the cell
+    each agent stands on (always `ref_point` of its egocentric grid), and the
+    (P, R) inventory and capacity matrices.
+    '''
+    here = np.array([agent.obs['grid_observation'][:, ref_point[0], ref_point[1]] for agent in agents])
+    inventories = np.array([agent.obs['inventory'] for agent in agents])
+    capacities = np.array([agent.state.my_resource_capacity for agent in agents])
+    return here, inventories, capacities
+
+
+def physical_action_masks(here, inventories, capacities, out):
+    '''Writes the move, produce, pick and dump columns (the first 6 + 2 * R) of every mask.'''
+    resource_num = inventories.shape[1]
+    event_here = here[:, 2:2 + resource_num]
+    resource_here = here[:, 2 + resource_num:2 + 2 * resource_num]
+    out[:, :5] = 1
+    out[:, 5] = event_here.any(axis=1) & (event_here + inventories <= capacities).all(axis=1)
+    out[:, 6:6 + resource_num] = (resource_here > 0) & (inventories < capacities)
+    out[:, 6 + resource_num:6 + 2 * resource_num] = inventories > 0
+    return out
+
+
+def zeroed(out, shape):
+    if out is None:
+        return np.zeros(shape, dtype=np.int8)
+    out.fill(0)
+    return out
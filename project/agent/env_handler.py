@@ -1,24 +1,77 @@
 # from .agent import Agent
 from ..utils.config_loader import ConfigLoader 
+from .mdp.action import Action
+from ..env.environment import static_infos
 from pydoc import locate
+import hashlib
+import json
+import numpy as np
+
+# Spaces of every task config met in this process, by config hash
+_task_spaces = {}
+
+
+def task_spaces(config, game_editor):
+    '''
+    Observation and action spaces of every agent of a task, derived from its
+    config and the layout of its GameEditor without building an environment
+    or generating a world, and cached by config hash.
+    '''
+    key = hashlib.md5(json.dumps(config, sort_keys=True).encode()).hexdigest()
+    if key not in _task_spaces:
+        AgentClass = locate(config['task']['agent'])
+        agent_dict = {
+            _id: AgentClass(_id=_id, env_info=env_info, task_info=config.task)
+            for _id, env_info in static_infos(config, game_editor).items()
+        }
+        _task_spaces[key] = (
+            {_id: agent.observation_space for _id, agent in agent_dict.items()},
+            {_id: agent.action_space for _id, agent in agent_dict.items()},
+        )
+    return _task_spaces[key]
+
 
 class EnvHandler:
-    def __init__(self, config_name='./config/main.json'):
-        self.config_loader = ConfigLoader(config_name)
+    def __init__(self, config_name='./config/main.json', reuse_buffers=False, config_loader=None):
+        # Handlers of the same task can share an already parsed config
+        self.config_loader = ConfigLoader(config_name) if config_loader is None else config_loader
+        # Agents fill the same observation arrays every step, which callers must copy to keep
+        self.reuse_buffers = reuse_buffers
         self.AgentClass = locate(self.config_loader.task['agent'])
         self.agent_dict: dict[str, self.AgentClass] = {}
+        # Agent classes with an `action_masks` staticmethod get the masks of a step computed together
+        self.batch_action_mask = hasattr(self.AgentClass, 'action_masks')
+        self.action_masks = None
+        self._mask_ids = []
+        self._mask_buffer = None
+        # Agent order of the batched API, and the decoded physical actions
+        self.agent_ids = []
+        self.action_table = []
+        self.action_codes = None
+        self._batch_buffers = None
 
     def on_reset(
         self,
         observations,
         infos,
     ):
+        kwargs = {'reuse_buffers': True} if self.reuse_buffers else {}
         for _id, obs in observations.items():
             self.agent_dict[_id] = self.AgentClass(
                 _id=_id,
                 env_info=infos[_id],
                 task_info=self.config_loader.config.task,
+                **kwargs,
             )
+            self.agent_dict[_id].batch_action_mask = self.batch_action_mask
+        self._mask_ids = list(observations)
+        self._mask_buffer = None
+        self.agent_ids = list(observations)
+        env_info = infos[self.agent_ids[0]]
+        self.action_table = Action.physical_actions(env_info['resource_name'])
+        if 'resource_ids' in env_info:
+            self.action_codes = Action.physical_codes(env_info['resource_ids'])
+        self._batch_buffers = None
 
     def on_update(
         self,
@@ -43,12 +96,35 @@ class EnvHandler:
                 info,   
             )
             state_dict[_id] = agent.get_state()
+        if self.batch_action_mask and state_dict:
+            self.update_action_masks(state_dict)
         reward_dict = rewards
         terminated_dict = terminateds
         truncated_dict = truncateds
         info_dict = infos
         return state_dict, reward_dict, terminated_dict, truncated_dict, {}
 
+    def update_action_masks(self, state_dict):
+        '''
+        Computes the (P, action_dim) int8 masks of every agent in `state_dict`
+        at once, and hands each agent its row.
+        '''
+        ids = list(state_dict)
+        agents = [self.agent_dict[_id] for _id in ids]
+        if not self.reuse_buffers or ids != self._mask_ids:
+            self.action_masks = self.AgentClass.action_masks(agents)
+            rows = self.action_masks
+        elif self._mask_buffer is None:
+            # The rows handed out stay the same arrays from step to step
+            self._mask_buffer = self.action_masks = self.AgentClass.action_masks(agents)
+            rows = self._mask_rows = list(self._mask_buffer)
+        else:
+            self.action_masks = self.AgentClass.action_masks(agents, out=self._mask_buffer)
+            rows = self._mask_rows
+        for _id, row in zip(ids, rows):
+            state_dict[_id]['action_mask'] = row
+        return self.action_masks
+
     def on_predict(self, policy_dict):
         action_dict = {}
         for _id, policy in policy_dict.items():
@@ -57,5 +133,58 @@ class EnvHandler:
             action_dict[_id] = agent.get_action()
         return action_dict
 
+    def on_update_batch(
+        self,
+        observations,
+        rewards={},
+        terminateds={},
+        truncateds={},
+        infos={},
+    ):
+        '''
+        on_update with the outputs stacked in `agent_ids` order: every
+        observation key as one (P, ...) array, and (P,) reward, terminated and
+        truncated vectors.
+        '''
+        state_dict, *_ = self.on_update(observations, rewards, terminateds, truncateds, infos)
+        states = [state_dict[_id] for _id in self.agent_ids]
+        if self._batch_buffers is None:
+            obs = {key: np.stack([state[key] for state in states]) for key in states[0]}
+            if self.reuse_buffers:
+                self._batch_buffers = obs
+        else:
+            obs = self._batch_buffers
+            for key, out in obs.items():
+                np.stack([state[key] for state in states], out=out)
+        reward = self._vector(rewards, 0, np.float64)
+        terminated = self._vector(terminateds, False, bool)
+        truncated = self._vector(truncateds, False, bool)
+        return obs, reward, terminated, truncated, {}
+
+    def _vector(self, values, default, dtype):
+        return np.array([values.get(_id, default) for _id in self.agent_ids], dtype=dtype)
+
+    def on_predict_batch(self, action_ids):
+        '''
+        on_predict for a (P,) array of action ids in `agent_ids` order.
+        When every action is physical, returns their (P, ACTION_WIDTH) integer
+        action codes, which Environment.step runs without decoding. Otherwise
+        physical actions are looked up in `action_table`, and the others are
+        decoded by their agents.
+        '''
+        action_ids = np.asarray(action_ids)
+        table_size = len(self.action_table)
+        if self.action_codes is not None and (action_ids < table_size).all():
+            return self.action_codes[action_ids]
+        action_dict = {}
+        for _id, action_id in zip(self.agent_ids, action_ids.tolist()):
+            if action_id < table_size:
+                action_dict[_id] = [self.action_table[action_id]]
+            else:
+                agent = self.agent_dict[_id]
+                agent.update_policy(action_id)
+                action_dict[_id] = agent.get_action()
+        return action_dict
+
     def on_close(self):
         return
\ No newline at end of file
@@ -1,3 +1,7 @@
+import numpy as np
+
+from ...env.player import ACTION_WIDTH, DUMP, PICK, PRODUCE
+
 class Action:
     def __init__(self, _id, env_info, task_info):
         self.resource_name = env_info['resource_name']
@@ -39,6 +43,34 @@ class Action:
     
     def new(self):
         self.action = []
+
+    @staticmethod
+    def physical_actions(resource_name):
+        '''
+        Decoded action of every physical action id, which is the same for all
+        agents: [move * 4, no_act, produce, pick * R, dump * R].
+        '''
+        return (
+            ["move_up", "move_down", "move_left", "move_right", "no_act", 'produce']
+            + [('pick_by_name', {'resource_name': name}) for name in resource_name]
+            + [('dump_by_name', {'resource_name': name}) for name in resource_name]
+        )
+
+    @staticmethod
+    def physical_codes(resource_ids):
+        '''
+        (6 + 2 * R, ACTION_WIDTH) int32 action codes of the physical action ids,
+        `resource_ids` being the ids of the agents' resources in the game.
+        '''
+        resource_num = len(resource_ids)
+        codes = np.zeros((6 + 2 * resource_num, ACTION_WIDTH), dtype=np.int32)
+        # Move and no_act opcodes follow the action ids
+        codes[:PRODUCE, 0] = np.arange(PRODUCE)
+        codes[PRODUCE, 0] = PRODUCE
+        codes[6:6 + resource_num, 0] = PICK
+        codes[6 + resource_num:, 0] = DUMP
+        codes[6:, 1] = np.tile(resource_ids, 2)
+        return codes
         
     def get_action(self):
         return self.action
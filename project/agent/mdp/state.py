@@ -21,6 +21,8 @@ class State:
         self.obs_height = self.obs_range[0]*2 + 1
         self.obs_width = self.obs_range[1]*2 + 1
         self._node2id = self.get_node_id(env_info.get('nodes', []))
+        self._build_event_table()
+        self.buffers = None
 
         # self.obs_dict = {self._id: self.observation_space.sample()}
 
@@ -31,78 +33,145 @@ class State:
         no_mod_pos = pos - self._my_pos + ref_point
         return no_mod_pos % np.array(self.map_size)
 
-    def player_toarray(self, player_list, ref_point=None, obs_size=None):
+    def _window(self, ref_point, obs_size):
         if obs_size is None:
             obs_size = np.array([self.obs_height, self.obs_width])
         if ref_point is None:
             ref_point = np.array([obs_size[0]//2, obs_size[1]//2])
+        return ref_point, obs_size
 
-        player_layer = np.zeros((1, obs_size[0], obs_size[1]), dtype=np.int16)
-        player_layer[0, ref_point[0], ref_point[1]] = self._id + 1
-        for player in player_list:
-            x, y = self._relative_pos(player['position'], ref_point)
-            if 0 <= x < obs_size[0] and 0 <= y < obs_size[1]:
-                player_layer[0, x, y] = player['id'] + 1
-        return player_layer
-    
-    def block_list_toarray(self, position_list, block_list, ref_point=None, obs_size=None):
-        if obs_size is None:
-            obs_size = np.array([self.obs_height, self.obs_width])
-        if ref_point is None:
-            ref_point = np.array([obs_size[0]//2, obs_size[1]//2])
+    def _window_index(self, positions, ref_point, obs_size):
+        '''Rows and columns of the positions inside the window, and the mask of those positions.'''
+        relative = (positions - self._my_pos + ref_point) % np.array(self.map_size)
+        inside = (relative < np.asarray(obs_size)).all(axis=1)
+        return relative[inside, 0], relative[inside, 1], inside
+
+    def _build_event_table(self):
+        # Resource change of every event (-in, then out), and which resources it sets.
+        # Resources missing from the map are skipped, their events never show up.
+        names = list(self.event_list)
+        self._event2id = dict(zip(names, range(len(names))))
+        self._event_table = np.zeros((len(names), self.resource_num), dtype=np.int16)
+        self._event_sets = np.zeros((len(names), self.resource_num), dtype=bool)
+        for i, name in enumerate(names):
+            for key, sign in (('in', -1), ('out', 1)):
+                for resource_name, amount in self.event_list[name][key].items():
+                    if resource_name not in self._resource2id:
+                        continue
+                    self._event_table[i, self._resource2id[resource_name]] = sign * amount
+                    self._event_sets[i, self._resource2id[resource_name]] = True
+
+    @staticmethod
+    def _positions(item_list):
+        return np.array([item['position'] for item in item_list], dtype=np.int64).reshape(-1, 2)
+
+    def player_columns(self, player_list):
+        ids = np.array([player['id'] for player in player_list], dtype=np.int16)
+        return self._positions(player_list), ids
+
+    def event_columns(self, event_list):
+        ids = np.array([self._event2id[event['name']] for event in event_list], dtype=np.int64)
+        return self._positions(event_list), ids
+
+    def resource_columns(self, resource_list):
+        ids = np.array([self._resource2id[resource['name']] for resource in resource_list], dtype=np.int64)
+        amounts = np.array([resource['amount'] for resource in resource_list], dtype=np.int64)
+        return self._positions(resource_list), ids, amounts
+
+    def write_players(self, out, positions, ids, ref_point, obs_size):
+        out[0, ref_point[0], ref_point[1]] = self._id + 1
+        x, y, inside = self._window_index(positions, ref_point, obs_size)
+        out[0, x, y] = ids[inside] + 1
+        return out
+
+    def write_events(self, out, positions, ids, ref_point, obs_size):
+        x, y, inside = self._window_index(positions, ref_point, obs_size)
+        ids = ids[inside]
+        # Later events only overwrite the resources they set
+        for resource_id in range(self.resource_num):
+            sets = self._event_sets[ids, resource_id]
+            out[resource_id, x[sets], y[sets]] = self._event_table[ids[sets], resource_id]
+        return out
 
-        block_layer = np.zeros((len(position_list), self.map_size[0], self.map_size[1]), dtype=np.int16)
-        for i, pos in enumerate(position_list):
-            x, y = pos - self._my_pos + np.array([self.map_size[0]//2, self.map_size[1]//2])
-            obs_x, obs_y = block_list[i].shape
+    def write_resources(self, out, positions, ids, amounts, ref_point, obs_size):
+        x, y, inside = self._window_index(positions, ref_point, obs_size)
+        np.add.at(out, (ids[inside], x, y), amounts[inside])
+        return out
+
+    def player_toarray(self, player_list, ref_point=None, obs_size=None, out=None):
+        ref_point, obs_size = self._window(ref_point, obs_size)
+        if out is None:
+            out = np.zeros((1, obs_size[0], obs_size[1]), dtype=np.int16)
+        else:
+            out.fill(0)
+        return self.write_players(out, *self.player_columns(player_list), ref_point, obs_size)
+
+    def block_list_toarray(self, position_list, block_list, ref_point=None, obs_size=None, out=None):
+        ref_point, obs_size = self._window(ref_point, obs_size)
+        center = np.array([self.map_size[0]//2, self.map_size[1]//2])
+        # Union of the shared views on one map centered on this player
+        blocked = np.zeros((self.map_size[0], self.map_size[1]), dtype=bool)
+        for pos, block in zip(position_list, block_list):
+            x, y = pos - self._my_pos + center
+            obs_x, obs_y = block.shape
             rows = np.arange(x - obs_x // 2, x + (obs_x + 1) // 2) % self.map_size[0]
             cols = np.arange(y - obs_y // 2, y + (obs_y + 1) // 2) % self.map_size[1]
-            mesh = np.meshgrid(rows, cols)
-            block_layer[i, mesh[0].T, mesh[1].T] = block_list[i]
+            blocked[np.ix_(rows, cols)] |= block > 0
 
-        block_layer = np.any(block_layer > 0, axis=0).astype(np.int16)
         rows = np.arange(self.map_size[0]//2 - obs_size[0] // 2, ref_point[0] + (obs_size[0] + 1) // 2) % self.map_size[0]
         cols = np.arange(self.map_size[1]//2 - obs_size[1] // 2, ref_point[1] + (obs_size[1] + 1) // 2) % self.map_size[1]
-        return block_layer[rows][:, cols]
+        if out is None:
+            return blocked[np.ix_(rows, cols)].astype(np.int16)
+        out[...] = blocked[np.ix_(rows, cols)]
+        return out
 
-    def event_toarray(self, event_list, ref_point=None, obs_size=None):
-        if obs_size is None:
-            obs_size = np.array([self.obs_height, self.obs_width])
-        if ref_point is None:
-            ref_point = np.array([obs_size[0]//2, obs_size[1]//2])
+    def event_toarray(self, event_list, ref_point=None, obs_size=None, out=None):
+        ref_point, obs_size = self._window(ref_point, obs_size)
+        if out is None:
+            out = np.zeros((self.resource_num, obs_size[0], obs_size[1]), dtype=np.int16)
+        else:
+            out.fill(0)
+        return self.write_events(out, *self.event_columns(event_list), ref_point, obs_size)
 
-        event_layer = np.zeros((self.resource_num, obs_size[0], obs_size[1]), dtype=np.int16)
-        for event in event_list:
-            x, y = self._relative_pos(event['position'], ref_point)
-            name = event['name']
-            if 0 <= x < obs_size[0] and 0 <= y < obs_size[1]:
-                for input_resource_name, input_resource_amount in self.event_list[name]['in'].items():
-                    event_layer[self._resource2id[input_resource_name], x, y] = - input_resource_amount
-                for output_resource_name, output_resource_amount in self.event_list[name]['out'].items():
-                    event_layer[self._resource2id[output_resource_name], x, y] = output_resource_amount
-        return event_layer
-
-    def resource_toarray(self, resource_list, ref_point=None, obs_size=None):
-        if obs_size is None:
-            obs_size = np.array([self.obs_height, self.obs_width])
-        if ref_point is None:
-            ref_point = np.array([obs_size[0]//2, obs_size[1]//2])
+    def resource_toarray(self, resource_list, ref_point=None, obs_size=None, out=None):
+        ref_point, obs_size = self._window(ref_point, obs_size)
+        if out is None:
+            out = np.zeros((self.resource_num, obs_size[0], obs_size[1]), dtype=np.int16)
+        else:
+            out.fill(0)
+        return self.write_resources(out, *self.resource_columns(resource_list), ref_point, obs_size)
 
-        resource_layer = np.zeros((self.resource_num, obs_size[0], obs_size[1]), dtype=np.int16)
-        for resource in resource_list:
-            x, y = self._relative_pos(resource['position'], ref_point)
-            if 0 <= x < obs_size[0] and 0 <= y < obs_size[1]:
-                resource_layer[self._resource2id[resource['name']], x, y] += resource['amount']
-        return resource_layer
-
-    def inventory_toarray(self, inventory_list):
-        inventory = np.zeros((self.resource_num, ), dtype=np.int16)
-        for resource in inventory_list:
-            inventory[self._resource2id[resource['name']]] += resource['amount']
-        return inventory
-
-    def words_toarray(self, communication_list):
-        words_array = np.zeros((self.player_num, self.communication_length), dtype = np.int8)
+    def inventory_toarray(self, inventory_list, out=None):
+        if out is None:
+            out = np.zeros((self.resource_num, ), dtype=np.int16)
+        else:
+            out.fill(0)
+        ids = np.array([self._resource2id[resource['name']] for resource in inventory_list], dtype=np.int64)
+        amounts = np.array([resource['amount'] for resource in inventory_list], dtype=np.int64)
+        np.add.at(out, ids, amounts)
+        return out
+
+    def grid_toarray(self, player_list, position_list, block_list, event_list, resource_list, ref_point=None, obs_size=None, out=None):
+        '''
+        Writes the player, block, event and resource layers of the window in
+        one (2 + 2 * resource_num, *obs_size) int16 buffer.
+        '''
+        ref_point, obs_size = self._window(ref_point, obs_size)
+        if out is None:
+            out = np.zeros((2 + 2*self.resource_num, obs_size[0], obs_size[1]), dtype=np.int16)
+        events = 2 + self.resource_num
+        self.player_toarray(player_list, ref_point, obs_size, out=out[0:1])
+        self.block_list_toarray(position_list, block_list, ref_point, obs_size, out=out[1])
+        self.event_toarray(event_list, ref_point, obs_size, out=out[2:events])
+        self.resource_toarray(resource_list, ref_point, obs_size, out=out[events:])
+        return out
+
+    def words_toarray(self, communication_list, out=None):
+        if out is None:
+            words_array = np.zeros((self.player_num, self.communication_length), dtype = np.int8)
+        else:
+            words_array = out
+            words_array.fill(0)
         for comm in communication_list:
             if 'words' in comm.keys():
                 from_id = comm['from']
@@ -110,6 +179,37 @@ class State:
                 words_array[from_id] = content
         return words_array
 
+    def player_id_toarray(self, length, out=None):
+        if out is None:
+            out = np.zeros((length,), dtype=np.int8)
+        else:
+            out.fill(0)
+        out[self._id] = 1
+        return out
+
+    def time_toarray(self, step_id, out=None):
+        if out is None:
+            return np.array([step_id])
+        out[0] = step_id
+        return out
+
+    def allocate_buffers(self, observation_space):
+        '''
+        Gives every key of the observation space one array that the processing
+        functions fill in place, instead of allocating new arrays every step.
+        The arrays handed out are overwritten by the next update.
+        '''
+        self.buffers = {
+            key: np.zeros(space.shape, dtype=space.dtype) for key, space in observation_space.spaces.items()
+        }
+        return self.buffers
+
+    def buffer(self, key):
+        '''Preallocated array for `key`, or None when every step allocates new arrays.'''
+        if self.buffers is None:
+            return None
+        return self.buffers[key]
+
     def get_node_id(self, node_list):
         node2id = {}
         for i, node in enumerate(node_list):
@@ -133,6 +233,10 @@ class State:
             adj_matrix[from_id, to_id] = 1
         return adj_matrix.T
 
+    def social_snapshot2adj(self, snapshot):
+        # Computed once per step by the snapshot and shared read-only by every player
+        return snapshot.adjacency(self._node2id).T
+
     def social_state2nx(self, edge_list):
         G = nx.DiGraph()
         for edge in edge_list:
@@ -169,17 +273,54 @@ class State:
                 for ply in player_list:
                     if ply['id'] == player_id:
                         position_list.append(ply['position'])
-        player_layer = self.player_toarray(player_list, obs_size=self.map_size)
-        block_layer = self.block_list_toarray(position_list, block_list, obs_size=self.map_size)[np.newaxis, :, :]
-        event_layer = self.event_toarray(event_list, obs_size=self.map_size)
-        resource_layer = self.resource_toarray(resource_list, obs_size=self.map_size)
-        update_obs['grid_observation'] = np.concatenate((player_layer, block_layer, event_layer, resource_layer),axis = 0)
-        update_obs['inventory'] = self.inventory_toarray(obs['Player']['inventory'])
-        update_obs['communication'] = self.words_toarray(obs['Social']['communications'])
-        update_obs['social_state'] = self.social_state2adj(obs['Social']['global']['edges'])
-        update_obs['time'] = np.array([obs['step_id']])
+        update_obs['grid_observation'] = self.grid_toarray(
+            player_list, position_list, block_list, event_list, resource_list,
+            obs_size=self.map_size, out=self.buffer('grid_observation'),
+        )
+        update_obs['inventory'] = self.inventory_toarray(obs['Player']['inventory'], out=self.buffer('inventory'))
+        self._process_social(obs, update_obs)
+        return update_obs
+
+    def process_window_obs(self, obs):
+        '''Same as process_obs with the grid of the player's field of view, without sharing.'''
+        update_obs = {}
+        self.update_my_pos(obs['Player']['position'])
+        grid = self.buffer('grid_observation')
+        if grid is None:
+            grid = np.zeros((2 + 2*self.resource_num, self.obs_height, self.obs_width), dtype=np.int16)
+        events = 2 + self.resource_num
+        self.player_toarray(obs['Map']['players'], out=grid[0:1])
+        grid[1] = obs['Map']['block_grids']
+        self.event_toarray(obs['Map']['events'], out=grid[2:events])
+        self.resource_toarray(obs['Map']['resources'], out=grid[events:])
+        update_obs['grid_observation'] = grid
+        update_obs['inventory'] = self.inventory_toarray(obs['Player']['inventory'], out=self.buffer('inventory'))
+        self._process_social(obs, update_obs)
         return update_obs
 
+    def process_tensor_obs(self, obs):
+        '''Same as process_obs for observations that already carry the grid and inventory tensors.'''
+        update_obs = {}
+        if self.buffers is None:
+            update_obs['grid_observation'] = obs['grid_observation']
+            update_obs['inventory'] = obs['inventory']
+        else:
+            update_obs['grid_observation'] = self.buffers['grid_observation']
+            update_obs['inventory'] = self.buffers['inventory']
+            np.copyto(update_obs['grid_observation'], obs['grid_observation'])
+            np.copyto(update_obs['inventory'], obs['inventory'])
+        self._process_social(obs, update_obs)
+        return update_obs
+
+    def _process_social(self, obs, update_obs):
+        update_obs['communication'] = self.words_toarray(obs['Social']['communications'], out=self.buffer('communication'))
+        social_state = self.social_snapshot2adj(obs['Social']['snapshot'])
+        if self.buffers is not None:
+            np.copyto(self.buffers['social_state'], social_state)
+            social_state = self.buffers['social_state']
+        update_obs['social_state'] = social_state
+        update_obs['time'] = self.time_toarray(obs['step_id'], out=self.buffer('time'))
+
     # If considering observation sharing, call this function before process_obs
     def sharing_obs(self, obs):
         shared_block = []
@@ -0,0 +1,209 @@
+import numpy as np
+
+from .collision import resolve_collisions
+
+BLOCK = 1
+NO_EVENT = -1
+
+# Physical action layout shared with the task agents:
+# [move_up, move_down, move_left, move_right, no_act, produce, pick * R, dump * R]
+MOVE_DELTAS = np.array([[0, -1], [0, 1], [-1, 0], [1, 0], [0, 0]])
+NO_ACT = 4
+PRODUCE = 5
+PICK = 6
+
+
+class BatchedGame:
+    '''
+    Steps N worlds of the same task at once. The physical layer of every world
+    (map, resources, events, players' positions and inventories) is stacked into
+    NumPy arrays:
+        map:         (N, H, W)
+        resources:   (N, R, H, W)  resource amounts
+        events:      (N, H, W)     event id, NO_EVENT if empty
+        positions:   (N, P, 2)     (x, y)
+        inventories: (N, P, R)
+    Every world breaks its collision ties with its own Generator, by default
+    the `rng` of its game, drawing what `Game` draws, so a world steps exactly
+    like a `Game` with the same state and generator.
+    Social mechanics are not simulated here; use `Game` for tasks that rely on them.
+    '''
+    def __init__(
+        self,
+        games,
+        resource_config,
+        event_config,
+        rngs=None,
+    ):
+        # Resource tables
+        self.resource_names = list(resource_config.keys())
+        self.resource_num = len(self.resource_names)
+        self._resource2id = {name: i for i, name in enumerate(self.resource_names)}
+        self.unit_scores = np.array(
+            [resource_config[name].get('score', 0) for name in self.resource_names], dtype=np.float64
+        )
+        self.requirements, self.required = self._requirement_table(resource_config)
+        # Event tables
+        self.event_names = list(event_config.keys())
+        self._event2id = {name: i for i, name in enumerate(self.event_names)}
+        self.event_inputs = self._amount_table(event_config, 'in')
+        self.event_outputs = self._amount_table(event_config, 'out')
+        self.event_consumed = self._listed_table(event_config, 'in')
+
+        self.load_games(games, rngs)
+
+    def load_games(self, games, rngs=None):
+        self.num_games = len(games)
+        self.rngs = [game.rng for game in games] if rngs is None else list(rngs)
+        self.player_num = games[0].player_num
+        self.size_x, self.size_y = games[0].world_map.shape
+        self.max_length = games[0].max_length
+        N, P, R = self.num_games, self.player_num, self.resource_num
+        H, W = self.size_y, self.size_x
+        # Map
+        self.map = np.stack([game.world_map.map_data for game in games]).astype(np.int8)
+        # Resources
+        self.resources = np.zeros((N, R, H, W), dtype=np.int32)
+        # Events
+        self.events = np.full((N, H, W), NO_EVENT, dtype=np.int16)
+        # Players
+        self.positions = np.zeros((N, P, 2), dtype=np.int64)
+        self.inventories = np.zeros((N, P, R), dtype=np.int32)
+        self.inventory_sizes = np.zeros((N, P), dtype=np.float64)
+        self.preferences = np.tile(self.unit_scores, (N, P, 1))
+        for n, game in enumerate(games):
+            assert game.player_num == P and game.world_map.shape == (W, H)
+            layer = game.resource_layer
+            for r, name in enumerate(layer.resource_names):
+                self.resources[n, self._resource2id[name]] = layer.amounts[r]
+            for (x, y), event in game.event_dict.items():
+                self.events[n, y, x] = self._event2id[event.name]
+            for p, player in enumerate(game.players):
+                self.positions[n, p] = player.position
+                self.inventory_sizes[n, p] = player.inventory_size
+                for name, score in player.resource_preference_dict.items():
+                    self.preferences[n, p, self._resource2id[name]] = score
+                for kind, amount in zip(player.resource_kinds, player.counts.tolist()):
+                    self.inventories[n, p, self._resource2id[kind.name]] += amount
+        self.steps = np.zeros(N, dtype=np.int64)
+        self.scores = self._get_scores()
+        self.rewards = np.zeros((N, P), dtype=np.float64)
+        self.terminateds = np.zeros(N, dtype=bool)
+
+    @property
+    def observations(self):
+        return {
+            'map': self.map,
+            'resources': self.resources,
+            'events': self.events,
+            'positions': self.positions,
+            'inventories': self.inventories,
+            'steps': self.steps,
+        }
+
+    def step(self, actions):
+        actions = np.asarray(actions).reshape(self.num_games, self.player_num)
+        self.update(actions)
+        self.post_update()
+
+    def update(self, actions):
+        # Players act on the cell they stand on before anyone moves
+        self._produce(actions == PRODUCE)
+        self._pick(actions)
+        self._dump(actions)
+        self._move(actions)
+
+    def post_update(self):
+        prev_scores = self.scores
+        self.scores = self._get_scores()
+        self.rewards = self.scores - prev_scores
+        self.steps += 1
+        self.terminateds = self.steps >= self.max_length
+
+    def _cell_index(self, positions):
+        n = np.broadcast_to(np.arange(self.num_games)[:, None], positions.shape[:2])
+        return n, positions[..., 1], positions[..., 0]
+
+    def _produce(self, mask):
+        n, y, x = self._cell_index(self.positions)
+        event_ids = self.events[n, y, x]
+        mask = mask & (event_ids != NO_EVENT)
+        if not mask.any():
+            return
+        event_ids = event_ids[mask]
+        inventories = self.inventories[mask]
+        inputs = self.event_inputs[event_ids]
+        ok = self._meets(inventories, inputs, self.event_consumed[event_ids])
+        # Outputs are capped by the inventory size, as in `Player.pick_up`
+        outputs = np.minimum(self.event_outputs[event_ids], self.inventory_sizes[mask][:, None])
+        self.inventories[mask] = inventories + ((outputs - inputs) * ok[:, None]).astype(np.int32)
+
+    def _pick(self, actions):
+        mask = (PICK <= actions) & (actions < PICK + self.resource_num)
+        if not mask.any():
+            return
+        n, y, x = self._cell_index(self.positions)
+        n, y, x = n[mask], y[mask], x[mask]
+        r = actions[mask] - PICK
+        inventories = self.inventories[mask]
+        visible = self._meets(inventories, self.requirements[r], self.required[r])
+        ok = visible & (self.resources[n, r, y, x] > 0)
+        # Players never share a cell, so every (n, r, y, x) is picked at most once
+        self.resources[n[ok], r[ok], y[ok], x[ok]] -= 1
+        gained = (self.inventory_sizes[mask] >= 1) & ok
+        inventories[np.arange(len(r)), r] += gained
+        self.inventories[mask] = inventories
+
+    def _dump(self, actions):
+        mask = (PICK + self.resource_num <= actions) & (actions < PICK + 2 * self.resource_num)
+        if not mask.any():
+            return
+        n, y, x = self._cell_index(self.positions)
+        n, y, x = n[mask], y[mask], x[mask]
+        r = actions[mask] - PICK - self.resource_num
+        inventories = self.inventories[mask]
+        ok = inventories[np.arange(len(r)), r] > 0
+        inventories[np.arange(len(r)), r] -= ok
+        self.inventories[mask] = inventories
+        np.add.at(self.resources, (n[ok], r[ok], y[ok], x[ok]), 1)
+
+    def _move(self, actions):
+        deltas = MOVE_DELTAS[np.where(actions < NO_ACT, actions, NO_ACT).clip(0)]
+        targets = (self.positions + deltas) % np.array([self.size_x, self.size_y])
+        n, ty, tx = self._cell_index(targets)
+        moving = (actions < NO_ACT) & (actions >= 0) & (self.map[n, ty, tx] != BLOCK)
+        moving = self._resolve_collisions(moving, n, ty, tx)
+        self.positions[moving] = targets[moving]
+
+    def _resolve_collisions(self, moving, n, ty, tx):
+        _, y, x = self._cell_index(self.positions)
+        origins = (n * self.size_y + y) * self.size_x + x
+        targets = (n * self.size_y + ty) * self.size_x + tx
+        # One draw per world and step, like `Game.collision_check`
+        priority = np.concatenate([rng.random(self.player_num) for rng in self.rngs])
+        moves = resolve_collisions(origins.ravel(), targets.ravel(), moving.ravel(), priority)
+        return moves.reshape(moving.shape)
+
+    def _meets(self, inventories, amounts, listed):
+        # Same test as Player.check_amount for every listed resource
+        return np.all(~listed | ((inventories >= amounts) & (inventories > 0)), axis=-1)
+
+    def _get_scores(self):
+        return np.sum(self.inventories * self.preferences, axis=-1)
+
+    def _amount_table(self, config, key):
+        table = np.zeros((len(config), self.resource_num), dtype=np.int32)
+        for i, c in enumerate(config.values()):
+            for name, num in c.get(key, {}).items():
+                table[i, self._resource2id[name]] = num
+        return table
+
+    def _listed_table(self, config, key):
+        table = np.zeros((len(config), self.resource_num), dtype=bool)
+        for i, c in enumerate(config.values()):
+            for name in c.get(key, {}):
+                table[i, self._resource2id[name]] = True
+        return table
+
+    def _requirement_table(self, config):
+        return self._amount_table(config, 'requirements'), self._listed_table(config, 'requirements')
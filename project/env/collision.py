@@ -0,0 +1,40 @@
+import numpy as np
+
+
+def resolve_collisions(origins, targets, moving, priority):
+    '''
+    Decides which of the players that want to move actually move.
+        origins:  (M,) cell id each player stands on
+        targets:  (M,) cell id each player wants to move into
+        moving:   (M,) whether the player wants to move
+        priority: (M,) random keys, the highest one wins a contested cell
+    A player whose target is the cell of a player that stays has to stay as
+    well. Chains of moves are followed to their end, while cycles (swaps
+    included) move together. Returns the (M,) mask of players that move.
+    '''
+    moving = np.array(moving, dtype=bool)
+    num = len(moving)
+    # Several players moving into the same cell: one of them wins
+    candidates = np.flatnonzero(moving)
+    order = candidates[np.lexsort((-priority[candidates], targets[candidates]))]
+    sorted_cells = targets[order]
+    moving[order[1:][sorted_cells[1:] == sorted_cells[:-1]]] = False
+
+    # "Wants to move into" graph: every mover points at the player on its target cell.
+    # Each player has at most one successor and one predecessor, so the graph is
+    # made of disjoint paths and cycles.
+    cells, inverse = np.unique(np.concatenate((origins, targets)), return_inverse=True)
+    occupant = np.full(len(cells), -1, dtype=np.int64)
+    occupant[inverse[:num]] = np.arange(num)
+    successor = np.where(moving, occupant[inverse[num:]], -1)
+    # Path ends are their own successor: players that stay, and movers into a free cell
+    players = np.arange(num)
+    end = successor < 0
+    successor[end] = players[end]
+
+    # Pointer jumping finds the end of every path in log(M) vectorized steps
+    for _ in range(max(num - 1, 1).bit_length()):
+        successor = successor[successor]
+    # Players in a cycle never reach an end and move
+    reached = end[successor]
+    return np.where(reached, moving[successor], moving)
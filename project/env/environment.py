@@ -1,25 +1,60 @@
 import os
 import json
+import numpy as np
 import pygame
+from pydoc import locate
 
 from ray.rllib.env.multi_agent_env import MultiAgentEnv
 
 from .gui.canvas import Canvas
 from .gui.render import Render
+from .tensor_observation import TensorObservation
 from ..utils.config_loader import ConfigLoader
 from ..utils.game_editor import GameEditor
-import random
+from ..utils.world_pool import WorldPool
 
 
 class Environment(MultiAgentEnv):
     def __init__(
         self,
         config_name='./config/main.json',
+        world_pool_size=0,
+        replenish_world_pool=False,
+        obs_mode='dict',
+        template=None,
+        task_cache=None,
     ):
-        self.config_loader = ConfigLoader(config_name)
+        # Environments of the same task can share the parsed config, GameEditor and world pool of a `template`,
+        # or attach to the config and base map of a TaskCache instead of reading their files
+        if template is not None:
+            self.config_loader = template.config_loader
+        elif task_cache is not None:
+            self.config_loader = task_cache.config_loader()
+        else:
+            self.config_loader = ConfigLoader(config_name)
         config = self.config_loader.config
-        self.game_editor = GameEditor(config=config)
+        # 'dict' observations for every agent, or 'tensor' grids for agents that declare a `grid_view`
+        if obs_mode not in ('dict', 'tensor'):
+            raise ValueError(f'Unknown observation mode: {obs_mode}')
+        self.obs_mode = obs_mode
+        self.grid_view = None
+        if obs_mode == 'tensor':
+            agent = self.config_loader.task['agent']
+            self.grid_view = getattr(locate(agent), 'grid_view', None)
+            if self.grid_view is None:
+                raise ValueError(f'{agent} does not read tensor observations')
+        if template is not None:
+            self.game_editor = template.game_editor
+            self.world_pool = template.world_pool
+        else:
+            self.game_editor = GameEditor(config=config) if task_cache is None else task_cache.game_editor()
+            # Reset from pre-generated worlds instead of generating one per episode
+            self.world_pool = WorldPool(self.game_editor, world_pool_size, replenish_world_pool) \
+                if world_pool_size > 0 else None
+        # Every random draw of the environment comes from this generator, seeded by `reset(seed=...)`
+        self.rng = None
         self.episode = -1
+        self.step_num = 0
 
         # Render
         render_config = self.config_loader.render
@@ -32,66 +67,69 @@ class Environment(MultiAgentEnv):
         options=None,
     ):
         super().reset(seed=seed, options=options)
+        if seed is not None or self.rng is None:
+            self.rng = np.random.default_rng(seed)
+        if seed is not None and self.world_pool is not None:
+            self.world_pool.seed(seed)
 
         self.episode += 1
         self.step_num = 0
 
-        self.game = self.game_editor.generate_game()
+        if self.world_pool is not None:
+            self.game = self.world_pool.draw(self.rng)
+        else:
+            self.game = self.game_editor.generate_game(self.rng)
+        config = self.config_loader.config
+        events = config['event']
+        resource_name = _resource_names(
+            config,
+            [resource.name for resource in self.game.resources],
+            [event.name for event in self.game.events],
+        )
+        if self.obs_mode == 'tensor':
+            self.game.use_tensor_observation(TensorObservation(self.game, resource_name, events, self.grid_view))
         obs = self.game.observations
-        events = self.config_loader.config['event']
-        resource_name_list = [resource.name for resource in self.game.resources]
-        event_in_name_list = sum([list(events[e.name]['in'].keys()) for e in self.game.events],[])
-        event_out_name_list = sum([list(events[e.name]['out'].keys()) for e in self.game.events],[])
-        resource_name = list(set(resource_name_list + event_in_name_list + event_out_name_list))
         node_list = self.game.social.get_node_list()
-        player_num = len(self.game.players)
-        group_num = len(self.game.social.group_dict)
-        random_seed = random.randint(0, 2**32-1)
-        
-        infos = {player.name: {
-            'episode_id': self.episode,
-            'step_id': self.step_num,
-            'max_length': self.game.max_length,
-            'map_size': self.game.world_map.shape,
-            'seed': random_seed,
-            'group_num': group_num,
-            'player_num': player_num,
-            '_id': player._id,
-            'obs_range': player.fov,
-            'inventory_capacity': player.resource_max_dict,
-            'events':events,
-            'resource_name': resource_name,
-            'resource_num': len(resource_name),
-            'player_num': player_num,
-            'group_num': group_num,
-            'map_size': self.game.world_map.shape,
-            'communication_length': self.config_loader.config.task.static.communication_length,
-            'nodes': node_list,
-            'obs_range': player.fov,
-            "max_length": self.game.max_length,
-            'inventory_capacity': player.resource_max_dict,
-            'nodes': node_list,
-            "negotiation_steps":self.config_loader.config.task.negotiation.get('negotiation_steps', 0),
-            "claim_proposal_interval":self.config_loader.config.task.negotiation.get('claim_proposal_interval', 0),
-        } for player in self.game.players}
+        random_seed = int(self.rng.integers(2**32))
+        infos = _infos(
+            config,
+            [(player.name, player._id, player.fov, player.resource_max_dict) for player in self.game.players],
+            resource_name,
+            node_list,
+            group_num=len(self.game.social.group_dict),
+            map_size=self.game.world_map.shape,
+            max_length=self.game.max_length,
+            seed=random_seed,
+            episode=self.episode,
+            step=self.step_num,
+        )
 
         self.rendering.load_game(self.game)
 
         return obs, infos
 
+    def static_infos(self):
+        '''The infos `reset` hands out, without generating a world.'''
+        return static_infos(self.config_loader.config, self.game_editor, self.episode, self.step_num)
+
     def step(
         self,
         action_dict,
     ):
         self.game.pre_update()
-        self.game.update(action_dict)
+        if isinstance(action_dict, np.ndarray):
+            # (P, ACTION_WIDTH) integer action codes
+            self.game.update_codes(action_dict)
+        else:
+            self.game.update(action_dict)
         self.rendering.render_frame()
         self.game.post_update()
         next_obs = self.game.observations
-        rewards = self.game.rewards
-        terminateds = self.game.terminateds
+        # Dicts of this step, which the next steps leave as they are
+        rewards = self.game.rewards.snapshot()
+        terminateds = self.game.terminateds.snapshot()
         # TODO Add an agent callback func
-        truncateds = {_id: v for _id, v in terminateds.items()}
+        truncateds = self.game.truncateds.snapshot()
         self.step_num += 1
         infos = {player.name: {
             'step': self.step_num,
@@ -109,6 +147,76 @@ class Environment(MultiAgentEnv):
         pass
 
     def close(self):
+        if self.world_pool is not None:
+            self.world_pool.close()
         if self.screen is not None:
             pygame.display.quit()
             pygame.quit()
+
+
+def static_infos(config, game_editor, episode=-1, step=0):
+    '''
+    The infos Environment.reset hands out, derived from the task config and
+    the GameEditor's layout without generating a world. Only the seed, left
+    at 0, differs from episode to episode.
+    '''
+    layout = game_editor.layout()
+    players = []
+    for _id, job in enumerate(layout['jobs']):
+        job_config = config['job'][job]
+        fov = job_config['fov']
+        players.append((
+            f'{job}_{_id}',
+            _id,
+            [fov, fov] if isinstance(fov, int) else [fov[0], fov[1]],
+            dict(job_config.get('inventory', {}).get('max', {})),
+        ))
+    group_num = len(config.task.static.social.groups)
+    node_list = [{'type': 'player', 'player': {'id': _id}} for _id in range(len(players))]
+    node_list += [{'type': 'group', 'group': {'id': _id}} for _id in range(group_num)]
+    return _infos(
+        config,
+        players,
+        _resource_names(config, layout['resources'], layout['events']),
+        node_list,
+        group_num=group_num,
+        map_size=layout['map_shape'],
+        max_length=config.task.max_length,
+        seed=0,
+        episode=episode,
+        step=step,
+    )
+
+
+def _resource_names(config, resource_names, event_names):
+    events = config['event']
+    event_in_name_list = sum([list(events[name]['in'].keys()) for name in event_names], [])
+    event_out_name_list = sum([list(events[name]['out'].keys()) for name in event_names], [])
+    # First-seen order, which unlike set order does not depend on the hash seed
+    return list(dict.fromkeys(resource_names + event_in_name_list + event_out_name_list))
+
+
+def _infos(config, players, resource_name, node_list, group_num, map_size, max_length, seed, episode, step):
+    # `players` as (name, _id, fov, inventory capacities)
+    resource_ids = dict(zip(config['resource'], range(len(config['resource']))))
+    return {name: {
+        'episode_id': episode,
+        'step_id': step,
+        'max_length': max_length,
+        'map_size': map_size,
+        'seed': seed,
+        'group_num': group_num,
+        'player_num': len(players),
+        '_id': _id,
+        'obs_range': fov,
+        'inventory_capacity': capacity,
+        'events': config['event'],
+        'resource_name': resource_name,
+        'resource_num': len(resource_name),
+        # Ids of the resources in integer action codes
+        'resource_ids': [resource_ids[name] for name in resource_name],
+        'communication_length': config.task.static.communication_length,
+        'nodes': node_list,
+        'negotiation_steps': config.task.negotiation.get('negotiation_steps', 0),
+        'claim_proposal_interval': config.task.negotiation.get('claim_proposal_interval', 0),
+    } for name, _id, fov, capacity in players}
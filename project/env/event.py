@@ -1,4 +1,22 @@
+class EventKind:
+    '''
+    Immutable data shared by every event of one type: inputs, outputs,
+    requirements and the pool its outputs are drawn from.
+    '''
+    __slots__ = ('name', 'inputs', 'outputs', 'resource_pool', 'requirements', 'avail_interval')
+
+    def __init__(self, name, inputs, outputs, resource_pool, requirements={}, avail_interval=0):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.resource_pool = resource_pool
+        self.requirements = requirements
+        self.avail_interval = avail_interval
+
+
 class Event:
+    __slots__ = ('kind', 'x', 'y', 'cooldown')
+
     def __init__(
         self,
         name,
@@ -9,14 +27,17 @@ class Event:
         requirements={},
         avail_interval=0,
     ):
-        self.name = name
+        self.kind = EventKind(name, inputs, outputs, resource_pool, requirements, avail_interval)
         self.x, self.y = position
-        self.inputs = inputs
-        self.outputs = outputs
-        self.resource_pool = resource_pool
-        self.requirements = requirements
-        self.avail_interval = avail_interval
         self.cooldown = 0
+
+    @classmethod
+    def of_kind(cls, kind, position):
+        event = cls.__new__(cls)
+        event.kind = kind
+        event.x, event.y = position
+        event.cooldown = 0
+        return event
         
     def update(self):
         if self.cooldown > 0:
@@ -39,6 +60,30 @@ class Event:
             'name': self.name,
             'position': self.position,
         }
+
+    @property
+    def name(self):
+        return self.kind.name
+
+    @property
+    def inputs(self):
+        return self.kind.inputs
+
+    @property
+    def outputs(self):
+        return self.kind.outputs
+
+    @property
+    def resource_pool(self):
+        return self.kind.resource_pool
+
+    @property
+    def requirements(self):
+        return self.kind.requirements
+
+    @property
+    def avail_interval(self):
+        return self.kind.avail_interval
     
     @property
     def position(self):
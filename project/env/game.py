@@ -1,14 +1,19 @@
-import random
 import networkx as nx
 import numpy as np
 import json
+from collections.abc import Mapping
 from ..utils.json_encoder import NumpyEncoder
+from .collision import resolve_collisions
+from .requirement_table import RequirementTable
+from .rule_pipeline import RulePipeline
+from .spatial_index import SpatialIndex
 
 
 class Game:
     def __init__(
         self,
         world_map,
+        resource_layer,
         resources,
         events,
         players,
@@ -17,12 +22,17 @@ class Game:
         negotiation_steps,
         pre_updates,
         post_updates,
-        max_length
+        max_length,
+        rng=None,
     ):
+        # Random tie-breaks
+        self.rng = np.random.default_rng() if rng is None else rng
         # Map
         self.world_map = world_map
         # Resource
-        self.resource_dict = {}
+        self.resource_layer = resource_layer
+        self.resource_index = resource_layer.index
+        self.resource_dict = resource_layer.as_dict()
         self.resources = resources
         for resource in resources:
             self.lay_resource(resource)
@@ -30,6 +40,11 @@ class Game:
         self.players = players
         self.player_dict = {player._id: player for player in players}
         self.player_name2id = {player.name: player._id for player in players}
+        self.player_position = {}
+        self.player_index = SpatialIndex(*world_map.shape)
+        # Cells where players arrived or left, and players that moved, since the last observation
+        self._dirty_positions = set()
+        self._moved_players = set()
         self.update_position_dict()
         for player in self.players:
             player.join_game(self)
@@ -42,16 +57,26 @@ class Game:
         # Events
         self.events = events
         self.event_dict = {event.position: event for event in events}
+        self.event_index = SpatialIndex(*world_map.shape, positions=self.event_dict)
+        self.event_requirements = RequirementTable(event.kind for event in events)
 
         self.steps = 0
         self.episodes = 0
         self.max_length = max_length
         # Observations
+        # Per-player observation parts are rebuilt only when something they depend on changed
+        self._obs_cache = {}
+        self._social_cache = None
+        # Set by `use_tensor_observation` to skip the observation dicts
+        self.tensor_observation = None
+        self.obs_tensors = None
         self._obs = self._get_obs()
-        # Rewards
-        self.rewards = self._get_rewards()
-        # Terminateds
-        self.terminated = False
+        # Rewards and terminateds, computed when first read after every step
+        self._reward_vector = None
+        self._terminated_vector = None
+        self.rewards = PlayerVectorView(self, 'reward_vector')
+        self.terminateds = PlayerVectorView(self, 'terminated_vector', all_attribute='terminated')
+        self.truncateds = PlayerVectorView(self, 'truncated_vector', all_attribute='terminated')
 
         self._pre_update_funcs = {
             'symmetrize_relation': self._post_symmetrize_relation,
@@ -83,6 +108,35 @@ class Game:
     def observations(self):
         return self._obs
     
+    @property
+    def reward_vector(self):
+        '''(P,) rewards of the last step, in `players` order.'''
+        if self._reward_vector is None:
+            self._reward_vector = np.array([player.reward for player in self.players], dtype=np.float64)
+            self._reward_vector.setflags(write=False)
+        return self._reward_vector
+
+    @property
+    def terminated_vector(self):
+        '''(P,) terminated flags of the players, in `players` order.'''
+        if self._terminated_vector is None:
+            self._terminated_vector = np.array([player.terminated for player in self.players], dtype=bool)
+            self._terminated_vector.setflags(write=False)
+        return self._terminated_vector
+
+    @property
+    def truncated_vector(self):
+        '''(P,) truncated flags, a copy of the terminated ones: truncation is not distinguished from termination.'''
+        return self.terminated_vector.copy()
+
+    @property
+    def terminated(self):
+        return self.steps >= self.max_length
+
+    def inventories(self):
+        '''(P, R) amounts held by every player, with resources in ResourceLayer order.'''
+        return np.stack([player.counts for player in self.players])
+
     def pre_update(self):
         for player in self.players:
             player.pre_update()
@@ -101,10 +155,30 @@ class Game:
         self.collision_check()
         self.update_position_dict()
 
+    def update_codes(self, codes):
+        '''
+        update() for integer actions: a (P, ACTION_WIDTH) array with the action
+        code of every player, in `players` order.
+        '''
+        # Events
+        for event in self.event_dict.values():
+            event.update()
+        # Players: update
+        for player, code in zip(self.players, codes.tolist()):
+            player.apply_code(code)
+        # Collision
+        self.collision_check()
+        self.update_position_dict()
+
     def post_update(self):
         # Players: post update
+        prev_positions = [player.position for player in self.players]
         for player in self.players:
             player.post_update()
+        for player, prev_position in zip(self.players, prev_positions):
+            if player.position != prev_position:
+                self._moved_players.add(player)
+                self._dirty_positions.update((prev_position, player.position))
         # Time
         self.steps += 1
         # Social
@@ -112,46 +186,15 @@ class Game:
         self.check_social_schedule()
         # Observation
         self._obs = self._get_obs()
-        # Rewards
-        self.rewards = self._get_rewards()
-        # print(f"Reward: {self.rewards}")
-        # Terminateds
-        self.terminateds = self._get_terminateds()
-
-    def bubble_up_resource(self, position, resource_name):
-        resource = self.resource_dict.get(position)
-        if resource:
-            top_resource = resource
-            if resource.name == resource_name:
-                return resource
-            next_resource = resource.stacked_resource
-            while next_resource:
-                if next_resource.name == resource_name:
-                    resource.stacked_resource = next_resource.stacked_resource
-                    next_resource.stacked_resource = top_resource
-                    self.resource_dict[position] = next_resource
-                    return next_resource
-                resource = next_resource
-                next_resource = resource.stacked_resource
-        return None
-
-    def provide_resource(self, position, require_num=1):
-        resource = self.resource_dict.get(position)
-        if resource:
-            obtained_resource = resource.provide(require_num)
-            
-            if not resource.is_available:
-                if resource.stacked_resource:
-                    self.resource_dict[position] = resource.stacked_resource
-                else:
-                    del self.resource_dict[position]
-            return obtained_resource
-        return None
+        # Rewards and terminateds
+        self._reward_vector = None
+        self._terminated_vector = None
+
+    def provide_resource(self, position, resource_name, require_num=1):
+        return self.resource_layer.provide(resource_name, position, require_num)
 
     def lay_resource(self, resource):
-        if resource.position in self.resource_dict:
-            resource.stacked_resource = self.resource_dict[resource.position]
-        self.resource_dict[resource.position] = resource
+        self.resource_layer.lay(resource.name, resource.position, resource.amount)
 
     def get_event(self, position):
         return self.event_dict.get(position, None)
@@ -162,54 +205,37 @@ class Game:
         return self.world_map.grids(x - h, x + h + 1, y - v, y + v + 1)
 
     def collision_check(self):
-        blocked_positions = set()
-        collided_position_dict = {}
         for player in self.players:
-            pos = player.next_scolled_position
             # Map blocks
-            if self.world_map.is_block(pos):
+            if self.world_map.is_block(player.next_scolled_position):
+                player.undo_action()
+        # Player collision
+        size_x = self.world_map.size_x
+        origins = np.array([player.y * size_x + player.x for player in self.players])
+        targets = np.array([player.next_scolled_y * size_x + player.next_scolled_x for player in self.players])
+        moving = np.array([player.is_moved for player in self.players])
+        moves = resolve_collisions(origins, targets, moving, self.rng.random(self.player_num))
+        for player, move in zip(self.players, moves):
+            if not move:
                 player.undo_action()
-                pos = player.next_scolled_position
-            # Player collision
-            if player.is_moved:
-                if pos in blocked_positions:
-                    player.undo_action()
-                    pos = player.next_scolled_position
-                    blocked_positions.add(pos)
-                    self.__undo_collided_players(pos, blocked_positions, collided_position_dict)
-                else:
-                    if pos in collided_position_dict:
-                        collided_position_dict[pos].append(player)
-                    else:
-                        collided_position_dict[pos] = [player]
-            else:
-                blocked_positions.add(pos)
-                self.__undo_collided_players(pos, blocked_positions, collided_position_dict)
-        for collided_position in list(collided_position_dict):
-            players = collided_position_dict.get(collided_position)
-            if players:
-                random.shuffle(players)
-                collided_position_dict[collided_position] = [players.pop()]
-                for player in players:
-                    player.undo_action()
-                    pos = player.next_scolled_position
-                    blocked_positions.add(pos)
-                    self.__undo_collided_players(pos, blocked_positions, collided_position_dict)
 
     def update_position_dict(self):
-        self.player_position = {player.position: player for player in self.players}
+        player_position = {player.position: player for player in self.players}
+        self.player_index.update(self.player_position.keys(), player_position.keys())
+        self._dirty_positions.update(self.player_position.keys() ^ player_position.keys())
+        self.player_position = player_position
         
     def _post_update_matching_edge(self, condition_attr, result_attr1, result_attr2):
         graph = self.social.social_graph
         matched_list = []
-        for u, v, attr in graph.edges(data=True):
-            if condition_attr in attr:
+        for u, v in self.social.edges_with(condition_attr):
+            if condition_attr in graph.edges[u, v]:
                 if graph.has_edge(v,u) and graph[v][u].get(condition_attr) is not None:
                     edge1_condition = graph[u][v].get(condition_attr)
                     edge2_condition = graph[v][u].get(condition_attr)
                     if edge1_condition == edge2_condition:
-                        graph.edges[u, v].pop(condition_attr)
-                        graph.edges[v, u].pop(condition_attr)
+                        self.social.discard_attribute(u, v, condition_attr)
+                        self.social.discard_attribute(v, u, condition_attr)
                         self.social.add_relation(u, v, **result_attr1)
                         self.social.add_relation(v, u, **result_attr2)
                         matched_list.append((u,v))
@@ -235,8 +261,8 @@ class Game:
 
     def _post_update_relation_to_group(self, condition_attr, result_attr):
         edges_to_remove = []
-        for u, v, data in self.social.social_graph.edges(data=True):
-            if data.get('attribute') == condition_attr:
+        for u, v in self.social.edges_with('attribute'):
+            if self.social.social_graph.edges[u, v]['attribute'] == condition_attr:
                 edges_to_remove.append((u, v))
 
         subgraph = self.social.social_graph.edge_subgraph(edges_to_remove).copy()
@@ -245,50 +271,56 @@ class Game:
 
         for subgraph in scc_subgraphs:
             edges_to_remove = list(subgraph.edges())
-            self.social.social_graph.remove_edges_from(edges_to_remove)
+            for u, v in edges_to_remove:
+                self.social.remove_edge(u, v)
             group_node = self.social.create_group()
             nodes_in_edges = set([u for u, v in edges_to_remove] + [v for u, v in edges_to_remove])
             for node in nodes_in_edges:
                 self.social.join_group(node, group_node, **{result_attr: self.social.social_graph[node][group_node][condition_attr]})
 
     def _post_update_merge_relation_to_group(self, condition_attr, result_attr):
-        for node in self.players:
+        for node, other in self.social.edges_with(condition_attr):
+            if not self.social.social_graph.has_edge(node, other):
+                continue
+            edge_attr = self.social.social_graph[node][other]
             node_data = self.social.social_graph.nodes[node]
-            for _, other, edge_attr in list(self.social.social_graph.out_edges(node, data=True)):
-                other_data = self.social.social_graph.nodes[other]
-                if edge_attr.get(condition_attr) and other_data.get('type') == 'player':
-                    if self.social.social_graph.has_edge(other, node) and \
-                        self.social.social_graph[other][node].get(condition_attr):
-                            result_attr_value1 = edge_attr.get(condition_attr)
-                            result_attr_value2 = self.social.social_graph[other][node].get(condition_attr)
-                            self.social.remove_relation(node, other, condition_attr)
-                            self.social.remove_relation(other, node, condition_attr)
-                            if not node.groups and not other.groups:
-                                group = self.social.create_group()
-                                self.social.join_group(node, group, **{result_attr: result_attr_value1})
-                                self.social.join_group(other, group, **{result_attr: result_attr_value2})
-                            elif not node.groups:
-                                for group in other.groups:
-                                    if self.social.social_graph[group][other].get(result_attr):
-                                        self.social.join_group(node, group, **{result_attr: result_attr_value1})
-                            elif not other.groups:
-                                for group in node.groups:
-                                    if self.social.social_graph[group][node].get(result_attr):
-                                        self.social.join_group(other, group, **{result_attr: result_attr_value2})
-                            else: # merge group
-                                for other_group in other.groups.copy():
-                                    for member in list(self.social.social_graph.successors(other_group)):
-                                        for node_group in node.groups:
-                                            if not self.social.social_graph.has_edge(node_group, member):
-                                                self.social.join_group(member, node_group, **self.social.social_graph[other_group][member])
-                                                self.social.quit_group(member, other_group)
-                                    if other_group != node_group:
-                                        self.social.remove_group(other_group)
+            other_data = self.social.social_graph.nodes[other]
+            if node_data.get('type') != 'player':
+                continue
+            if edge_attr.get(condition_attr) and other_data.get('type') == 'player':
+                if self.social.social_graph.has_edge(other, node) and \
+                    self.social.social_graph[other][node].get(condition_attr):
+                        result_attr_value1 = edge_attr.get(condition_attr)
+                        result_attr_value2 = self.social.social_graph[other][node].get(condition_attr)
+                        self.social.remove_relation(node, other, condition_attr)
+                        self.social.remove_relation(other, node, condition_attr)
+                        if not node.groups and not other.groups:
+                            group = self.social.create_group()
+                            self.social.join_group(node, group, **{result_attr: result_attr_value1})
+                            self.social.join_group(other, group, **{result_attr: result_attr_value2})
+                        elif not node.groups:
+                            for group in other.groups:
+                                if self.social.social_graph[group][other].get(result_attr):
+                                    self.social.join_group(node, group, **{result_attr: result_attr_value1})
+                        elif not other.groups:
+                            for group in node.groups:
+                                if self.social.social_graph[group][node].get(result_attr):
+                                    self.social.join_group(other, group, **{result_attr: result_attr_value2})
+                        else: # merge group
+                            for other_group in other.groups.copy():
+                                for member in list(self.social.social_graph.successors(other_group)):
+                                    for node_group in node.groups:
+                                        if not self.social.social_graph.has_edge(node_group, member):
+                                            self.social.join_group(member, node_group, **self.social.social_graph[other_group][member])
+                                            self.social.quit_group(member, other_group)
+                                if other_group != node_group:
+                                    self.social.remove_group(other_group)
     def _post_update_relation_switch(self, condition_attr, target_attr):
         social_graph = self.social.social_graph
         
         edges_to_modify = []
-        for A, B, edge_data in social_graph.edges(data=True):
+        for A, B in self.social.edges_with(condition_attr):
+            edge_data = social_graph[A][B]
             if condition_attr in edge_data:
                 if social_graph.has_edge(B, A) and target_attr in social_graph[B][A]:
                     edges_to_modify.append((A, B, edge_data[condition_attr]))
@@ -302,63 +334,53 @@ class Game:
         social_graph = self.social.social_graph
         edges_to_add = []
 
-        for u, v, data in social_graph.edges(data=True):
+        for u, v in self.social.edges_with(attr):
+            data = social_graph[u][v]
             if attr in data:
                 if not social_graph.has_edge(v, u):
                     edges_to_add.append((v, u, data[attr]))
                 else:
                     if attr not in social_graph[v][u]:
-                        social_graph[v][u][attr] = data[attr]
+                        self.social.add_relation(v, u, **{attr: data[attr]})
         for v, u, value in edges_to_add:
             self.social.add_relation(v, u, **{attr: value})
             
     def _post_normalization(self, attr):
         social_graph = self.social.social_graph
-
-        for group_node in social_graph.nodes:
-            if social_graph.nodes[group_node].get('type') == 'group':
-                total_attr_value = 0.0
-                edges = []
-                for neighbor in social_graph.successors(group_node):
-                    if social_graph.nodes[neighbor].get('type') == 'player':
-                        if attr in social_graph[group_node][neighbor]:
-                            total_attr_value += social_graph[group_node][neighbor][attr]
-                            edges.append((group_node, neighbor))
-
-                if total_attr_value > 0:
-                    for group_node, player_node in edges:
-                        social_graph[group_node][player_node][attr] /= total_attr_value
+        group_edges = {}
+        for group_node, neighbor in self.social.edges_with(attr):
+            if social_graph.nodes[group_node].get('type') == 'group' and \
+                social_graph.nodes[neighbor].get('type') == 'player':
+                group_edges.setdefault(group_node, []).append((group_node, neighbor))
+
+        for edges in group_edges.values():
+            total_attr_value = 0.0
+            for group_node, player_node in edges:
+                total_attr_value += social_graph[group_node][player_node][attr]
+
+            if total_attr_value > 0:
+                for group_node, player_node in edges:
+                    social_graph[group_node][player_node][attr] /= total_attr_value
+                self.social.touch()
 
     def _post_clear_temporary_relation(self, attr):
         social_graph = self.social.social_graph
         edge_list = []
-        for u, v, edge_data in social_graph.edges(data=True):
-            if attr in edge_data and social_graph.nodes[u]['type'] == 'player' and social_graph.nodes[v]['type'] == 'player':
+        for u, v in self.social.edges_with(attr):
+            if social_graph.nodes[u]['type'] == 'player' and social_graph.nodes[v]['type'] == 'player':
                 edge_list.append((u, v, attr))
         for u, v, attr in edge_list:        
             self.social.remove_relation(u, v, attr)
 
     def load_func(self, func_args, func_dict):
-        _func_name_list = []
-        _kwargs_list = []
-        for func in func_args:
-            if isinstance(func, str):
-                _func_name = func
-                kwargs = {}
-            elif isinstance(func, dict):
-                _func_name = func['function']
-                kwargs = func.get('kwargs', {})
-            else:
-                _func_name, kwargs = func
-
-            _func_name_list.append(_func_name)
-            _kwargs_list.append(kwargs)
-
-        def function():
-            for func, kwargs in zip(_func_name_list, _kwargs_list):
-                func_dict[func](**kwargs)
-
-        return function
+        return RulePipeline(func_args, func_dict)
+
+    @property
+    def rule_timings(self):
+        return {
+            'pre_updates': self.social_pre_update.report(),
+            'post_updates': self.social_post_update.report(),
+        }
 
     def check_social_schedule(self):
         if self.milestones:
@@ -370,14 +392,6 @@ class Game:
                 graph_info = self.social_schedule[str(milestone)]
                 self.social.load_graph(graph_info)
 
-    def __undo_collided_players(self, collided_position, blocked_positions, collided_position_dict):
-        players = collided_position_dict.pop(collided_position, [])
-        for player in players:
-            player.undo_action()
-            pos = player.next_scolled_position
-            blocked_positions.add(pos)
-            self.__undo_collided_players(pos, blocked_positions, collided_position_dict)
-
     def _post_update_split_score_to_group(self, attribute):
         shared_groups = set()
         for player in self.players:
@@ -394,31 +408,92 @@ class Game:
         for player in self.players:
             player.settle_score()
 
+    def use_tensor_observation(self, tensor_observation):
+        '''
+        Switches the observations to the tensors of a TensorObservation. Every
+        player gets its rows of the stacked `obs_tensors` next to the social
+        part of the usual observation, and no Map or Player dicts are built.
+        '''
+        self.tensor_observation = tensor_observation
+        self._obs = self._get_obs()
+
+    def _get_social_cache(self):
+        if self._social_cache is None or self._social_cache['version'] != self.social.version:
+            self._social_cache = {
+                'version': self.social.version,
+                'snapshot': self.social.snapshot(),
+                'global': self._get_social_global(),
+                'groups': self._get_social_groups(),
+                'communications': {},
+            }
+        return self._social_cache
+
+    def _get_social_obs(self, player, social_cache):
+        if player not in social_cache['communications']:
+            social_cache['communications'][player] = self._get_single_communication(player)
+        return {
+            'global': social_cache['global'],
+            'communications': list(social_cache['communications'][player]),
+            'groups': social_cache['groups'],
+            'social_graph': self.social.social_graph,
+            'snapshot': social_cache['snapshot'],
+        }
+
+    def _get_tensor_obs(self):
+        social_cache = self._get_social_cache()
+        self.obs_tensors = self.tensor_observation.encode()
+        obs = {}
+        for i, player in enumerate(self.players):
+            obs[player.name] = {
+                'episode_id': self.episodes,
+                'step_id': self.steps,
+                'grid_observation': self.obs_tensors['grid_observation'][i],
+                'inventory': self.obs_tensors['inventory'][i],
+                'Social': self._get_social_obs(player, social_cache),
+            }
+            player.inventory_changed = False
+        self.resource_layer.dirty_cells.clear()
+        self._dirty_positions.clear()
+        self._moved_players.clear()
+        return obs
+
     def _get_obs(self):
-        # TODO
+        if self.tensor_observation is not None:
+            return self._get_tensor_obs()
         obs = {}
-        social_global = self._get_social_global()
-        groups = self._get_social_groups()
+        social_cache = self._get_social_cache()
+        dirty_cells = self.resource_layer.dirty_cells
         for player in self.players:
+            cache = self._obs_cache.get(player)
+            if cache is None or player in self._moved_players:
+                cache = self._obs_cache[player] = {}
+                cache['block_grids'] = self.grid_map(position=player.position, fov=player.fov).T
+            refresh = 'Player' not in cache or player.inventory_changed
+            if refresh or self._any_in_view(player, dirty_cells):
+                cache['resources'] = self._get_visible_resource(player)
+            if refresh:
+                cache['events'] = self._get_visible_event(player)
+                cache['Player'] = player.get_dict_info()
+                cache['Player']['inventory'] = player.get_inventory()
+            if 'players' not in cache or self._any_in_view(player, self._dirty_positions):
+                cache['players'] = self._get_visible_player(player)
+
             _obs = {'episode_id': 0, 'step_id': 0, 'Map': {}, 'Player': {}, 'Social': {}}
             _obs['episode_id'] = self.episodes
             _obs['step_id'] = self.steps
 
+            # Containers are handed out fresh every step since agents may extend them in place
             '''Map Info'''
-            _obs['Map']['block_grids'] = self.grid_map(position=player.position, fov=player.fov).T
-            _obs['Map']['resources'] = self._get_visible_resource(player)
-            _obs['Map']['events'] = self._get_visible_event(player)
-            _obs['Map']['players'] = self._get_visible_player(player)
+            _obs['Map']['block_grids'] = cache['block_grids']
+            _obs['Map']['resources'] = list(cache['resources'])
+            _obs['Map']['events'] = list(cache['events'])
+            _obs['Map']['players'] = list(cache['players'])
 
             '''Player Info'''
-            _obs['Player'] = player.get_dict_info()
-            _obs['Player']['inventory'] = player.get_inventory()
+            _obs['Player'] = dict(cache['Player'])
             
             '''Social Info'''
-            _obs['Social']['global'] = social_global
-            _obs['Social']['communications'] = self._get_single_communication(player)
-            _obs['Social']['groups'] = groups
-            _obs['Social']['social_graph'] = self.social.social_graph
+            _obs['Social'] = self._get_social_obs(player, social_cache)
             obs[player.name] = _obs
 
         # generate a json file for social global and add it into a specific file (the file is the same for steps in the same episode) in ./debug/sample
@@ -428,12 +503,22 @@ class Game:
         
         for player in self.players:
             obs[player.name]['Social']['sharings'] = self._get_social_sharing(player, obs)
+            player.inventory_changed = False
+        dirty_cells.clear()
+        self._dirty_positions.clear()
+        self._moved_players.clear()
         return obs
 
+    def _any_in_view(self, player, positions):
+        for position in positions:
+            if self.player_index.in_window(player.position, player.fov, position):
+                return True
+        return False
+
     def _get_visible_resource(self, player):
         visible_resources_dict = []
-        for resource in player.visible_resources:
-            visible_resources_dict.append(resource.get_dict_info())
+        for name, position in player.visible_resource_keys:
+            visible_resources_dict.append(self.resource_layer.get_dict_info(name, position))
         return visible_resources_dict
 
     def _get_visible_event(self, player):
@@ -460,11 +545,7 @@ class Game:
         return communication_list
     
     def _get_social_groups(self):
-        groups = []
-        for node, attr in self.social.social_graph.nodes(data=True):
-            if attr['type'] == 'group':
-                groups.append(node)
-        return groups
+        return self.social.get_groups()
     
     def _get_social_global(self):
         return {
@@ -486,14 +567,47 @@ class Game:
                             sharings[from_node._id] = {key: sharing}
         return sharings
 
-    def _get_terminateds(self):
-        terminateds = {player.name: player.terminated for player in self.players}
-        self.terminated = (self.steps >= self.max_length)
-        terminateds['__all__'] = self.terminated
-        return terminateds
-
-    def _get_rewards(self):
-        return {player.name: player.reward for player in self.players}
-
     def _get_infos(self):
         return {player.name: {} for player in self.players}
+
+
+class PlayerVectorView(Mapping):
+    '''
+    Read-only {player name: value} view of one of the game's (P,) vectors,
+    read when accessed so the vector is only computed if someone looks.
+    With `all_attribute` the view also has an '__all__' entry. The view
+    follows the game from step to step; `snapshot` copies the current values.
+    '''
+    def __init__(self, game, vector_attribute, all_attribute=None):
+        self.game = game
+        self.vector_attribute = vector_attribute
+        self.all_attribute = all_attribute
+        self.names = [player.name for player in game.players]
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    @property
+    def vector(self):
+        return getattr(self.game, self.vector_attribute)
+
+    def __getitem__(self, name):
+        if name == '__all__' and self.all_attribute is not None:
+            return getattr(self.game, self.all_attribute)
+        return self.vector[self._index[name]].item()
+
+    def __iter__(self):
+        yield from self.names
+        if self.all_attribute is not None:
+            yield '__all__'
+
+    def __len__(self):
+        return len(self.names) + (self.all_attribute is not None)
+
+    def snapshot(self):
+        '''The current values as a dict, which later steps leave as is.'''
+        values = dict(zip(self.names, self.vector.tolist()))
+        if self.all_attribute is not None:
+            values['__all__'] = getattr(self.game, self.all_attribute)
+        return values
+
+    def __repr__(self):
+        return repr(dict(self))
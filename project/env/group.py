@@ -1,4 +1,6 @@
 class Group:
+    __slots__ = ('_id', 'name', 'players', '_cached_score')
+
     def __init__(self, _id, name='', players=None):
         self._id = _id
         self.name = name
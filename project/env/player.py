@@ -1,4 +1,23 @@
+import numpy as np
+
+# Integer action protocol: one int32 row of ACTION_WIDTH per action, the
+# opcode followed by its int arguments (unused arguments are ignored).
+#   PICK, DUMP:                        resource id in the game's ResourceLayer
+#   MOVE:                              dx, dy
+#   REQUEST_MATCHING, END_BARGAINING:  to_player_id
+MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT, NO_ACT, PRODUCE, PICK, DUMP, MOVE, PICK_ANY, REQUEST_MATCHING, END_BARGAINING = range(12)
+ACTION_WIDTH = 3
+
+
 class Player:
+    __slots__ = (
+        '_id', 'name', 'job', 'game', '_obs_keys',
+        'x', 'y', 'next_x', 'next_y', 'next_scolled_x', 'next_scolled_y', 'is_moved', 'rotation', 'fov',
+        'resource_kinds', '_resource2id', 'counts', 'unit_scores', '_unlocked', 'inventory_changed', 'inventory_size', 'resource_total', 'resource_max_dict', 'resource_preference_dict',
+        'terminated', 'groups', 'group_dict',
+        'prev_score', 'score', '_shared_score_in', '_shared_score_out', 'reward',
+    )
+
     def __init__(
         self,
         player_id,
@@ -11,6 +30,7 @@ class Player:
         init_resources=[],
         resource_max_dict={},
         resource_preference_dict={},
+        resource_kinds=(),
     ):
         self._id = player_id
         self.name = name
@@ -28,8 +48,15 @@ class Player:
             self.fov = [fov[0], fov[1]]
         else:
             raise ValueError
-        # TODO
-        self.inventory = {}
+        # Inventory: amount held and unit score of every resource kind, in `resource_kinds` order
+        self.resource_kinds = resource_kinds
+        self._resource2id = {kind.name: i for i, kind in enumerate(resource_kinds)}
+        self.counts = np.zeros(len(resource_kinds), dtype=np.int64)
+        # Integer scores stay integers, like the scores of single resources
+        self.unit_scores = np.array([resource_preference_dict.get(kind.name, kind.unit_score) for kind in resource_kinds])
+        # RequirementTable bitmasks the inventory unlocks
+        self._unlocked = {}
+        self.inventory_changed = True
         self.inventory_size = inventory_size
         self.resource_total = 0
         self.resource_max_dict = resource_max_dict
@@ -46,33 +73,6 @@ class Player:
         self._shared_score_in = 0
         self._shared_score_out = 0
         self.reward = 0
-        # Observation functions
-        self._obs_funcs = {
-            'position': self._obs_position,
-            'inventory': self._obs_inventory,
-        }
-        # Action functions
-        self._action_funcs = {
-            'no_act': self._act_null,
-            'move': self._act_move,
-            'move_up': self._act_move_up,
-            'move_down': self._act_move_down,
-            'move_left': self._act_move_left,
-            'move_right': self._act_move_right,
-            'pick': self._act_pick,
-            'pick_by_name': self._act_pick_by_name,
-            'dump_by_name': self._act_dump_by_name,
-            'produce': self._act_produce,
-            'request_matching': self._act_request_matching,
-            'accept_proposal': self._act_accept_proposal,
-            'end_bargaining': self._act_end_bargaining,
-            'propose': self._act_propose,
-            'check_relation': self._act_check_relation,
-            'add_relation': self._act_add_relation,
-            'remove_relation': self._act_remove_relation,
-            'quit_group': self._act_quit_group,
-            'join_group': self._act_join_group,
-        }
 
     def join_game(self, game):
         self.game = game
@@ -80,6 +80,10 @@ class Player:
     def pre_update(self):
         pass
     
+    def apply_code(self, code):
+        '''Runs one integer action, `code` being [opcode, *args] (see ACTION_WIDTH).'''
+        self._code_funcs[code[0]](self, *code[1:])
+
     def update(self, actions):
         if not isinstance(actions, list):
             actions = [actions]
@@ -92,7 +96,7 @@ class Player:
                 kwargs = action.get('kwargs', {})
             else:
                 _action, kwargs = action
-            self._action_funcs[_action](**kwargs)
+            self._action_funcs[_action](self, **kwargs)
 
     def post_update(self):
         # Move
@@ -104,10 +108,7 @@ class Player:
         self.is_moved = False
         # Update score
         self.prev_score = self.score
-        self.score = 0
-        for resources in self.inventory.values():
-            for resource in resources:
-                self.score += resource.score
+        self.score = (self.counts @ self.unit_scores).item() if len(self.counts) else 0
         self.reward = self.score - self.prev_score
 
     def undo_action(self):
@@ -125,49 +126,46 @@ class Player:
         self.is_moved = True
 
     def pick_up(self, resource):
-        name = resource.name
-        if self.resource_total + resource.amount > self.inventory_size:
-            resource.amount = self.inventory_size - self.resource_total
-        if resource.amount <= 0:
+        self.pick_up_amount(resource.name, resource.amount)
+
+    def pick_up_amount(self, resource_name, n):
+        if self.resource_total + n > self.inventory_size:
+            n = self.inventory_size - self.resource_total
+        if n <= 0:
             return
-        if resource.name in self.resource_preference_dict:
-            resource.set_unit_score(self.resource_preference_dict[resource.name])
-        if name in self.inventory:
-            self.inventory[name].append(resource)
-        else:
-            self.inventory[name] = [resource]
+        self._change_amount(resource_name, n)
 
     def dump(self, resource_name, n):
-        resources = self.inventory.get(resource_name, [])
-        remain_n = n
-        while resources and remain_n > 0:
-            resource = resources[0]
-            dumped_resource = resource.provide(remain_n)
-            dumped_resource.set_position(self.position)
-            dumped_resource.reset_unit_score()
-            self.game.lay_resource(dumped_resource)
-            remain_n -= dumped_resource.amount
-            if not resource.is_available:
-                del resources[0]
+        dumped_n = min(n, self.amount(resource_name))
+        if dumped_n > 0:
+            self._change_amount(resource_name, -dumped_n)
+            self.game.resource_layer.lay(resource_name, self.position, dumped_n)
+
+    def amount(self, resource_name):
+        r = self._resource2id.get(resource_name)
+        return 0 if r is None else int(self.counts[r])
 
     def check_amount(self, resource_name, n):
-        resources = self.inventory.get(resource_name, [])
-        remain_n = n
-        for resource in resources:
-            remain_n -= resource.amount
-            if remain_n <= 0:
-                return True
-        return False
+        amount = self.amount(resource_name)
+        return amount > 0 and amount >= n
 
     def consume(self, resource_name, n):
-        resources = self.inventory.get(resource_name, [])
-        remain_n = n
-        while resources and remain_n > 0:
-            resource = resources[0]
-            remain_n = resource.consume(remain_n)
-            if not resource.is_available:
-                del resources[0]
-        return remain_n
+        consumed_n = min(n, self.amount(resource_name))
+        if consumed_n > 0:
+            self._change_amount(resource_name, -consumed_n)
+        return n - consumed_n
+
+    def _change_amount(self, resource_name, n):
+        self.counts[self._resource2id[resource_name]] += n
+        self._unlocked.clear()
+        self.inventory_changed = True
+
+    def unlocked(self, requirement_table):
+        '''Bitmask of the kinds of `requirement_table` this inventory unlocks, cached until it changes.'''
+        bits = self._unlocked.get(requirement_table)
+        if bits is None:
+            bits = self._unlocked[requirement_table] = requirement_table.unlocked(self)
+        return bits
 
     def earn_score(self, score):
         self._shared_score_in += score
@@ -211,7 +209,10 @@ class Player:
         }
         
     def get_inventory(self):
-        return [resource.observation for resources in self.inventory.values() for resource in resources]
+        return [
+            {'name': kind.name, 'amount': amount}
+            for kind, amount in zip(self.resource_kinds, self.counts.tolist()) if amount > 0
+        ]
 
     @property
     def observation(self):
@@ -220,7 +221,7 @@ class Player:
             'name': self.name,
         }
         for k in self._obs_keys:
-            obs[k] = self._obs_funcs[k]()
+            obs[k] = self._obs_funcs[k](self)
         return obs
 
     # @property
@@ -239,46 +240,43 @@ class Player:
     def next_scolled_position(self):
         return (self.next_scolled_x, self.next_scolled_y)
 
+    @property
+    def visible_resource_keys(self):
+        layer = self.game.resource_layer
+        visible = self.unlocked(layer.requirement_table)
+        keys = []
+        for position in self.game.resource_index.query(self.position, self.fov):
+            for name in layer.names_at(position):
+                if visible >> layer.resource_id(name) & 1:
+                    keys.append((name, position))
+        return keys
+
     @property
     def visible_resources(self):
-        x, y = self.position
-        h, v = self.fov
-        resources = []
-        for dh in range(-h, h + 1):
-            for dv in range(-v, v + 1):
-                scolled_x = (x + dh) % self.game.world_map.size_x
-                scolled_y = (y + dv) % self.game.world_map.size_y
-                resource = self.game.resource_dict.get((scolled_x, scolled_y))
-                if resource and resource.check_visible(self):
-                    resources.append(resource)
-        return resources
+        layer = self.game.resource_layer
+        return [
+            layer.create_resource(name, layer.amount(name, position).item(), position)
+            for name, position in self.visible_resource_keys
+        ]
 
     @property
     def visible_events(self):
-        x, y = self.position
-        h, v = self.fov
+        table = self.game.event_requirements
+        visible = self.unlocked(table)
         events = []
-        for dh in range(-h, h + 1):
-            for dv in range(-v, v + 1):
-                scolled_x = (x + dh) % self.game.world_map.size_x
-                scolled_y = (y + dv) % self.game.world_map.size_y
-                event = self.game.event_dict.get((scolled_x, scolled_y))
-                if event and event.check_visible(self):
-                    events.append(event)
+        for position in self.game.event_index.query(self.position, self.fov):
+            event = self.game.event_dict[position]
+            if visible & table.bits[event.kind]:
+                events.append(event)
         return events
 
     @property
     def visible_players(self):
-        x, y = self.position
-        h, v = self.fov
         players = []
-        for dh in range(-h, h + 1):
-            for dv in range(-v, v + 1):
-                scolled_x = (x + dh) % self.game.world_map.size_x
-                scolled_y = (y + dv) % self.game.world_map.size_y
-                player = self.game.player_position.get((scolled_x, scolled_y))
-                if player and player.name != self.name:
-                    players.append(player)
+        for position in self.game.player_index.query(self.position, self.fov):
+            player = self.game.player_position[position]
+            if player.name != self.name:
+                players.append(player)
         return players
 
     def _obs_grid(self):
@@ -288,7 +286,7 @@ class Player:
         return list(self.position)
 
     def _obs_inventory(self):
-        return [resource.observation for resources in self.inventory.values() for resource in resources]
+        return self.get_inventory()
 
     def _act_null(self, **kwargs):
         pass
@@ -309,20 +307,19 @@ class Player:
         self.move(1, 0)
 
     def _act_pick(self, **kwargs):
-        resource = self.game.resource_dict.get(self.position)
-        if resource and resource.check_visible(self):
-            resource = self.game.provide_resource(self.position)
-            if resource:
-                self.pick_up(resource)
-                # print(f'Player {self._id} picked up a {resource.name} at ({self.x}, {self.y}).')
+        stack = self.game.resource_layer.stack_at(self.position)
+        if stack:
+            self._act_pick_by_name(stack[0])
 
     def _act_pick_by_name(self, resource_name, **kwargs):
-        resource = self.game.bubble_up_resource(self.position, resource_name)
-        if resource and resource.check_visible(self):
-            resource = self.game.provide_resource(self.position)
-            if resource:
-                self.pick_up(resource)
-                # print(f'Player {self._id} picked up a {resource.name} at ({self.x}, {self.y}).')
+        layer = self.game.resource_layer
+        if layer.amount(resource_name, self.position) > 0:
+            # The resource comes on top of the stack even if the player cannot take it
+            layer.bubble_up(resource_name, self.position)
+            if layer.check_visible(resource_name, self):
+                amount = self.game.provide_resource(self.position, resource_name)
+                self.pick_up_amount(resource_name, amount)
+            # print(f'Player {self._id} picked up a {resource_name} at ({self.x}, {self.y}).')
 
     def _act_dump_by_name(self, resource_name, **kwargs):
         self.dump(resource_name, n=1)
@@ -339,8 +336,8 @@ class Player:
             # Produce
             for name, num in event.inputs.items():
                 self.consume(name, num)
-            for resource in event.provide():
-                self.pick_up(resource)
+            for name, num in event.outputs.items():
+                self.pick_up_amount(name, num)
                 # print(f'Player {self._id} produce: {resource.name} at ({self.x}, {self.y}).')
 
     def _act_add_relation(self, to_player_id, attributes_dict={}, **kwargs):
@@ -367,6 +364,7 @@ class Player:
         for pred, _, data in self.game.social.social_graph.out_edges(group, data=True):
             if attr in data:
                 data[attr] *= scale
+        self.game.social.touch()
 
     def _act_request_matching(self, to_player_id, **kwargs):
         self._act_add_relation(to_player_id, attributes_dict={'matching_request_step': self.game.steps})
@@ -374,10 +372,8 @@ class Player:
     def _act_accept_proposal(self, to_player_id, scale, **kwargs):
         social_graph = self.game.social.social_graph
         player_to = self.game.player_dict[to_player_id]
-        groupA = next((group for group in social_graph.predecessors(self)
-                       if social_graph.nodes[group].get('type') == 'group'), None)
-        groupB = next((group for group in social_graph.predecessors(player_to)
-                       if social_graph.nodes[group].get('type') == 'group'), None)
+        groupA = next(iter(self.game.social.groups_of(self)), None)
+        groupB = next(iter(self.game.social.groups_of(player_to)), None)
         accept_score1 = scale
         accept_score2 = 1 - scale
         if groupA is not None:
@@ -403,3 +399,82 @@ class Player:
 
     def _act_propose(self, to_player_id, score):
         self._act_add_relation(to_player_id, attributes_dict={'proposal': score})
+
+    # Observation and action functions by name
+    _obs_funcs = {
+        'position': _obs_position,
+        'inventory': _obs_inventory,
+    }
+    _action_funcs = {
+        'no_act': _act_null,
+        'move': _act_move,
+        'move_up': _act_move_up,
+        'move_down': _act_move_down,
+        'move_left': _act_move_left,
+        'move_right': _act_move_right,
+        'pick': _act_pick,
+        'pick_by_name': _act_pick_by_name,
+        'dump_by_name': _act_dump_by_name,
+        'produce': _act_produce,
+        'request_matching': _act_request_matching,
+        'accept_proposal': _act_accept_proposal,
+        'end_bargaining': _act_end_bargaining,
+        'propose': _act_propose,
+        'check_relation': _act_check_relation,
+        'add_relation': _act_add_relation,
+        'remove_relation': _act_remove_relation,
+        'quit_group': _act_quit_group,
+        'join_group': _act_join_group,
+    }
+
+    def _code_move_up(self, *args):
+        self.move(0, -1)
+
+    def _code_move_down(self, *args):
+        self.move(0, 1)
+
+    def _code_move_left(self, *args):
+        self.move(-1, 0)
+
+    def _code_move_right(self, *args):
+        self.move(1, 0)
+
+    def _code_null(self, *args):
+        pass
+
+    def _code_produce(self, *args):
+        self._act_produce()
+
+    def _code_pick(self, resource_id, *args):
+        self._act_pick_by_name(self.game.resource_layer.resource_names[resource_id])
+
+    def _code_dump(self, resource_id, *args):
+        self._act_dump_by_name(self.game.resource_layer.resource_names[resource_id])
+
+    def _code_move(self, dx, dy, *args):
+        self.move(dx, dy)
+
+    def _code_pick_any(self, *args):
+        self._act_pick()
+
+    def _code_request_matching(self, to_player_id, *args):
+        self._act_request_matching(to_player_id)
+
+    def _code_end_bargaining(self, to_player_id, *args):
+        self._act_end_bargaining(to_player_id)
+
+    # Indexed by opcode
+    _code_funcs = (
+        _code_move_up,
+        _code_move_down,
+        _code_move_left,
+        _code_move_right,
+        _code_null,
+        _code_produce,
+        _code_pick,
+        _code_dump,
+        _code_move,
+        _code_pick_any,
+        _code_request_matching,
+        _code_end_bargaining,
+    )
@@ -0,0 +1,34 @@
+import numpy as np
+
+
+class RequirementTable:
+    '''
+    Inventory requirements of a set of kinds (resource or event types), to
+    test a player's inventory against all of them at once. `unlocked` returns a
+    bitmask with the bit of every kind whose requirements are met; players
+    cache it until their inventory changes (see `Player.unlocked`).
+    '''
+    def __init__(self, kinds):
+        kinds = list(dict.fromkeys(kinds))
+        self.bits = {kind: 1 << i for i, kind in enumerate(kinds)}
+        self.names = list(dict.fromkeys(name for kind in kinds for name in kind.requirements))
+        name2id = {name: i for i, name in enumerate(self.names)}
+        self.amounts = np.zeros((len(kinds), len(self.names)), dtype=np.float64)
+        self.required = np.zeros((len(kinds), len(self.names)), dtype=bool)
+        for k, kind in enumerate(kinds):
+            for name, num in kind.requirements.items():
+                self.amounts[k, name2id[name]] = num
+                self.required[k, name2id[name]] = True
+        # Kinds without requirements are always unlocked
+        self._free = sum(bit for kind, bit in self.bits.items() if not kind.requirements)
+
+    def unlocked(self, player):
+        if not self.names:
+            return self._free
+        counts = np.array([player.amount(name) for name in self.names], dtype=np.float64)
+        # Same test as Player.check_amount
+        met = ~self.required | ((counts >= self.amounts) & (counts > 0))
+        return sum(1 << int(k) for k in np.flatnonzero(met.all(axis=1)))
+
+    def check(self, player, kind):
+        return bool(player.unlocked(self) & self.bits[kind])
@@ -1,4 +1,33 @@
+class ResourceKind:
+    '''
+    Immutable data shared by every resource of one type: name, type,
+    requirements and default unit score. Kinds are interned, so equal kinds
+    are one object however many resources use them.
+    '''
+    __slots__ = ('name', '_type', 'requirements', 'unit_score')
+    _interned = {}
+
+    def __init__(self, name, _type, requirements, unit_score):
+        self.name = name
+        self._type = _type
+        self.requirements = requirements
+        self.unit_score = unit_score
+
+    @classmethod
+    def get(cls, name, _type, requirements={}, unit_score=0):
+        key = (name, _type, unit_score, tuple(requirements.items()))
+        kind = cls._interned.get(key)
+        if kind is None:
+            kind = cls._interned[key] = cls(name, _type, requirements, unit_score)
+        return kind
+
+    def __reduce__(self):
+        return (ResourceKind.get, (self.name, self._type, self.requirements, self.unit_score))
+
+
 class Resource:
+    __slots__ = ('kind', 'x', 'y', 'amount', 'unit_score', 'stacked_resource')
+
     def __init__(
         self,
         name,
@@ -9,33 +38,39 @@ class Resource:
         unit_score=0,
         stacked_resource=None
     ):
-        self.name = name
-        self._type = _type
+        self.kind = ResourceKind.get(name, _type, requirements, unit_score)
         if position:
             self.x, self.y = position
         else:
             # Carried by a player
             self.x, self.y = None, None
         self.amount = amount
-        self.requirements = requirements
-        self.default_unit_score = unit_score
         self.unit_score = unit_score
         self.stacked_resource = stacked_resource
 
+    @classmethod
+    def of_kind(cls, kind, position, amount):
+        resource = cls.__new__(cls)
+        resource.kind = kind
+        if position:
+            resource.x, resource.y = position
+        else:
+            resource.x, resource.y = None, None
+        resource.amount = amount
+        resource.unit_score = kind.unit_score
+        resource.stacked_resource = None
+        return resource
+
     def update(self):
         pass
 
     def provide(self, n):
         result = min(n, self.amount)
         self.amount -= result
-        return Resource(
-            name=self.name,
-            _type=self._type,
-            position=None,
-            amount=result,
-            requirements=self.requirements,
-            unit_score=self.unit_score,
-        )
+        kind = self.kind
+        if self.unit_score != kind.unit_score:
+            kind = ResourceKind.get(kind.name, kind._type, kind.requirements, self.unit_score)
+        return Resource.of_kind(kind, None, result)
 
     def add(self, n):
         self.amount += n
@@ -67,6 +102,22 @@ class Resource:
             'amount': self.amount
         }
 
+    @property
+    def name(self):
+        return self.kind.name
+
+    @property
+    def _type(self):
+        return self.kind._type
+
+    @property
+    def requirements(self):
+        return self.kind.requirements
+
+    @property
+    def default_unit_score(self):
+        return self.kind.unit_score
+
     @property
     def observation(self):
         obs = {
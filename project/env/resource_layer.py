@@ -0,0 +1,133 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+from .requirement_table import RequirementTable
+from .resource import Resource, ResourceKind
+from .spatial_index import SpatialIndex
+
+
+class ResourceLayer:
+    '''
+    Resources lying on the map, stored as an (R, H, W) amount tensor indexed by
+    [resource_id, y, x]. Per-type data is shared by every cell: unit scores
+    on the interned ResourceKinds of `kinds`, requirements as the amounts and
+    bitmasks of `requirement_table`.
+
+    The resources of a cell form a stack, each type once with its total
+    amount: laying a resource or picking it by name puts its type on top, and
+    `pick` takes from the top.
+    '''
+    def __init__(self, resource_config, size_x, size_y):
+        self.resource_config = resource_config
+        self.resource_names = list(resource_config.keys())
+        self.resource_num = len(self.resource_names)
+        self._resource2id = {name: i for i, name in enumerate(self.resource_names)}
+        self.kinds = [
+            ResourceKind.get(
+                name,
+                resource_config[name]['type'],
+                resource_config[name].get('requirements', {}),
+                resource_config[name].get('score', 0),
+            )
+            for name in self.resource_names
+        ]
+        self.requirement_table = RequirementTable(self.kinds)
+        self.size_x, self.size_y = size_x, size_y
+        self.amounts = np.zeros((self.resource_num, size_y, size_x), dtype=np.int64)
+        # When each type last came on top of its cell's stack
+        self.stacked_at = np.zeros((self.resource_num, size_y, size_x), dtype=np.int64)
+        self._clock = 0
+        # Non-empty cells
+        self.index = SpatialIndex(size_x, size_y)
+        # Cells changed since the game last built observations
+        self.dirty_cells = set()
+
+    def resource_id(self, name):
+        return self._resource2id[name]
+
+    def amount(self, name, position):
+        x, y = position
+        return self.amounts[self._resource2id[name], y, x]
+
+    def lay(self, name, position, n):
+        x, y = position
+        if not self.amounts[:, y, x].any():
+            self.index.add((x, y))
+        self.amounts[self._resource2id[name], y, x] += n
+        self.bubble_up(name, position)
+        self.dirty_cells.add((x, y))
+
+    def provide(self, name, position, n=1):
+        x, y = position
+        r = self._resource2id[name]
+        result = min(n, self.amounts[r, y, x])
+        self.amounts[r, y, x] -= result
+        self.dirty_cells.add((x, y))
+        if not self.amounts[:, y, x].any():
+            self.index.discard((x, y))
+        return int(result)
+
+    def bubble_up(self, name, position):
+        x, y = position
+        self._clock += 1
+        self.stacked_at[self._resource2id[name], y, x] = self._clock
+
+    def names_at(self, position):
+        x, y = position
+        return [self.resource_names[r] for r in np.flatnonzero(self.amounts[:, y, x])]
+
+    def stack_at(self, position):
+        '''Names of the resources of a cell, from the top of its stack down.'''
+        x, y = position
+        present = np.flatnonzero(self.amounts[:, y, x])
+        order = present[np.argsort(-self.stacked_at[present, y, x], kind='stable')]
+        return [self.resource_names[r] for r in order]
+
+    def check_visible(self, name, player):
+        return bool(player.unlocked(self.requirement_table) >> self._resource2id[name] & 1)
+
+    def create_resource(self, name, amount, position=None):
+        return Resource.of_kind(self.kinds[self._resource2id[name]], position, amount)
+
+    def get_dict_info(self, name, position):
+        return {
+            'name': name,
+            'position': position,
+            'amount': self.amount(name, position).item(),
+        }
+
+    def as_dict(self):
+        return ResourceDictView(self)
+
+
+class ResourceDictView(Mapping):
+    '''
+    Read-only `{position: Resource}` view of a ResourceLayer. Every resource type
+    on a cell is materialized as a Resource chained through `stacked_resource`,
+    from the top of the cell's stack down.
+    '''
+    def __init__(self, layer):
+        self.layer = layer
+
+    def __getitem__(self, position):
+        position = tuple(position)
+        resource = None
+        for name in reversed(self.layer.stack_at(position)):
+            stacked_resource = resource
+            resource = self.layer.create_resource(name, self.layer.amount(name, position).item(), position)
+            resource.stacked_resource = stacked_resource
+        if resource is None:
+            raise KeyError(position)
+        return resource
+
+    def __iter__(self):
+        for bucket in list(self.layer.index.buckets.values()):
+            yield from list(bucket)
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.layer.index.buckets.values())
+
+    def __contains__(self, position):
+        x, y = position
+        return bool(self.layer.amounts[:, y, x].any())
@@ -0,0 +1,51 @@
+import time
+
+
+class RulePipeline:
+    '''
+    Social rules compiled from a `pre_updates`/`post_updates` config. Every
+    entry is resolved to its handler once, and the rules run in config order.
+    Rules that look for edges use the per-attribute index of `Social`, so they
+    only visit edges carrying the attribute they care about. `Social` keeps
+    that index up to date as relations are added and removed, so rules never
+    rebuild it, even when an earlier rule of the step changed the graph.
+    Time spent in each rule is accumulated in `timings`.
+    '''
+    def __init__(self, func_args, func_dict):
+        self.rules = []
+        for func in func_args:
+            if isinstance(func, str):
+                name, kwargs = func, {}
+            elif isinstance(func, dict):
+                name, kwargs = func['function'], func.get('kwargs', {})
+            else:
+                name, kwargs = func
+            if name not in func_dict:
+                raise KeyError(f'Unknown social rule: {name}')
+            self.rules.append((name, func_dict[name], kwargs))
+        self.timings = {name: 0.0 for name, _, _ in self.rules}
+        self.calls = 0
+
+    def __call__(self):
+        for name, func, kwargs in self.rules:
+            start = time.perf_counter()
+            func(**kwargs)
+            self.timings[name] += time.perf_counter() - start
+        self.calls += 1
+
+    def __len__(self):
+        return len(self.rules)
+
+    def report(self):
+        '''Total and per-call seconds spent in each rule.'''
+        return {
+            name: {
+                'total': total,
+                'per_call': total / self.calls if self.calls else 0.0,
+            }
+            for name, total in self.timings.items()
+        }
+
+    def reset_timings(self):
+        self.timings = dict.fromkeys(self.timings, 0.0)
+        self.calls = 0
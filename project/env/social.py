@@ -1,25 +1,62 @@
 import networkx as nx
+import numpy as np
 from .group import Group
 
 
 class Social:
+    '''
+    Social graph of players and groups. `social_graph` is a networkx DiGraph
+    and is the read API; every change goes through the methods here, which
+    also maintain:
+        nodes_by_type:   {'player' | 'group': {node: None}}, in graph order
+        attribute_edges: {attribute: {(u, v): None}}, edges carrying an attribute
+        memberships:     {player: {group: None}}, in joining order
+    '''
     def __init__(self, players):
         self.players = players
-        self.social_graph = nx.DiGraph()
-        for player in players:
-            self.social_graph.add_node(player)
-            self.social_graph.nodes[player].update(
-                {
-                    'type': 'player',
-                    'id': player._id
-                }
-            )
-            self.social_graph.nodes[player]['_dict_view'] = self.node_to_dict(self.social_graph.nodes[player])
+        self._reset_graph()
         self.group_dict = {}
         self.next_group_id = 0
         self.obs = {}
         self.sharings = {}
         self.communications = []
+        # Bumped on every change so that observers can reuse what they derived from the graph
+        self.version = 0
+        self._snapshot = None
+
+    def _reset_graph(self):
+        self.social_graph = nx.DiGraph()
+        self.nodes_by_type = {'player': {}, 'group': {}}
+        self.attribute_edges = {}
+        self.memberships = {}
+        # Insertion ranks, to list indexed edges in the order networkx iterates them
+        self._node_rank = {}
+        self._edge_rank = {}
+        self._next_rank = 0
+        for player in self.players:
+            self._add_node(player, 'player', player._id)
+            self.memberships[player] = {}
+
+    def touch(self):
+        self.version += 1
+
+    def snapshot(self):
+        if self._snapshot is None or self._snapshot.version != self.version:
+            self._snapshot = SocialSnapshot(self.social_graph, self.version)
+        return self._snapshot
+
+    def edges_with(self, attribute):
+        '''Edges (u, v) carrying `attribute`, in graph order.'''
+        edges = self.attribute_edges.get(attribute)
+        if not edges:
+            return []
+        return sorted(edges, key=self._edge_order)
+
+    def groups_of(self, player):
+        return list(self.memberships[player])
+
+    def get_groups(self):
+        return list(self.nodes_by_type['group'])
 
     def check_relation(self, player_from, player_to, **attr):
         if self.social_graph.has_edge(player_from, player_to):
@@ -28,61 +65,113 @@ class Social:
         return False
 
     def add_relation(self, player_from, player_to, **attr):
-        self.social_graph.add_edge(player_from, player_to, **attr)
-        self.update_edge_dict(player_from, player_to)
+        self._set_edge(player_from, player_to, attr)
+        self.touch()
 
     def remove_relation(self, player_from, player_to, attribute):
+        self.touch()
         if attribute in self.social_graph.edges[player_from, player_to]:
-            del self.social_graph.edges[player_from, player_to][attribute]
-            del self.social_graph.edges[player_from, player_to]['_dict_view']['attributes'][attribute]
-        if len(self.social_graph.edges[player_from, player_to]) == 1:
-            assert '_dict_view' in self.social_graph.edges[player_from, player_to]
-            self.social_graph.remove_edge(player_from, player_to)
+            self._discard_attribute(player_from, player_to, attribute)
+        if not self.social_graph.edges[player_from, player_to]:
+            self._remove_edge(player_from, player_to)
+
+    def discard_attribute(self, u, v, attribute):
+        '''Removes `attribute` from the edge, keeping the edge even if it is left empty.'''
+        self._discard_attribute(u, v, attribute)
+        self.touch()
+
+    def remove_edge(self, u, v):
+        self._remove_edge(u, v)
+        self.touch()
 
     def create_group(self, name='', **attr):
         group = Group(_id=self.next_group_id, name=name, players=[])
         self.group_dict[self.next_group_id] = group
         self.next_group_id += 1
-        self.social_graph.add_node(group, **attr)
-        self.social_graph.nodes[group].update(
-            {
-                'type': 'group',
-                'id': group._id,
-            }
-        )
-        self.social_graph.nodes[group]['_dict_view'] = self.node_to_dict(self.social_graph.nodes[group])
+        self._add_node(group, 'group', group._id, **attr)
+        self.touch()
         return group
 
     def remove_group(self, group):
         for player in group.players:
             self.quit_group(player, group)
+        for u, v in list(self.social_graph.in_edges(group)) + list(self.social_graph.out_edges(group)):
+            self._remove_edge(u, v)
         self.social_graph.remove_node(group)
+        del self.nodes_by_type['group'][group]
+        del self._node_rank[group]
         self.group_dict.pop(group._id, None)
+        self.touch()
 
     def join_group(self, player, group, **attr):
-        self.social_graph.add_edge(group, player, **attr)
-        self.update_edge_dict(group, player)
+        self._set_edge(group, player, attr)
         player.join_group(group, list(attr.keys()))
         group.add_player(player)
+        self.touch()
 
     def quit_group(self, player, group, attributes=None):
+        self.touch()
         if attributes is None:
             attributes = []
         if attributes:
-            d = self.social_graph.edges[group, player]
             for attribute in attributes:
-                del d[attribute]
-                del d['_dict_view']['attributes'][attribute]
-            if len(d) == 1:
-                assert '_dict_view' in d
-                self.social_graph.remove_edge(group, player)
+                self._discard_attribute(group, player, attribute)
+            if not self.social_graph.edges[group, player]:
+                self._remove_edge(group, player)
                 player.quit_group(group, attributes)
                 group.remove_player(player)
         else:
-            self.social_graph.remove_edge(group, player)
+            self._remove_edge(group, player)
             player.quit_group(group)
             group.remove_player(player)
 
+    def _add_node(self, node, _type, _id, **attr):
+        self.social_graph.add_node(node, **attr)
+        self.social_graph.nodes[node].update(
+            {
+                'type': _type,
+                'id': _id,
+            }
+        )
+        self.nodes_by_type[_type][node] = None
+        self._node_rank[node] = self._next_rank
+        self._next_rank += 1
+
+    def _set_edge(self, u, v, attr):
+        edge = (u, v)
+        if not self.social_graph.has_edge(u, v):
+            self._edge_rank[edge] = self._next_rank
+            self._next_rank += 1
+            if self._is_membership(u, v):
+                self.memberships[v][u] = None
+        self.social_graph.add_edge(u, v, **attr)
+        for attribute in attr:
+            if attribute in self.attribute_edges:
+                self.attribute_edges[attribute][edge] = None
+            else:
+                self.attribute_edges[attribute] = {edge: None}
+
+    def _discard_attribute(self, u, v, attribute):
+        del self.social_graph.edges[u, v][attribute]
+        edges = self.attribute_edges[attribute]
+        del edges[(u, v)]
+        if not edges:
+            del self.attribute_edges[attribute]
+
+    def _remove_edge(self, u, v):
+        for attribute in list(self.social_graph.edges[u, v]):
+            self._discard_attribute(u, v, attribute)
+        self.social_graph.remove_edge(u, v)
+        del self._edge_rank[(u, v)]
+        if self._is_membership(u, v):
+            del self.memberships[v][u]
+
+    def _is_membership(self, u, v):
+        return u in self.nodes_by_type['group'] and v in self.nodes_by_type['player']
+
+    def _edge_order(self, edge):
+        return self._node_rank[edge[0]], self._edge_rank[edge]
+
     def merge_group(self, attribute):
         for player in self.players:
             groups = player.group_dict.get(attribute, [])
@@ -119,21 +208,13 @@ class Social:
             groups = player.groups.copy()
             for group in groups:
                 self.quit_group(player, group)
-        self.social_graph = nx.DiGraph()
-        for player in self.players:
-            self.social_graph.add_node(player)
-            self.social_graph.nodes[player].update(
-                {
-                    'type': 'player',
-                    'id': player._id,
-                }
-            )
-            self.social_graph.nodes[player]['_dict_view'] = self.node_to_dict(self.social_graph.nodes[player])
+        self._reset_graph()
         self.group_dict = {}
         self.next_group_id = 0
         self.obs = {}
         self.sharings = {}
         self.communications = []
+        self.touch()
 
     def load_graph(self, config):
         for c in config["relations"]:
@@ -155,21 +236,11 @@ class Social:
                 self.join_group(self.players[_id], group, **a)
 
     def get_node_list(self):
-        return [data for _, data in self.social_graph.nodes(data='_dict_view')]
-    
+        return [self.node_to_dict(data) for _, data in self.social_graph.nodes(data=True)]
+
     def get_edge_list(self):
-        return [data for _, _, data in self.social_graph.edges(data='_dict_view')]
-        
-    def update_edge_dict(self, u, v):
-        if '_dict_view' not in self.social_graph.edges[u, v]:
-            self.social_graph.edges[u, v]['_dict_view'] = self.edge_to_dict(
-                u, v, {k: v for k, v in self.social_graph.edges[u, v].items() if k != '_dict_view'}
-            )
-        else:
-            self.social_graph.edges[u, v]['_dict_view']["attributes"].update({
-                k: v for k, v in self.social_graph.edges[u, v].items() if k != '_dict_view'
-            })
-        
+        return [self.edge_to_dict(u, v, dict(data)) for u, v, data in self.social_graph.edges(data=True)]
+
     def node_to_dict(self, attr):
         return {
                 "type": attr["type"],
@@ -193,3 +264,141 @@ class Social:
     def observation(self):
         # TODO
         return self.obs
+
+
+class SocialSnapshot:
+    '''
+    Immutable array form of the social graph at one version, shared by every
+    player's observation. Nodes are numbered in graph order:
+        node_types:   (V,)   PLAYER or GROUP
+        node_ids:     (V,)   player or group id
+        edge_index:   (2, E) [from, to] node numbers, grouped by `from`
+        indptr:       (V+1,) CSR row pointers over `edge_index[1]`
+        columns:      {attribute: (E,) object array, None where unset}
+    '''
+    NODE_TYPES = ('player', 'group')
+    PLAYER, GROUP = 0, 1
+
+    def __init__(self, social_graph, version):
+        self.version = version
+        nodes = list(social_graph.nodes)
+        node_number = {node: i for i, node in enumerate(nodes)}
+        node_data = [social_graph.nodes[node] for node in nodes]
+        self.node_types = self._frozen([self.NODE_TYPES.index(d['type']) for d in node_data], np.int8)
+        self.node_ids = self._frozen([d['id'] for d in node_data], np.int64)
+        self.node_keys = tuple(f"{d['type']}_{d['id']}" for d in node_data)
+        self._node_numbers = {key: i for i, key in enumerate(self.node_keys)}
+
+        edges = list(social_graph.edges(data=True))
+        src = np.array([node_number[u] for u, _, _ in edges], dtype=np.int64)
+        dst = np.array([node_number[v] for _, v, _ in edges], dtype=np.int64)
+        order = np.argsort(src, kind='stable')
+        self.edge_index = self._frozen(np.stack([src[order], dst[order]]), np.int64)
+        self.indptr = self._frozen(np.concatenate(([0], np.cumsum(np.bincount(src, minlength=len(nodes))))), np.int64)
+        columns = {}
+        for e, (_, _, data) in enumerate(edges):
+            for attribute, value in data.items():
+                if attribute not in columns:
+                    columns[attribute] = np.full(len(edges), None, dtype=object)
+                columns[attribute][e] = value
+        for column in columns.values():
+            column[:] = column[order]
+            column.setflags(write=False)
+        self.columns = columns
+        self._adjacency = {}
+        self._memberships = None
+        self._same_groups = None
+
+    @property
+    def node_num(self):
+        return len(self.node_keys)
+
+    @property
+    def edge_num(self):
+        return self.edge_index.shape[1]
+
+    def node_number(self, _type, _id):
+        return self._node_numbers[f'{_type}_{_id}']
+
+    def successors(self, node):
+        return self.edge_index[1, self.indptr[node]:self.indptr[node + 1]]
+
+    def has_edge(self, u, v):
+        return bool((self.successors(u) == v).any())
+
+    def out_edges_with(self, node, attribute):
+        '''(successor, value) of the edges leaving `node` that carry `attribute`.'''
+        column = self.columns.get(attribute)
+        if column is None:
+            return []
+        start, end = self.indptr[node], self.indptr[node + 1]
+        return [
+            (int(v), value) for v, value in zip(self.edge_index[1, start:end], column[start:end])
+            if value is not None
+        ]
+
+    def edge_attribute(self, u, v, attribute, default=None):
+        column = self.columns.get(attribute)
+        hits = np.flatnonzero(self.successors(u) == v)
+        if column is None or not hits.size:
+            return default
+        value = column[self.indptr[u] + hits[0]]
+        return default if value is None else value
+
+    def adjacency(self, node2id=None):
+        '''
+        (from, to) adjacency matrix. With `node2id` ({"<type>_<id>": row}) the
+        rows follow that numbering instead of the graph order.
+        '''
+        key = None if node2id is None else tuple(node2id.items())
+        if key not in self._adjacency:
+            src, dst = self.edge_index
+            if node2id is None:
+                size = self.node_num
+            else:
+                size = len(node2id)
+                number = np.array([node2id.get(k, -1) for k in self.node_keys], dtype=np.int64)
+                src, dst = number[src], number[dst]
+                missing = np.flatnonzero((src < 0) | (dst < 0))
+                if missing.size:
+                    u, v = self.edge_index[:, missing[0]]
+                    raise KeyError(self.node_keys[u] if src[missing[0]] < 0 else self.node_keys[v])
+            adj_matrix = np.zeros((size, size), dtype=np.int8)
+            adj_matrix[src, dst] = 1
+            adj_matrix.setflags(write=False)
+            self._adjacency[key] = adj_matrix
+        return self._adjacency[key]
+
+    def memberships(self, player_num):
+        '''(player_num, group_num) matrix of the groups with an edge to each player, in graph order.'''
+        if self._memberships is None:
+            groups = np.flatnonzero(self.node_types == self.GROUP)
+            membership = np.zeros((player_num, len(groups)), dtype=bool)
+            src, dst = self.edge_index
+            is_member = (self.node_types[src] == self.GROUP) & (self.node_types[dst] == self.PLAYER)
+            group_column = np.searchsorted(groups, src[is_member])
+            membership[self.node_ids[dst[is_member]], group_column] = True
+            membership.setflags(write=False)
+            self._memberships = membership
+        return self._memberships
+
+    def same_groups(self, player_num):
+        '''
+        (player_num, player_num) matrix of players that belong to exactly the
+        same non-empty set of groups.
+        '''
+        if self._same_groups is None:
+            membership = self.memberships(player_num)
+            same = (membership[:, None, :] == membership[None, :, :]).all(axis=-1)
+            same &= membership.any(axis=-1)[:, None]
+            np.fill_diagonal(same, False)
+            same = same.astype(np.int16)
+            same.setflags(write=False)
+            self._same_groups = same
+        return self._same_groups
+
+    @staticmethod
+    def _frozen(values, dtype):
+        array = np.array(values, dtype=dtype)
+        array.setflags(write=False)
+        return array
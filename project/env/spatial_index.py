@@ -0,0 +1,77 @@
+class SpatialIndex:
+    '''
+    Bucketed grid over the occupied cells of a toroidal map.
+    `query` returns the occupied cells in a field of view, in the same order
+    (and with the same repetitions when the view is wider than the map) as a
+    per-cell scan, at the cost of the buckets and objects inside the view.
+    '''
+    def __init__(self, size_x, size_y, bucket_size=8, positions=()):
+        self.size_x = size_x
+        self.size_y = size_y
+        self.bucket_size = bucket_size
+        self.buckets = {}
+        for position in positions:
+            self.add(position)
+
+    def add(self, position):
+        key = self._bucket(position)
+        if key in self.buckets:
+            self.buckets[key].add(position)
+        else:
+            self.buckets[key] = {position}
+
+    def discard(self, position):
+        key = self._bucket(position)
+        bucket = self.buckets.get(key)
+        if bucket:
+            bucket.discard(position)
+            if not bucket:
+                del self.buckets[key]
+
+    def update(self, old_positions, new_positions):
+        for position in old_positions - new_positions:
+            self.discard(position)
+        for position in new_positions - old_positions:
+            self.add(position)
+
+    def query(self, position, fov):
+        x, y = position
+        h, v = fov
+        bucket_xs = self._bucket_range(x - h, x + h, self.size_x)
+        bucket_ys = self._bucket_range(y - v, y + v, self.size_y)
+        hits = []
+        for bx in bucket_xs:
+            for by in bucket_ys:
+                for pos in self.buckets.get((bx, by), ()):
+                    for dh in self._offsets(pos[0] - x, h, self.size_x):
+                        for dv in self._offsets(pos[1] - y, v, self.size_y):
+                            hits.append((dh, dv, pos))
+        hits.sort()
+        return [pos for _, _, pos in hits]
+
+    def in_window(self, position, fov, target):
+        dx = (target[0] - position[0] + fov[0]) % self.size_x
+        dy = (target[1] - position[1] + fov[1]) % self.size_y
+        return dx <= 2 * fov[0] and dy <= 2 * fov[1]
+
+    def _bucket(self, position):
+        return position[0] // self.bucket_size, position[1] // self.bucket_size
+
+    def _bucket_range(self, start, end, size):
+        if end - start + 1 >= size:
+            return range((size - 1) // self.bucket_size + 1)
+        start, end = start % size, end % size
+        if start <= end:
+            return range(start // self.bucket_size, end // self.bucket_size + 1)
+        return set(range(start // self.bucket_size, (size - 1) // self.bucket_size + 1)) \
+            | set(range(end // self.bucket_size + 1))
+
+    @staticmethod
+    def _offsets(delta, radius, size):
+        # All d in [-radius, radius] with d == delta (mod size)
+        d = (delta + radius) % size - radius
+        offsets = []
+        while d <= radius:
+            offsets.append(d)
+            d += size
+        return offsets
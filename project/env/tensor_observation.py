@@ -0,0 +1,184 @@
+import numpy as np
+
+
+class TensorObservation:
+    '''
+    Egocentric observation tensors read straight from the game state, without
+    building the observation dicts. Every player gets the (2 + 2 * R, H, W)
+    int16 grid its agent's State builds from the dicts: players (id + 1),
+    blocks, events (-in / out) and resources, with resource channels in the
+    order of `resource_names` and cells indexed [x, y].
+        grid_view='map': the whole map centered on the player, with what it
+                         sees and what other players share with it, shared
+                         the way the agents' `State.sharing_obs` does
+        grid_view='fov': the player's field of view
+    `encode` returns the grids of all players stacked as (P, C, H, W), and
+    their inventories as (P, R).
+    '''
+    GRID_VIEWS = ('map', 'fov')
+
+    def __init__(self, game, resource_names, event_config, grid_view='map'):
+        if grid_view not in self.GRID_VIEWS:
+            raise ValueError(f'Unknown grid view: {grid_view}')
+        self.game = game
+        self.grid_view = grid_view
+        self.resource_names = list(resource_names)
+        self.resource_num = len(self.resource_names)
+        self._resource2id = dict(zip(self.resource_names, range(self.resource_num)))
+        self.size_x, self.size_y = game.world_map.shape
+        self.fovs = np.array([player.fov for player in game.players], dtype=np.int64).reshape(-1, 2)
+        if grid_view == 'map':
+            self.shape = (self.size_x, self.size_y)
+            self.ref_points = np.tile([self.size_x // 2, self.size_y // 2], (len(self.fovs), 1))
+        else:
+            if (self.fovs != self.fovs[:1]).any():
+                raise ValueError('Players with different fields of view cannot share a fov grid')
+            self.shape = (2 * self.fovs[0, 0] + 1, 2 * self.fovs[0, 1] + 1)
+            self.ref_points = self.fovs
+        self.channel_num = 2 + 2 * self.resource_num
+        # Layer resources that have a channel
+        layer = game.resource_layer
+        self._layer_names = [name for name in layer.resource_names if name in self._resource2id]
+        self._layer_ids = np.array([layer.resource_id(name) for name in self._layer_names], dtype=np.int64)
+        self._channel_ids = np.array([self._resource2id[name] for name in self._layer_names], dtype=np.int64)
+        self._build_events(event_config)
+
+    def _build_events(self, event_config):
+        # Events never move: a map of event ids, and the channels each event sets.
+        # The last row stands for cells without an event.
+        names = list(dict.fromkeys(event.name for event in self.game.events))
+        event2id = dict(zip(names, range(len(names))))
+        self._event_ids = np.full((self.size_x, self.size_y), -1, dtype=np.int64)
+        self._event_kinds = [None for _ in names]
+        for event in self.game.events:
+            self._event_ids[event.x, event.y] = event2id[event.name]
+            self._event_kinds[event2id[event.name]] = event.kind
+        self._event_table = np.zeros((len(names) + 1, self.resource_num), dtype=np.int16)
+        self._event_sets = np.zeros((len(names) + 1, self.resource_num), dtype=bool)
+        for i, name in enumerate(names):
+            for key, sign in (('in', -1), ('out', 1)):
+                for resource_name, amount in event_config[name][key].items():
+                    self._event_table[i, self._resource2id[resource_name]] = sign * amount
+                    self._event_sets[i, self._resource2id[resource_name]] = True
+
+    def _visibility(self, players):
+        # Resource channels and events every player meets the requirements of
+        layer_bits = np.array([1 << int(r) for r in self._layer_ids], dtype=object)
+        event_bits = np.array([self.game.event_requirements.bits[kind] for kind in self._event_kinds], dtype=object)
+        resources = np.zeros((len(players), self.resource_num), dtype=bool)
+        events = np.zeros((len(players), len(self._event_kinds) + 1), dtype=bool)
+        for i, player in enumerate(players):
+            resources[i, self._channel_ids] = (player.unlocked(self.game.resource_layer.requirement_table) & layer_bits) != 0
+            events[i, :-1] = (player.unlocked(self.game.event_requirements) & event_bits) != 0
+        return resources, events
+
+    def _window(self, rows, cols, position, fov):
+        # How many times the cells of a grid lie in the field of view of a player at `position`:
+        # once, unless the field of view is wider than the map
+        in_rows = (rows - position[0] + fov[0]) % self.size_x
+        in_cols = (cols - position[1] + fov[1]) % self.size_y
+        in_rows = np.where(in_rows <= 2 * fov[0], (2 * fov[0] - in_rows) // self.size_x + 1, 0)
+        in_cols = np.where(in_cols <= 2 * fov[1], (2 * fov[1] - in_cols) // self.size_y + 1, 0)
+        return in_rows[..., :, None] * in_cols[..., None, :]
+
+    def _sharers(self):
+        # Players every player gets the map of, in the order of its `sharings` observation
+        graph = self.game.social.social_graph
+        index = {player: i for i, player in enumerate(self.game.players)}
+        return [
+            [index[u] for u, _, attr in graph.in_edges(player, data='sharing', default={}) if attr and attr.get('Map') is True]
+            for player in self.game.players
+        ]
+
+    def _sees(self, players, positions):
+        # Players look others up where the game last indexed them, like `Player.visible_players`
+        indexed = {player: position for position, player in self.game.player_position.items()}
+        known = np.array([player in indexed for player in players], dtype=bool)
+        lookup = np.array([indexed.get(player, (0, 0)) for player in players], dtype=np.int64).reshape(-1, 2)
+        size = np.array([self.size_x, self.size_y])
+        fovs = self.fovs[:, None]
+        sees = (((lookup[None] - positions[:, None] + fovs) % size <= 2 * fovs).all(axis=-1)) & known[None]
+        np.fill_diagonal(sees, False)
+        return sees
+
+    def _write_players(self, out, players, positions, visible):
+        # Players are drawn where they stand
+        size = np.array([self.size_x, self.size_y])
+        ids = np.array([player._id + 1 for player in players], dtype=np.int16)
+        index = np.arange(len(players))
+        out[index, self.ref_points[:, 0], self.ref_points[:, 1]] = ids
+        relative = (positions[None] - positions[:, None] + self.ref_points[:, None]) % size
+        receiver, other = np.nonzero(visible & (relative < self.shape).all(axis=-1))
+        out[receiver, relative[receiver, other, 0], relative[receiver, other, 1]] = ids[other]
+
+    def _share(self, positions, blocks, resources, events, visible):
+        '''
+        Adds what every player gets from the players sharing their map with
+        it to its (P, ...) world masks, as `State.sharing_obs` does on the
+        observation dicts. Players are processed in order and extend their own
+        lists in place, so a player also gets what a sharer processed before
+        it got itself, and a resource it does not list yet is listed once.
+        Every sharer's block grid is placed around the position of a shared
+        player it finds in its player list, pairing both lists in order, like
+        `State.process_obs`.
+        '''
+        map_blocks = self.game.world_map.map_data.T > 0
+        for receiver, sharers in enumerate(self._sharers()):
+            for sharer in sharers:
+                np.maximum(resources[receiver], resources[sharer] > 0, out=resources[receiver])
+                events[receiver] |= events[sharer]
+                visible[receiver] |= visible[sharer]
+            found = [sharer for sharer in sharers if visible[receiver, sharer]]
+            for sharer, at in zip(sharers, found):
+                offsets = [np.arange(-f, f + 1) for f in self.fovs[sharer]]
+                source = np.ix_((positions[sharer, 0] + offsets[0]) % self.size_x, (positions[sharer, 1] + offsets[1]) % self.size_y)
+                target = np.ix_((positions[at, 0] + offsets[0]) % self.size_x, (positions[at, 1] + offsets[1]) % self.size_y)
+                blocks[receiver][target] |= map_blocks[source]
+
+    def inventories(self):
+        inventory = np.zeros((len(self.game.players), self.resource_num), dtype=np.int16)
+        inventory[:, self._channel_ids] = self.game.inventories()[:, self._layer_ids]
+        return inventory
+
+    def encode(self):
+        players = self.game.players
+        positions = np.array([player.position for player in players], dtype=np.int64).reshape(-1, 2)
+        # World cells of every grid cell
+        rows = (positions[:, :1] - self.ref_points[:, :1] + np.arange(self.shape[0])) % self.size_x
+        cols = (positions[:, 1:] - self.ref_points[:, 1:] + np.arange(self.shape[1])) % self.size_y
+        cells = (np.arange(len(players))[:, None, None], rows[:, :, None], cols[:, None, :])
+        # Items the dicts list several times are drawn once, where a field of view wider than the map first shows them
+        single = (np.arange(self.shape[0]) < self.size_x)[:, None] & (np.arange(self.shape[1]) < self.size_y)[None, :]
+        visible_resources, visible_events = self._visibility(players)
+        visible = self._sees(players, positions)
+
+        # What every player knows of the world: the cells of its field of view,
+        # the resources and events it may see there, then what it is shared.
+        # Resources are counted as often as the dicts list them, which is
+        # every time their cell lies in the field of view.
+        windows = self._window(np.arange(self.size_x), np.arange(self.size_y), positions.T[:, :, None], self.fovs.T[:, :, None])
+        blocks = (windows > 0) & (self.game.world_map.map_data.T > 0)
+        resources = windows[:, None].astype(np.int16) * visible_resources[:, :, None, None]
+        events = (windows > 0) & visible_events[np.arange(len(players))[:, None, None], self._event_ids]
+        if self.grid_view == 'map':
+            self._share(positions, blocks, resources, events, visible)
+
+        grid = np.zeros((len(players), self.channel_num, *self.shape), dtype=np.int16)
+        self._write_players(grid[:, 0], players, positions, visible)
+        grid[:, 1] = blocks[cells]
+        event_ids = self._event_ids[cells[1:]]
+        events_here = events[cells] & single
+        event_channels = 2 + self.resource_num
+        grid[:, 2:event_channels] = np.where(
+            (events_here[..., None] & self._event_sets[event_ids]),
+            self._event_table[event_ids],
+            0,
+        ).transpose(0, 3, 1, 2)
+        amounts = np.zeros((self.resource_num, self.size_x, self.size_y), dtype=np.int16)
+        amounts[self._channel_ids] = self.game.resource_layer.amounts[self._layer_ids].transpose(0, 2, 1)
+        resources *= amounts
+        grid[:, event_channels:] = resources.transpose(1, 0, 2, 3)[:, cells[0], cells[1], cells[2]].transpose(1, 0, 2, 3) * single
+        return {
+            'grid_observation': grid,
+            'inventory': self.inventories(),
+        }
@@ -0,0 +1,84 @@
+import numpy as np
+
+from .batched_game import BatchedGame
+from ..utils.config_loader import ConfigLoader
+from ..utils.game_editor import GameEditor
+
+
+class VectorEnvironment:
+    def __init__(
+        self,
+        config_name='./config/main.json',
+        num_envs=1,
+    ):
+        self.config_loader = ConfigLoader(config_name)
+        config = self.config_loader.config
+        self.game_editor = GameEditor(config=config)
+        self.num_envs = num_envs
+        self.episode = -1
+        self.batched_game = None
+        # Seeds the generator of every world, which generates it and breaks its ties, on `reset(seed=...)`
+        self.rng = None
+
+    def reset(
+        self,
+        *,
+        seed=None,
+        options=None,
+    ):
+        if seed is not None or self.rng is None:
+            self.rng = np.random.default_rng(seed)
+        self.episode += 1
+        self.step_num = 0
+
+        config = self.config_loader.config
+        # World k of an episode only depends on the episode seed and k, like the worlds of a WorldPool
+        episode_seed = int(self.rng.integers(2**63))
+        games = [
+            self.game_editor.generate_game(np.random.default_rng([episode_seed, index]))
+            for index in range(self.num_envs)
+        ]
+        if self.batched_game is None:
+            self.batched_game = BatchedGame(
+                games,
+                resource_config=config['resource'],
+                event_config=config['event'],
+            )
+        else:
+            self.batched_game.load_games(games)
+        game = games[0]
+        infos = {
+            'episode_id': self.episode,
+            'step_id': self.step_num,
+            'max_length': game.max_length,
+            'map_size': game.world_map.shape,
+            'player_num': game.player_num,
+            'player_names': [player.name for player in game.players],
+            'resource_name': self.batched_game.resource_names,
+            'resource_num': self.batched_game.resource_num,
+            'event_name': self.batched_game.event_names,
+        }
+        return self.batched_game.observations, infos
+
+    def step(
+        self,
+        actions,
+    ):
+        self.batched_game.step(actions)
+        self.step_num += 1
+        # All worlds share `max_length`, so they terminate together
+        terminateds = self.batched_game.terminateds
+        truncateds = terminateds.copy()
+        infos = {
+            'step': self.step_num,
+        }
+        return (
+            self.batched_game.observations,
+            self.batched_game.rewards,
+            terminateds,
+            truncateds,
+            infos,
+        )
+
+    def close(self):
+        pass
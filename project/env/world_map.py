@@ -1,4 +1,3 @@
-import random
 import numpy as np
 
 BLANK = 0
@@ -34,6 +33,17 @@ class WorldMap:
         # Blank positions
         self.blank_pos = set(map(tuple, np.argwhere(self.map_data.T == BLANK).tolist()))
 
+    def copy(self):
+        '''A copy that blocks can be added to, without parsing the tokens again.'''
+        world_map = WorldMap.__new__(WorldMap)
+        world_map.token_lookup_table = self.token_lookup_table
+        world_map.block_lookup_table = self.block_lookup_table
+        world_map.token_array = [list(row) for row in self.token_array]
+        world_map.map_data = self.map_data.copy()
+        world_map.size_y, world_map.size_x = self.size_y, self.size_x
+        world_map.blank_pos = set(self.blank_pos)
+        return world_map
+
     @property
     def shape(self):
         return self.size_x, self.size_y
@@ -42,7 +52,7 @@ class WorldMap:
     def observation(self):
         return self.map_data
 
-    def add_block(self, position):
+    def add_block(self, position, rng):
         choices = set()
         for delta_pos in [UP, DOWN, LEFT, RIGHT, UPPER_LEFT, UPPER_RIGHT, LOWER_LEFT, LOWER_RIGHT]:
             x = (position[0] + delta_pos[0]) % self.size_x
@@ -51,16 +61,17 @@ class WorldMap:
                 choices.add(self.token_array[y][x])
         if not choices:
             choices = set(self.block_lookup_table.keys())
-        token = random.choice(list(choices))
+        choices = sorted(choices)
+        token = choices[rng.integers(len(choices))]
         x, y = position
         self.map_data[y, x] = BLOCK
         self.token_array[y][x] = token
         # Remove (x, y) from blanks if existed
         self.blank_pos.discard((x, y))
 
-    def add_blocks(self, positions):
+    def add_blocks(self, positions, rng):
         for pos in positions:
-            self.add_block(pos)
+            self.add_block(pos, rng)
 
     def is_block(self, position):
         return self.map_data[position[1], position[0]] == BLOCK
@@ -1,15 +1,20 @@
 from ....agent.mdp.state import State
 from ....agent.mdp.action import Action
 from ....agent.mdp.reward import Reward
+from ....agent.action_mask import gather_agents, physical_action_masks, zeroed
 import numpy as np
 from gymnasium.spaces import Box, Discrete, Dict
-import random
 
 MAX_ITEM_NUM = 32767
 WEIGHT = 'division_weight'
 
 class ContractAgent:
-    def __init__(self, _id, env_info, task_info):
+    # Extent of the grid in tensor observations
+    grid_view = 'fov'
+    # Set by the EnvHandler when it computes the masks of all agents at once
+    batch_action_mask = False
+
+    def __init__(self, _id, env_info, task_info, reuse_buffers=False):
         self.state = State(_id, env_info, task_info)
         self.action = Action(_id, env_info, task_info)
         self.reward = Reward(_id, env_info, task_info)
@@ -34,6 +39,8 @@ class ContractAgent:
                 'action_mask': Box(0,1, (action_dim,),dtype=np.int8)
             })
         self.action_space = Discrete(action_dim)
+        if reuse_buffers:
+            self.state.allocate_buffers(self.observation_space)
 
 
     def update(
@@ -54,20 +61,13 @@ class ContractAgent:
         self,
         obs
     ):
-        update_obs = {}
-        self.state.update_my_pos(obs['Player']['position'])
-        player_layer = self.state.player_toarray(obs['Map']['players'])
-        block_layer = obs['Map']['block_grids'][np.newaxis, :, :]
-        event_layer = self.state.event_toarray(obs['Map']['events'])
-        resource_layer = self.state.resource_toarray(obs['Map']['resources'])
-        update_obs['grid_observation'] = np.concatenate((player_layer, block_layer, event_layer, resource_layer), axis=0)
-        update_obs['inventory'] = self.state.inventory_toarray(obs['Player']['inventory'])
-        update_obs['communication'] = self.state.words_toarray(obs['Social']['communications'])
-        update_obs['social_state'] = self.state.social_state2adj(obs['Social']['global']['edges'])
-        update_obs['time'] = np.array([obs['step_id']])
-        update_obs['player_id'] = np.zeros((self.state.player_num + self.group_num), dtype=np.int8)
-        update_obs['player_id'][self.state._id] = 1
-        update_obs['action_mask'] = self.get_action_mask(update_obs['grid_observation'], update_obs['inventory'], obs['step_id'])
+        if 'grid_observation' in obs:
+            update_obs = self.state.process_tensor_obs(obs)
+        else:
+            update_obs = self.state.process_window_obs(obs)
+        update_obs['player_id'] = self.state.player_id_toarray(self.state.player_num + self.group_num, out=self.state.buffer('player_id'))
+        if not self.batch_action_mask:
+            update_obs['action_mask'] = self.get_action_mask(update_obs['grid_observation'], update_obs['inventory'], obs['step_id'], out=self.state.buffer('action_mask'))
 
         return update_obs
         
@@ -119,8 +119,12 @@ class ContractAgent:
     def get_action(self):
         return self.action.get_action()
     
-    def get_action_mask(self, grid_obs, inventory, time):
-        action_mask = np.zeros(6 + 2 * self.state.resource_num + self.group_num)
+    def get_action_mask(self, grid_obs, inventory, time, out=None):
+        if out is None:
+            action_mask = np.zeros(6 + 2 * self.state.resource_num + self.group_num)
+        else:
+            action_mask = out
+            action_mask.fill(0)
         if time < self.negotiation_round * self.state.player_num:
             if self.state._id == self.turn_order[time % self.state.player_num]:
                 action_mask[-self.group_num:] = 1
@@ -141,9 +145,21 @@ class ContractAgent:
             action_mask[6 + self.state.resource_num: 6 + 2 * self.state.resource_num] = dump_mask
         return action_mask
     
+    @staticmethod
+    def action_masks(agents, out=None):
+        '''(P, action_dim) masks of all agents, row for row the same as their `get_action_mask`.'''
+        state = agents[0].state
+        group_num = agents[0].group_num
+        action_masks = zeroed(out, (len(agents), 6 + 2 * state.resource_num + group_num))
+        time = int(agents[0].obs['time'][0])
+        if time < agents[0].negotiation_round * state.player_num:
+            turn = np.array([agent.state._id == agent.turn_order[time % state.player_num] for agent in agents])
+            action_masks[turn, -group_num:] = 1
+            action_masks[~turn, 4] = 1
+        else:
+            physical_action_masks(*gather_agents(agents, state.obs_range), action_masks)
+        return action_masks
+
     def get_turn_order(self, seed):
-        state = random.getstate()
-        random.seed(seed)
-        turn_order = random.sample(range(self.state.player_num), self.state.player_num)
-        random.setstate(state)
-        return turn_order
+        rng = np.random.default_rng(seed)
+        return rng.permutation(self.state.player_num).tolist()
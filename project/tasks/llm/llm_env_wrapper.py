@@ -1,19 +1,54 @@
 # from ...env.fake_env import MultiAgentEnvironment
 from ...env.environment import Environment
 from ...agent.env_handler import EnvHandler
+from ...utils.parallel_env_pool import ParallelEnvPool
 from ray.rllib.env.multi_agent_env import MultiAgentEnv
 from gymnasium.spaces import Box
 
 
 class LLMEnvWrapper(MultiAgentEnv):
-    def __init__(self) -> None:
-        self.env = Environment('./config/main.json')
+    '''
+    The environment LLM agents play in. With `num_envs`, that many
+    environments run in the worker processes of a ParallelEnvPool, and
+    `reset` and `step` take and return lists with one entry per environment,
+    the m-th one seeded from `seed + m`.
+    '''
+    def __init__(self, num_envs=None) -> None:
+        self.pool = None
+        if num_envs is None:
+            self.env = Environment('./config/main.json')
+        else:
+            self.pool = ParallelEnvPool('./config/main.json', num_envs, raw_obs=True)
         self.env_handler = EnvHandler()
-        
+
     def reset(self, *, seed=None, options=None):
+        if self.pool is not None:
+            _, obs, info = self.pool.reset(seed=seed, options=options)
+            return obs, info
         obs, info = self.env.reset()
         return obs, info
-    
+
     def step(self, actions):
+        if self.pool is not None:
+            return self._step_pool(actions)
         obs, reward, terminated, truncated, info = self.env.step(actions)
-        return obs, reward, terminated, truncated, info
\ No newline at end of file
+        return obs, reward, terminated, truncated, info
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+
+    def _step_pool(self, actions):
+        _, reward, terminated, truncated, obs, info = self.pool.step(actions)
+        agent_ids = self.pool.agent_ids
+        # Dicts like the ones of Environment.step, except that every player of an ended game is terminated
+        reward = [dict(zip(agent_ids, row.tolist())) for row in reward]
+        terminated = [
+            dict(zip(agent_ids, row.tolist()), __all__=ended)
+            for row, ended in zip(terminated, self.pool.ended[:, 0].tolist())
+        ]
+        truncated = [
+            dict(zip(agent_ids, row.tolist()), __all__=ended)
+            for row, ended in zip(truncated, self.pool.ended[:, 1].tolist())
+        ]
+        return obs, reward, terminated, truncated, info
@@ -2,17 +2,21 @@ import numpy as np
 from .mdp.state import State
 from .mdp.action import Action
 from .mdp.reward import Reward
+from ....agent.action_mask import gather_agents, physical_action_masks, zeroed
 from gymnasium.spaces import Discrete
 
 class NegotiationAgent:
-    def __init__(self, _id, env_info, task_info):
+    # Set by the EnvHandler when it computes the masks of all agents at once
+    batch_action_mask = False
+
+    def __init__(self, _id, env_info, task_info, reuse_buffers=False):
         self._id = env_info['_id']
         self.claim_proposal_interval = task_info.negotiation['claim_proposal_interval']
         self.resource_name = env_info['resource_name']
         self.resource_num = len(self.resource_name)
         self.player_num = env_info['player_num']
         env_info['negotiation_length'] = self.player_num + 2 + self.claim_proposal_interval
-        self.state = State(_id, env_info, task_info)
+        self.state = State(_id, env_info, task_info, reuse_buffers)
         self.action = Action(_id, env_info, task_info)
         self.reward = Reward(_id, env_info)
         self.observation_space = self.state.observation_space
@@ -38,7 +42,7 @@ class NegotiationAgent:
         obs,
     ):
         self.origin_obs = obs
-        return self.state.update(obs)
+        return self.state.update(obs, action_mask=not self.batch_action_mask)
 
     def update_policy(
         self,
@@ -89,23 +93,58 @@ class NegotiationAgent:
     def get_action(self):
         return self.action.get_action()
     
+    @staticmethod
+    def action_masks(agents, out=None):
+        '''(P, action_num) masks of all agents, row for row the same as their `State._get_action_mask`.'''
+        state = agents[0].state
+        action_masks = zeroed(out, (len(agents), state.action_num))
+        time = int(agents[0].obs['time'][0])
+        if time <= state.negotiation_steps:
+            snapshot = agents[0].origin_obs['Social']['snapshot']
+            players = np.flatnonzero(snapshot.node_types == snapshot.PLAYER)
+            player_ids = snapshot.node_ids[players]
+            # Players that share no group and bargain with nobody can be invited
+            memberships = snapshot.memberships(state.player_num)
+            parity = snapshot.columns.get('parity')
+            bargaining = np.zeros(snapshot.node_num, dtype=bool)
+            if parity is not None:
+                bargaining[snapshot.edge_index[0, np.not_equal(parity, None)]] = True
+            for i, agent in enumerate(agents):
+                me = agent.state._id
+                shares_group = (memberships[player_ids] & memberships[me]).any(axis=1)
+                invitable = player_ids[~shares_group & ~bargaining[players] & (player_ids != me)]
+                action_masks[i, state.physical_action_num + invitable] = 1
+                node = snapshot.node_number('player', me)
+                for v, edge_parity in snapshot.out_edges_with(node, 'parity'):
+                    if snapshot.node_types[v] != snapshot.PLAYER:
+                        continue
+                    action_masks[i] = 0
+                    if time % 2 == edge_parity:
+                        if snapshot.edge_attribute(node, v, 'proposal') is None and snapshot.edge_attribute(v, node, 'proposal') is None:
+                            action_masks[i, state.physical_action_num + state.player_num + 2:] = 1
+                        else:
+                            action_masks[i, state.physical_action_num + state.player_num:] = 1
+                    else:
+                        action_masks[i, 4] = 1
+        else:
+            physical_action_masks(*gather_agents(agents, state.ref_point), action_masks)
+        action_masks[~action_masks.any(axis=1), 4] = 1
+        return action_masks
+
     def _get_bargaining_player(self):
-        graph = self.origin_obs['Social']['social_graph']
-        for u, v, edge in graph.edges(data=True):
-            u_data = graph.nodes[u]
-            v_data = graph.nodes[v]
-            if u_data['type'] == 'player' and v_data['type'] == 'player' and u_data['id'] == self._id:
-                if 'parity' in edge:
-                    return v_data['id']
-                
+        snapshot = self.origin_obs['Social']['snapshot']
+        me = snapshot.node_number('player', self._id)
+        for v, _ in snapshot.out_edges_with(me, 'parity'):
+            if snapshot.node_types[v] == snapshot.PLAYER:
+                return int(snapshot.node_ids[v])
+
     def _get_opponent_proposal(self, opponent_player_id):
-        graph = self.origin_obs['Social']['social_graph']
-        for u, v, edge in graph.edges(data=True):
-            u_data = graph.nodes[u]
-            v_data = graph.nodes[v]
-            if u_data['type'] == 'player' and v_data['type'] == 'player':
-                if u_data['id'] == self._id and v_data['id'] == opponent_player_id:
-                    opponent_proposal = graph[v][u].get('proposal')
-                    return opponent_proposal
+        if opponent_player_id is None:
+            return None
+        snapshot = self.origin_obs['Social']['snapshot']
+        me = snapshot.node_number('player', self._id)
+        opponent = snapshot.node_number('player', opponent_player_id)
+        if snapshot.has_edge(me, opponent):
+            return snapshot.edge_attribute(opponent, me, 'proposal')
         return None
    
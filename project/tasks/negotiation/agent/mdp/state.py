@@ -6,7 +6,7 @@ import networkx as nx
 MAX_ITEM_NUM = 32767
 
 class State:
-    def __init__(self, _id, env_info, task_info):
+    def __init__(self, _id, env_info, task_info, reuse_buffers=False):
         self._id = env_info['_id']
         self.map_size = env_info['map_size']
         self.all_events = env_info['events']
@@ -48,25 +48,36 @@ class State:
         })
 
         self.obs_dict = self.observation_space.sample()
+        # Fill the arrays of obs_dict in place instead of replacing them every step
+        self.reuse_buffers = reuse_buffers
 
-    def update(self, obs):
+    def _buffer(self, key):
+        if self.reuse_buffers:
+            buffer = self.obs_dict[key]
+            buffer.fill(0)
+            return buffer
+        space = self.observation_space[key]
+        return np.zeros(space.shape, dtype=space.dtype)
+
+    def update(self, obs, action_mask=True):
         self._my_pos = obs['Player']['position']
         ''' grid_observation '''
         ### player layer ###
+        grid_observation = self._buffer('grid_observation')
         player_dict = obs['Map']['players']
-        player_layer = np.zeros((1, self.obs_height, self.obs_width), dtype=np.int16)
+        player_layer = grid_observation[0:1]
         for player in player_dict:
             x, y = self._relative_pos(player['position'])
             player_layer[0, x, y] = player['id'] + 1
         player_layer[0, self.ref_point[0], self.ref_point[1]] = self._id + 1
 
         ### block layer ###
-        block_layer = np.zeros((1, self.obs_height, self.obs_width), dtype=np.int16)
+        block_layer = grid_observation[1:2]
         block_layer[0] = obs['Map']['block_grids']
 
         ### event layer ###
         event_dict = obs['Map']['events']
-        event_layer = np.zeros((self.resource_num, self.obs_height, self.obs_width), dtype=np.int16)
+        event_layer = grid_observation[2:2 + self.resource_num]
         for event in event_dict:
             event_name = event['name']
             event_class = self.all_events[event_name]
@@ -86,7 +97,7 @@ class State:
 
         ### resource layer ###
         resource_dict = obs['Map']['resources']
-        resource_layer = np.zeros((self.resource_num, self.obs_height, self.obs_width), dtype=np.int16)
+        resource_layer = grid_observation[2 + self.resource_num:]
         for resource in resource_dict:
             resource_relative_pos = self._relative_pos(resource['position'])
             resource_layer[
@@ -95,17 +106,21 @@ class State:
                     resource_relative_pos[1]
                   ] = resource['amount']
 
-        self.obs_dict['grid_observation'] = np.concatenate((player_layer, block_layer, event_layer, resource_layer))
+        self.obs_dict['grid_observation'] = grid_observation
 
         ''' inventory '''
-        inventory = np.zeros((self.resource_num, ), dtype=np.int16)
+        inventory = self._buffer('inventory')
         for resource in obs['Player']['inventory']:
             inventory[self._resource2id[resource['name']]] += resource['amount']
         self.obs_dict['inventory'] = inventory
 
         ''' social_state '''
         social_graph = obs['Social']['social_graph']
-        self.obs_dict['social_state'] = self._get_player_adjacency_matrix(social_graph)
+        social_state = obs['Social']['snapshot'].same_groups(self.player_num)
+        if self.reuse_buffers:
+            np.copyto(self.obs_dict['social_state'], social_state)
+        else:
+            self.obs_dict['social_state'] = social_state
 
         ''' time '''
         self.obs_dict['time'].fill(0)
@@ -116,20 +131,21 @@ class State:
         self.obs_dict['player_id'][self._id] = 1
 
         ''' action_mask '''
-        action_mask = self._get_action_mask(obs['Social']['social_graph'], obs['step_id'], self.obs_dict['grid_observation'], self.obs_dict['inventory'])
-        # print(f"action mask: {action_mask}")
-        self.obs_dict['action_mask'] = action_mask
+        if action_mask:
+            action_mask = self._get_action_mask(obs['Social']['social_graph'], obs['step_id'], self.obs_dict['grid_observation'], self.obs_dict['inventory'], out=self._buffer('action_mask'))
+            # print(f"action mask: {action_mask}")
+            self.obs_dict['action_mask'] = action_mask
 
         ''' negotiation info '''
         ### available player ###
-        available_players = np.zeros(self.player_num, dtype=np.int8)
+        available_players = self._buffer('available_player')
         invitable_players = self._find_invitable_players(social_graph, self._id)
         for invitable_players_id in invitable_players:
             available_players[invitable_players_id] = 1
         self.obs_dict['available_player'] = available_players
 
         ### proposal ###
-        proposal = np.zeros((self.player_num, ), dtype=np.float16)
+        proposal = self._buffer('proposal')
         for communication in obs['Social']['communications']:
             if 'score' in communication['Request'] and communication['Request']['scores'] is not None:
                 score = communication['Request']['scores']
@@ -139,7 +155,7 @@ class State:
         self.obs_dict['proposal'] = proposal
 
         ### final split ###
-        final_split = self._find_final_split(social_graph)
+        final_split = self._find_final_split(social_graph, out=self.obs_dict['final_split'] if self.reuse_buffers else None)
         # print(f"final split: {final_split}")
         self.obs_dict['final_split'] = final_split
         return self.obs_dict
@@ -148,21 +164,6 @@ class State:
         return (np.array(pos) - np.array(self._my_pos) + np.array(self.ref_point)) % np.array(self.map_size)
     
     
-    def _get_player_adjacency_matrix(self, social_graph):
-        adjacency_matrix = np.zeros((self.player_num, self.player_num), dtype=np.int16)
-        player_groups = {}
-        for player in social_graph.nodes:
-            if social_graph.nodes[player]['type'] == 'player':
-                player_id = social_graph.nodes[player]['id']
-                belong_group = player.groups
-                player_groups[player_id] = belong_group
-        for i in range(self.player_num):
-            for j in range(i + 1, self.player_num):
-                if player_groups[i] == player_groups[j] and len(player_groups[i]) > 0:
-                    adjacency_matrix[i][j] = 1
-                    adjacency_matrix[j][i] = 1
-        return adjacency_matrix
-    
     # don't delete, llm needs.
     def social_state2nx(self, edge_list):
         G = nx.DiGraph()
@@ -180,9 +181,13 @@ class State:
             inventory[self._resource2id[resource['name']]] += resource['amount']
         return inventory
     
-    def _get_action_mask(self, social_graph, time, grid_obs, inventory):
+    def _get_action_mask(self, social_graph, time, grid_obs, inventory, out=None):
         # edge_list = self.origin_obs['Social']['global']['edges']
-        action_mask = np.zeros((self.action_num), dtype=np.int8)
+        if out is None:
+            action_mask = np.zeros((self.action_num), dtype=np.int8)
+        else:
+            action_mask = out
+            action_mask.fill(0)
             
         if time <= self.negotiation_steps:
             invitable_players = self._find_invitable_players(social_graph, self._id)
@@ -253,8 +258,12 @@ class State:
                 invitable_players.append(data['id'])
         return invitable_players           
 
-    def _find_final_split(self, graph):
-        final_split = np.ones((self.player_num, ), dtype=np.float16)
+    def _find_final_split(self, graph, out=None):
+        if out is None:
+            final_split = np.ones((self.player_num, ), dtype=np.float16)
+        else:
+            final_split = out
+            final_split.fill(1)
         for node in graph.nodes:
             if graph.nodes[node]['type'] == 'player':
                 for group, _, edge_data in graph.in_edges(node, data=True):
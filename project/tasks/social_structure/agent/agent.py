@@ -1,6 +1,7 @@
 from ....agent.mdp.state import State
 from ....agent.mdp.action import Action
 from ....agent.mdp.reward import Reward
+from ....agent.action_mask import gather_agents, physical_action_masks, zeroed
 import numpy as np
 from gymnasium.spaces import Box, Discrete, Dict
 import random
@@ -9,7 +10,12 @@ MAX_ITEM_NUM = 32767
 WEIGHT = 'division_weight'
 
 class SocialStructureAgent:
-    def __init__(self, _id, env_info, task_info):
+    # Extent of the grid in tensor observations
+    grid_view = 'map'
+    # Set by the EnvHandler when it computes the masks of all agents at once
+    batch_action_mask = False
+
+    def __init__(self, _id, env_info, task_info, reuse_buffers=False):
         self.state = State(_id, env_info, task_info)
         self.action = Action(_id, env_info, task_info)
         self.reward = Reward(_id, env_info, task_info)
@@ -32,6 +38,8 @@ class SocialStructureAgent:
                 'action_mask': Box(0,1, (action_dim,),dtype=np.int8)
             })
         self.action_space = Discrete(action_dim)
+        if reuse_buffers:
+            self.state.allocate_buffers(self.observation_space)
 
 
     def update(
@@ -52,16 +60,18 @@ class SocialStructureAgent:
         self,
         obs
     ):
-        update_obs = {}
-        shared_obs, sharing_player, sharing_block = self.state.sharing_obs(obs)
-        update_obs = self.state.process_obs(shared_obs, sharing_player, sharing_block)
+        if 'grid_observation' in obs:
+            update_obs = self.state.process_tensor_obs(obs)
+        else:
+            shared_obs, sharing_player, sharing_block = self.state.sharing_obs(obs)
+            update_obs = self.state.process_obs(shared_obs, sharing_player, sharing_block)
         # if obs['step_id'] in [10, 40, 100]:
         #     print(obs['step_id'])
         #     print(update_obs['social_state'])
         #     print('========================')
-        update_obs['player_id'] = np.zeros((self.state.player_num + self.group_num), dtype=np.int8)
-        update_obs['player_id'][self.state._id] = 1
-        update_obs['action_mask'] = self.get_action_mask(update_obs['grid_observation'], update_obs['inventory'])
+        update_obs['player_id'] = self.state.player_id_toarray(self.state.player_num + self.group_num, out=self.state.buffer('player_id'))
+        if not self.batch_action_mask:
+            update_obs['action_mask'] = self.get_action_mask(update_obs['grid_observation'], update_obs['inventory'], out=self.state.buffer('action_mask'))
         self.social_graph_edges = obs['Social']['global']['edges']
 
         return update_obs
@@ -107,8 +117,12 @@ class SocialStructureAgent:
     def get_action(self):
         return self.action.get_action()
     
-    def get_action_mask(self, grid_obs, inventory):
-        action_mask = np.zeros(6 + 2 * self.state.resource_num)
+    def get_action_mask(self, grid_obs, inventory, out=None):
+        if out is None:
+            action_mask = np.zeros(6 + 2 * self.state.resource_num)
+        else:
+            action_mask = out
+            action_mask.fill(0)
 
         player_layer = grid_obs[0]
         my_pos = np.where(player_layer == self.state._id + 1)
@@ -123,3 +137,11 @@ class SocialStructureAgent:
         action_mask[6: 6 + self.state.resource_num] = pick_mask
         action_mask[6 + self.state.resource_num: 6 + 2 * self.state.resource_num] = dump_mask
         return action_mask
+
+    @staticmethod
+    def action_masks(agents, out=None):
+        '''(P, action_dim) masks of all agents, row for row the same as their `get_action_mask`.'''
+        state = agents[0].state
+        action_masks = zeroed(out, (len(agents), 6 + 2 * state.resource_num))
+        ref_point = (state.map_size[0] // 2, state.map_size[1] // 2)
+        return physical_action_masks(*gather_agents(agents, ref_point), action_masks)
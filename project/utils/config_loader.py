@@ -22,6 +22,13 @@ class ConfigLoader:
                 import warnings
                 warnings.warn(f'Config[{k}]: `{v}` does not exist!')
 
+    @classmethod
+    def from_config(cls, config):
+        '''A loader of an already parsed config, which reads no file.'''
+        config_loader = cls.__new__(cls)
+        config_loader.config = config
+        return config_loader
+
     @property
     def task(self):
         return self.config['task']
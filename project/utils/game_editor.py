@@ -1,11 +1,11 @@
 import json
-import random
 import numpy as np
 
-from project.env.event import Event
+from project.env.event import Event, EventKind
 from project.env.game import Game
 from project.env.player import Player
-from project.env.resource import Resource
+from project.env.resource import Resource, ResourceKind
+from project.env.resource_layer import ResourceLayer
 from project.env.social import Social
 from project.env.group import Group
 from project.env.world_map import WorldMap
@@ -26,19 +26,26 @@ NAME_LIST = ['Adam', 'Buford', 'Cindy', 'Dax', 'Eva', 'Fate', 'Gustav', 'Hampton
 
 
 class GameEditor:
-    def __init__(self, config):
+    def __init__(self, config, base_map=None):
         self.config = config
-        self.world_map = None
+        # The base map is parsed once, every world starts from a copy
+        self.base_map = base_map
+        # Per-type data shared by the resources and events of every generated world
+        self._resource_kinds = {}
+        self._event_kinds = {}
         # Load default config
 
-    def generate_game(self):
-        world_map = self.generate_map()
-        resources = self.generate_resources(world_map)
-        events = self.generate_events(world_map)
-        players = self.generate_players(world_map)
+    def generate_game(self, rng=None):
+        if rng is None:
+            rng = np.random.default_rng()
+        world_map = self.generate_map(rng)
+        resources = self.generate_resources(world_map, rng)
+        events = self.generate_events(world_map, rng)
+        players = self.generate_players(world_map, rng)
         social = self.generate_social(players)
         game = Game(
             world_map=world_map,
+            resource_layer=ResourceLayer(self.config['resource'], *world_map.shape),
             resources=resources,
             events=events,
             players=players,
@@ -48,19 +55,46 @@ class GameEditor:
             pre_updates=self.config.task.pre_updates,
             post_updates=self.config.task.post_updates,
             max_length = self.config.task.max_length,
+            rng=rng,
         )
         return game
 
-    def generate_map(self):
+    def layout(self):
+        '''
+        What every world of the task has in common, read from the config
+        without generating one: the map shape, the players' jobs in id order,
+        and the names of the resources and events in generation order.
+        '''
+        task = self.config.task
+        # Single names and positions may be given without the enclosing list
+        jobs = [c['job'] for c in task.static.players for _ in (c['positions'] if isinstance(c['positions'][0], list) else [0])]
+        jobs += [c['job'] for c in task.random.players for _ in range(c['repeat'])]
+        resources = [name for c in task.static.resources for name in (c['name'] if isinstance(c['name'], list) else [c['name']])]
+        resources += [c['name'] for c in task.random.resources if c['repeat'] > 0]
+        events = [name for c in task.static.events for name in (c['name'] if isinstance(c['name'], list) else [c['name']])]
+        events += [c['name'] for c in task.random.events if c['repeat'] > 0]
+        return {
+            'map_shape': self._base_map().shape,
+            'jobs': jobs,
+            'resources': resources,
+            'events': events,
+        }
+
+    def _base_map(self):
+        if self.base_map is None:
+            base_map_config = self.config['task']['base_map']
+            base_map_init_rule = base_map_config['init_rule']
+            if 'size' in base_map_config:
+                size_x, size_y = base_map_config['size']['x'], base_map_config['size']['y']
+            else:
+                size_x, size_y = None, None
+            file_path = base_map_config.get('file_path')
+            self.base_map = self._load_map(base_map_init_rule, size_x, size_y, file_path)
+        return self.base_map.copy()
+
+    def generate_map(self, rng):
         # Base
-        base_map_config = self.config['task']['base_map']
-        base_map_init_rule = base_map_config['init_rule']
-        if 'size' in base_map_config:
-            size_x, size_y = base_map_config['size']['x'], base_map_config['size']['y']
-        else:
-            size_x, size_y = None, None
-        file_path = base_map_config.get('file_path')
-        world_map = self._load_map(base_map_init_rule, size_x, size_y, file_path)
+        world_map = self._base_map()
         # TODO load static blocks
         config = self.config.task.static.blocks
         # Load random blocks
@@ -77,11 +111,11 @@ class GameEditor:
                     positions = [positions]
                 for pos in positions:
                     blank_pos.discard(tuple(pos))
-        pos_list = random.sample(list(blank_pos), block_num)
-        world_map.add_blocks(pos_list)
+        pos_list = self._sample_positions(blank_pos, block_num, rng)
+        world_map.add_blocks(pos_list, rng)
         return world_map
 
-    def generate_resources(self, world_map):
+    def generate_resources(self, world_map, rng):
         resources = []
         # Load static resources
         config = self.config.task.static.resources
@@ -115,17 +149,17 @@ class GameEditor:
         blank_pos = world_map.blank_pos.copy()
         for resource in resources:
             blank_pos.discard(resource.position)
-        pos_list = random.sample(list(blank_pos), resource_num)
+        pos_list = self._sample_positions(blank_pos, resource_num, rng)
         resource_config = self.config['resource']
         for conf, pos in zip(conf_list, pos_list):
             resources.append(self._create_resource(
                 name=conf['name'],
                 position=pos,
-                amount=self._num_generator(conf['num']),
+                amount=self._num_generator(conf['num'], rng),
             ))
         return resources
 
-    def generate_events(self, world_map):
+    def generate_events(self, world_map, rng):
         events = []
         # Load static events
         config = self.config.task.static.events
@@ -152,7 +186,7 @@ class GameEditor:
         blank_pos = world_map.blank_pos.copy()
         for event in events:
             blank_pos.discard(event.position)
-        pos_list = random.sample(list(blank_pos), event_num)
+        pos_list = self._sample_positions(blank_pos, event_num, rng)
         for conf, pos in zip(conf_list, pos_list):
             events.append(self._create_event(
                 name = conf['name'],
@@ -160,7 +194,7 @@ class GameEditor:
             ))
         return events
 
-    def generate_players(self, world_map):
+    def generate_players(self, world_map, rng):
         players = []
         # Load static players
         config = self.config.task.static.players
@@ -185,7 +219,7 @@ class GameEditor:
         # TODO shuffle will break the name order, and thus break rllib training for now
         # random.shuffle(conf_list)
         player_num = len(conf_list)
-        pos_list = random.sample(list(world_map.blank_pos), player_num)
+        pos_list = self._sample_positions(world_map.blank_pos, player_num, rng)
         for c, pos in zip(conf_list, pos_list):
             job_name = c['job']
             player_id = len(players)
@@ -226,7 +260,7 @@ class GameEditor:
         # TODO Load random relations
         return social
 
-    def _num_generator(self, config, index=None):
+    def _num_generator(self, config, rng, index=None):
         rule = config['rule']
         if rule == 'static':
             return config['num']
@@ -239,7 +273,7 @@ class GameEditor:
             max_n = config['max']
             if dist == 'uniform':
                 if dtype == 'int':
-                    return random.randint(min_n, max_n)
+                    return int(rng.integers(min_n, max_n, endpoint=True))
                 else:
                     raise NotImplementedError
             else:
@@ -247,6 +281,11 @@ class GameEditor:
         else:
             raise NotImplementedError
 
+    def _sample_positions(self, positions, k, rng):
+        # Sorted first, so that the draw does not depend on set iteration order
+        positions = sorted(positions)
+        return [positions[i] for i in rng.choice(len(positions), k, replace=False)]
+
     def _load_map(self, init_rule, size_x, size_y, file_path=None):
         token_array = []
         if init_rule == 'blank':
@@ -272,34 +311,39 @@ class GameEditor:
         else:
             raise NotImplementedError
 
+    def _resource_kind(self, name):
+        if name not in self._resource_kinds:
+            config = self.config['resource']
+            self._resource_kinds[name] = ResourceKind.get(
+                name=name,
+                _type=config[name]['type'],
+                requirements=config[name].get('requirements', {}),
+                unit_score=config[name].get('score', 0),
+            )
+        return self._resource_kinds[name]
+
     def _create_resource(self, name, position, amount):
-        config = self.config['resource']
-        return Resource(
-            name=name,
-            _type=config[name]['type'],
-            position=position,
-            amount=amount,
-            requirements=config[name].get('requirements', {}),
-            unit_score=config[name].get('score', 0),
-        )
+        return Resource.of_kind(self._resource_kind(name), position, amount)
 
     def _create_event(self, name, position):
-        config = self.config['event']
-        resource_pool = {}
-        for resource_name in config[name].get('out', {}):
-            resource_pool[resource_name] = self._create_resource(
-                name=resource_name,
-                position=None,
-                amount=float('inf'),
+        if name not in self._event_kinds:
+            config = self.config['event']
+            # Outputs come from pools of endless resources, which every event of the type can share
+            resource_pool = {}
+            for resource_name in config[name].get('out', {}):
+                resource_pool[resource_name] = self._create_resource(
+                    name=resource_name,
+                    position=None,
+                    amount=float('inf'),
+                )
+            self._event_kinds[name] = EventKind(
+                name=name,
+                inputs=config[name].get('in', {}),
+                outputs=config[name].get('out', {}),
+                resource_pool=resource_pool,
+                requirements=config[name].get('requirements', {}),
             )
-        return Event(
-            name=name,
-            position=position,
-            inputs=config[name].get('in', {}),
-            outputs=config[name].get('out', {}),
-            resource_pool=resource_pool,
-            requirements=config[name].get('requirements', {}),
-        )
+        return Event.of_kind(self._event_kinds[name], position)
 
     def _create_player(self, player_id, name, job_name, position, rotation):
         job_config = self.config['job'][job_name]
@@ -322,4 +366,6 @@ class GameEditor:
             init_resources=init_resources,
             resource_max_dict=dict(inventory_config.get('max', {})),
             resource_preference_dict=dict(inventory_config.get('score', {})),
+            # Same order as the ResourceLayer
+            resource_kinds=[self._resource_kind(name) for name in self.config['resource']],
         )
@@ -0,0 +1,59 @@
+import argparse
+import gc
+import time
+from pydoc import locate
+
+import numpy as np
+
+from ..env.environment import Environment
+
+
+def benchmark(config_name, steps=200, seed=0, reuse_buffers=False):
+    '''
+    Runs one seeded episode with random valid actions and measures how the
+    agents process observations. Returns the arrays the agents hand out fresh
+    every step, the garbage collections per step and the mean `on_update` time.
+    '''
+    env = Environment(config_name)
+    env_handler = locate(env.config_loader.task['env_handler'])(config_name, reuse_buffers=reuse_buffers)
+    action_rng = np.random.default_rng(seed)
+    obs, info = env.reset(seed=seed)
+    env_handler.on_reset(obs, info)
+    agent_obs, *_ = env_handler.on_update(obs, {}, {}, {}, info)
+    # Arrays of the previous step are kept alive, so a fresh array never reuses their memory
+    previous = {name: dict(agent_obs[name]) for name in agent_obs}
+    fresh = 0
+    update_time = 0.0
+    collections = sum(stats['collections'] for stats in gc.get_stats())
+    for step in range(steps):
+        actions = {
+            name: int(action_rng.choice(np.flatnonzero(agent_obs[name]['action_mask'])))
+            for name in sorted(agent_obs)
+        }
+        obs, rewards, terminateds, truncateds, infos = env.step(env_handler.on_predict(actions))
+        start = time.perf_counter()
+        agent_obs, *_ = env_handler.on_update(obs, rewards, terminateds, truncateds, infos)
+        update_time += time.perf_counter() - start
+        for name, arrays in agent_obs.items():
+            fresh += sum(array is not previous[name].get(key) for key, array in arrays.items())
+        previous = {name: dict(agent_obs[name]) for name in agent_obs}
+        if terminateds['__all__']:
+            break
+    steps = step + 1
+    return {
+        'fresh_arrays_per_step': fresh / steps,
+        'gc_collections_per_step': (sum(stats['collections'] for stats in gc.get_stats()) - collections) / steps,
+        'update_ms': update_time / steps * 1e3,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--env_dir', type=str, default='./config/main.json', help='environment directory')
+    parser.add_argument('--seed', type=int, default=0, help='environment seed')
+    parser.add_argument('--steps', type=int, default=200, help='number of steps to run')
+    args = parser.parse_args()
+    for reuse_buffers in (False, True):
+        result = benchmark(args.env_dir, steps=args.steps, seed=args.seed, reuse_buffers=reuse_buffers)
+        mode = 'reused buffers' if reuse_buffers else 'fresh arrays'
+        print(f'{mode:>15}: ' + ', '.join(f'{key} {value:.2f}' for key, value in result.items()))
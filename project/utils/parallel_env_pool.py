@@ -0,0 +1,226 @@
+import argparse
+import multiprocessing as mp
+import time
+import traceback
+from multiprocessing import shared_memory
+from pydoc import locate
+
+import numpy as np
+
+from ..agent.env_handler import task_spaces
+from ..env.environment import Environment
+from .task_cache import TaskCache
+
+
+def _attach(layout):
+    # The pool's shared arrays, attached by name so that spawned workers find them too
+    memories, arrays = [], {}
+    for key, (name, shape, dtype) in layout.items():
+        memory = shared_memory.SharedMemory(name=name)
+        memories.append(memory)
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+    return memories, arrays
+
+
+def _work(pipe, task_cache, env_kwargs, index, layout, raw_obs):
+    # Runs the commands of the pool on one environment, writing its row of the shared arrays
+    memories, arrays = _attach(layout)
+    env = Environment(task_cache=task_cache, **env_kwargs)
+    env_handler = locate(env.config_loader.task['env_handler'])(
+        reuse_buffers=True,
+        config_loader=env.config_loader,
+    )
+
+    def write(obs, reward, terminated, truncated, info, ended=(False, False)):
+        batch = env_handler.on_update_batch(obs, reward, terminated, truncated, info)
+        for key, array in batch[0].items():
+            arrays[key][index] = array
+        arrays['reward'][index], arrays['terminated'][index], arrays['truncated'][index] = batch[1:4]
+        arrays['ended'][index] = ended
+
+    while True:
+        command, data = pipe.recv()
+        try:
+            if command == 'reset':
+                seed, options = data
+                obs, info = env.reset(seed=seed, options=options)
+                env_handler.on_reset(obs, info)
+                write(obs, {}, {}, {}, info)
+                pipe.send(('ok', (obs if raw_obs else None, info)))
+            elif command == 'step':
+                actions = env_handler.on_predict_batch(data) if isinstance(data, np.ndarray) else data
+                obs, reward, terminated, truncated, info = env.step(actions)
+                write(obs, reward, terminated, truncated, info, (terminated['__all__'], truncated['__all__']))
+                pipe.send(('ok', (obs if raw_obs else None, info)))
+            elif command == 'close':
+                if env.world_pool is not None:
+                    env.world_pool.close()
+                pipe.send(('ok', None))
+                break
+            else:
+                raise ValueError(f'Unknown command: {command}')
+        except Exception:
+            pipe.send(('error', traceback.format_exc()))
+    pipe.close()
+    arrays.clear()
+    for memory in memories:
+        memory.close()
+
+
+class ParallelEnvPool:
+    '''
+    M environments of one task, each run by a worker process. The
+    workers take reset, step and close commands through a pipe, and write
+    their agents' observations into shared memory instead of sending them
+    back: every observation key is one (M, P, ...) array in `agent_ids`
+    order, in the dtypes of the agents' observation spaces, next to (M, P)
+    reward, terminated and truncated arrays. Those arrays are overwritten by
+    the next command, so callers must copy what they keep.
+
+    Only the infos, and with `raw_obs` the observation dicts of the game as
+    read by LLM agents, are pickled through the pipes. Actions are a (M, P)
+    array of action ids, or a list of M action dicts for Environment.step.
+
+    Workers are forked where the platform can fork, which lets them inherit
+    the parsed task, and spawned otherwise (`start_method` picks one).
+    '''
+    def __init__(self, config_name='./config/main.json', num_envs=1, raw_obs=False, start_method=None, **env_kwargs):
+        if start_method is None:
+            start_method = 'fork' if 'fork' in mp.get_all_start_methods() else 'spawn'
+        elif start_method not in mp.get_all_start_methods():
+            raise ValueError(
+                f'Start method {start_method!r} is not available here, use one of {mp.get_all_start_methods()}'
+            )
+        self.num_envs = num_envs
+        self.raw_obs = raw_obs
+        task_cache = TaskCache(config_name)
+        observation_space, self.action_space = task_spaces(task_cache.config, task_cache.game_editor())
+        self.observation_space = observation_space
+        self.agent_ids = list(observation_space)
+        agent_num = len(self.agent_ids)
+        # Agents of a task share one observation space
+        specs = {
+            key: ((num_envs, agent_num, *space.shape), space.dtype)
+            for key, space in observation_space[self.agent_ids[0]].items()
+        }
+        specs['reward'] = ((num_envs, agent_num), np.float64)
+        specs['terminated'] = ((num_envs, agent_num), bool)
+        specs['truncated'] = ((num_envs, agent_num), bool)
+        specs['ended'] = ((num_envs, 2), bool)
+        self._memory = []
+        self._arrays = {}
+        layout = {}
+        for key, (shape, dtype) in specs.items():
+            memory = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+            self._memory.append(memory)
+            self._arrays[key] = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+            layout[key] = (memory.name, shape, np.dtype(dtype))
+        self.obs = {key: self._arrays[key] for key in observation_space[self.agent_ids[0]]}
+        # (M, 2) whether the game of every environment terminated or truncated at the last step
+        self.ended = self._arrays['ended']
+
+        context = mp.get_context(start_method)
+        self._pipes = []
+        self._processes = []
+        for index in range(num_envs):
+            pipe, worker_pipe = context.Pipe()
+            process = context.Process(
+                target=_work,
+                args=(worker_pipe, task_cache, env_kwargs, index, layout, raw_obs),
+                daemon=True,
+            )
+            process.start()
+            worker_pipe.close()
+            self._pipes.append(pipe)
+            self._processes.append(process)
+        self.closed = False
+
+    def reset(self, seed=None, options=None):
+        '''
+        Resets every environment, the m-th one from `seed + m`. Returns the
+        shared observation arrays, and the raw observations and infos of
+        every environment.
+        '''
+        for index, pipe in enumerate(self._pipes):
+            pipe.send(('reset', (None if seed is None else seed + index, options)))
+        raw_obs, infos = self._gather()
+        return self.obs, raw_obs, infos
+
+    def step_async(self, actions):
+        for pipe, action in zip(self._pipes, actions):
+            pipe.send(('step', action))
+
+    def step_wait(self):
+        '''
+        Waits for the steps sent by `step_async`. Returns the shared arrays,
+        where all players of an environment whose game ended are terminated
+        and truncated, and the raw observations and infos of every environment.
+        '''
+        raw_obs, infos = self._gather()
+        ended = self.ended
+        terminated = self._arrays['terminated'] | ended[:, :1]
+        truncated = self._arrays['truncated'] | ended[:, 1:]
+        return self.obs, self._arrays['reward'], terminated, truncated, raw_obs, infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for pipe in self._pipes:
+            pipe.send(('close', None))
+        self._gather()
+        for process in self._processes:
+            process.join()
+        self.obs = self._arrays = {}
+        self.ended = None
+        for memory in self._memory:
+            memory.close()
+            memory.unlink()
+
+    def _gather(self):
+        replies = [pipe.recv() for pipe in self._pipes]
+        for status, reply in replies:
+            if status == 'error':
+                raise RuntimeError(f'Environment worker failed:\n{reply}')
+        if replies[0][1] is None:
+            return None, None
+        raw_obs, infos = zip(*(reply for _, reply in replies))
+        return (list(raw_obs) if self.raw_obs else None), list(infos)
+
+
+def random_actions(action_mask, rng):
+    '''A random valid action id for every (M, P, A) action mask row.'''
+    scores = rng.random(action_mask.shape) * action_mask
+    return scores.argmax(axis=-1)
+
+
+def throughput(config_name, num_envs, steps=100, seed=0):
+    '''Environment steps per second of a pool of `num_envs` workers taking random valid actions.'''
+    pool = ParallelEnvPool(config_name, num_envs)
+    rng = np.random.default_rng(seed)
+    try:
+        obs, *_ = pool.reset(seed=seed)
+        start = time.perf_counter()
+        for _ in range(steps):
+            obs, *_ = pool.step(random_actions(obs['action_mask'], rng))
+        return num_envs * steps / (time.perf_counter() - start)
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--env_dir', type=str, default='./config/main.json', help='environment directory')
+    parser.add_argument('--seed', type=int, default=0, help='environment seed')
+    parser.add_argument('--steps', type=int, default=100, help='number of steps to run')
+    parser.add_argument('--num_envs', type=int, nargs='+', default=[1, 2, 4], help='pool sizes to measure')
+    args = parser.parse_args()
+    base = None
+    for num_envs in args.num_envs:
+        rate = throughput(args.env_dir, num_envs, steps=args.steps, seed=args.seed)
+        base = base or rate / num_envs
+        print(f'{num_envs:>3} envs: {rate:.1f} steps/s, {rate / base:.2f}x one env')
@@ -0,0 +1,86 @@
+import argparse
+import hashlib
+import json
+from collections.abc import Mapping
+from pydoc import locate
+
+import numpy as np
+
+from ..env.environment import Environment
+
+# Live objects handed out with the observations, which are derived from the rest
+LIVE_KEYS = ('social_graph', 'snapshot')
+
+
+def canonical(obs):
+    if isinstance(obs, Mapping):
+        return [[str(k), canonical(v)] for k, v in obs.items() if k not in LIVE_KEYS]
+    if isinstance(obs, (list, tuple)):
+        return [canonical(v) for v in obs]
+    if isinstance(obs, np.ndarray):
+        return [list(obs.shape), obs.dtype.str, hashlib.md5(np.ascontiguousarray(obs).tobytes()).hexdigest()]
+    if isinstance(obs, np.generic):
+        return obs.item()
+    if hasattr(obs, '_id'):
+        return [type(obs).__name__, obs._id]
+    return obs
+
+
+def digest(*items):
+    '''md5 of observations, rewards, ... in their exact order.'''
+    return hashlib.md5(json.dumps(canonical(list(items)), default=repr).encode()).hexdigest()
+
+
+def rollout(config_name, seed, steps, action_seed=0):
+    '''
+    Runs one episode from `reset(seed=seed)`, every agent taking random valid
+    actions drawn from `action_seed`. Returns the digest of every step.
+    '''
+    env = Environment(config_name)
+    env_handler = locate(env.config_loader.task['env_handler'])(config_name)
+    action_rng = np.random.default_rng(action_seed)
+    obs, info = env.reset(seed=seed)
+    env_handler.on_reset(obs, info)
+    digests = [digest(obs)]
+    agent_obs, *_ = env_handler.on_update(obs, {}, {}, {}, info)
+    for _ in range(steps):
+        actions = {
+            name: int(action_rng.choice(np.flatnonzero(agent_obs[name]['action_mask'])))
+            for name in sorted(agent_obs)
+        }
+        obs, rewards, terminateds, truncateds, infos = env.step(env_handler.on_predict(actions))
+        # Rewards are compared by value, whether they come as ints or floats
+        digests.append(digest(obs, {name: float(reward) for name, reward in rewards.items()}, terminateds))
+        agent_obs, *_ = env_handler.on_update(obs, rewards, terminateds, truncateds, infos)
+        if terminateds['__all__']:
+            break
+    return digests
+
+
+def replay_check(config_name, seed=0, steps=100, action_seed=0):
+    '''
+    Runs the same seeded episode twice with the same actions. Returns the
+    first step whose observations differ, or None if the runs are identical.
+    '''
+    first = rollout(config_name, seed, steps, action_seed)
+    second = rollout(config_name, seed, steps, action_seed)
+    for step, (a, b) in enumerate(zip(first, second)):
+        if a != b:
+            return step
+    if len(first) != len(second):
+        return min(len(first), len(second))
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--env_dir', type=str, default='./config/main.json', help='environment directory')
+    parser.add_argument('--seed', type=int, default=0, help='environment seed')
+    parser.add_argument('--steps', type=int, default=100, help='number of steps to replay')
+    args = parser.parse_args()
+    step = replay_check(args.env_dir, seed=args.seed, steps=args.steps)
+    if step is None:
+        print(f'Replay OK: {args.steps} steps reproduced')
+    else:
+        print(f'Replay diverged at step {step}')
+        raise SystemExit(1)
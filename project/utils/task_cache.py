@@ -0,0 +1,21 @@
+from .config_loader import ConfigLoader
+from .game_editor import GameEditor
+
+
+class TaskCache:
+    '''
+    The parsed config of a task and its base map, built once and shared by
+    every environment of the task. Put in the Ray object store, it lets the
+    rollout workers attach to it instead of reading the config files and
+    parsing the map file again; the map arrays are then read from shared
+    memory without a copy.
+    '''
+    def __init__(self, config_name='./config/main.json'):
+        self.config = ConfigLoader(config_name).config
+        self.base_map = GameEditor(config=self.config)._base_map()
+
+    def config_loader(self):
+        return ConfigLoader.from_config(self.config)
+
+    def game_editor(self):
+        return GameEditor(config=self.config, base_map=self.base_map)
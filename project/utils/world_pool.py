@@ -0,0 +1,99 @@
+import pickle
+import threading
+
+import numpy as np
+
+
+class WorldPool:
+    '''
+    Pool of pre-generated games. Every world is generated once by the
+    GameEditor and kept pickled right after construction; `draw` restores a
+    fresh copy, which is much cheaper than generating the world again.
+
+    The i-th world of the pool is generated from the pool's seed and i alone,
+    whichever thread generates it and whenever it does. The environment
+    seeds the pool on every seeded `reset`, and an unseeded pool takes its
+    seed from the generator of the first `draw`, so a seeded environment
+    draws the same worlds every run.
+
+    Without replenishment the pool holds `size` worlds, drawn at random and
+    reused. With `replenish=True` every world is used once, in order, and a
+    background thread generates up to `size` worlds ahead of the draws; a
+    world that is not ready yet, or any world once the pool is closed, is
+    generated by `draw` itself.
+    '''
+    def __init__(self, game_editor, size, replenish=False):
+        self.game_editor = game_editor
+        self.size = size
+        self.replenish = replenish
+        self._seed = None
+        self._worlds = {}
+        # Index of the next world to draw, and of the next one the thread generates
+        self._drawn = 0
+        self._generated = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def seed(self, seed):
+        with self._condition:
+            # Worlds only depend on the seed and their index, so the same seed keeps them
+            if seed != self._seed:
+                self._worlds = {}
+            self._seed = seed
+            self._drawn = self._generated = 0
+            self._condition.notify_all()
+
+    def draw(self, rng):
+        if self._seed is None:
+            self.seed(int(rng.integers(2**63)))
+        if self.replenish:
+            with self._condition:
+                seed, index = self._seed, self._drawn
+                self._drawn += 1
+                blob = self._worlds.pop(index, None)
+                self._condition.notify_all()
+            if self._thread is None and not self._stopped.is_set():
+                self._start()
+            if blob is None:
+                blob = self._generate(seed, index)
+        else:
+            index = int(rng.integers(self.size))
+            blob = self._worlds.get(index)
+            if blob is None:
+                blob = self._worlds[index] = self._generate(self._seed, index)
+        game = pickle.loads(blob)
+        # Copies of the same world must not share their tie-breaks
+        game.rng = rng
+        return game
+
+    def close(self):
+        with self._condition:
+            self._stopped.set()
+            self._condition.notify_all()
+
+    def _generate(self, seed, index):
+        rng = np.random.default_rng([seed, index])
+        return pickle.dumps(self.game_editor.generate_game(rng), protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _fill(self):
+        while True:
+            with self._condition:
+                while not self._stopped.is_set() and len(self._worlds) >= self.size:
+                    self._condition.wait()
+                if self._stopped.is_set():
+                    return
+                index = max(self._generated, self._drawn)
+                while index in self._worlds:
+                    index += 1
+                seed = self._seed
+                self._generated = index + 1
+            blob = self._generate(seed, index)
+            with self._condition:
+                # Worlds of another seed, or drawn in the meantime, are dropped
+                if seed == self._seed and index >= self._drawn:
+                    self._worlds[index] = blob
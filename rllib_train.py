@@ -44,6 +44,18 @@ def parse_args():
 
     #===Env directory===
     parser.add_argument('--env_dir', type=str, default='./config/main.json', help='environment directory')
+    parser.add_argument('--world_pool_size', type=int, default=0,
+                        help='number of pre-generated worlds to reset from (0: generate a world every reset)')
+    parser.add_argument('--replenish_world_pool', action='store_true',
+                        help='use every pooled world once and generate new ones in the background')
+    parser.add_argument('--obs_mode', type=str, default='dict', choices=['dict', 'tensor'],
+                        help='observations as dicts, or as grid tensors built by the game')
+    parser.add_argument('--reuse_buffers', action='store_true',
+                        help='agents fill the same observation arrays every step')
+    parser.add_argument('--vector_env', action='store_true',
+                        help='step the envs of a worker together, sharing their config and stacking their observations')
+    parser.add_argument('--async_step', action='store_true',
+                        help='with --vector_env, step half of the envs in the background while the policies run on the other half')
 
     args = parser.parse_args()
     if args.lstm and args.algo == "Rainbow":
@@ -0,0 +1,35 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    # Config files refer to each other relative to the repository root
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture
+def task_config(tmp_path):
+    '''Path of a main config running `task`, one of config/task/*.json.'''
+    def make(task, **task_overrides):
+        with open(os.path.join(ROOT, 'config', 'main.json')) as f:
+            config = json.load(f)
+        config['task'] = f'./config/task/{task}.json'
+        if task_overrides:
+            with open(os.path.join(ROOT, config['task'])) as f:
+                task_config = json.load(f)
+            task_config.update(task_overrides)
+            config['task'] = str(tmp_path / f'{task}.json')
+            with open(config['task'], 'w') as f:
+                json.dump(task_config, f)
+        path = tmp_path / 'main.json'
+        with open(path, 'w') as f:
+            json.dump(config, f)
+        return str(path)
+    return make
@@ -0,0 +1,37 @@
+import pickle
+
+import numpy as np
+
+from project.agent.mdp.action import Action
+from project.env.batched_game import BatchedGame
+from project.utils.config_loader import ConfigLoader
+from project.utils.game_editor import GameEditor
+
+
+def test_batched_game_steps_like_games(task_config):
+    config = ConfigLoader(task_config('exploration')).config
+    game_editor = GameEditor(config=config)
+    games = [game_editor.generate_game(np.random.default_rng(seed)) for seed in range(3)]
+    batched_game = BatchedGame(
+        [pickle.loads(pickle.dumps(game)) for game in games],
+        resource_config=config['resource'],
+        event_config=config['event'],
+    )
+    physical_actions = Action.physical_actions(batched_game.resource_names)
+    action_rng = np.random.default_rng(0)
+    for step in range(200):
+        # Mostly moves, so that players keep running into each other
+        actions = action_rng.choice(len(physical_actions), size=(len(games), batched_game.player_num))
+        moves = action_rng.random(actions.shape) < 0.7
+        actions[moves] = action_rng.integers(4, size=moves.sum())
+        batched_game.step(actions)
+        for n, game in enumerate(games):
+            game.pre_update()
+            game.update({player.name: physical_actions[a] for player, a in zip(game.players, actions[n].tolist())})
+            game.post_update()
+            positions = np.array([player.position for player in game.players])
+            assert (batched_game.positions[n] == positions).all(), step
+            assert (batched_game.inventories[n] == game.inventories()).all(), step
+            assert (batched_game.resources[n] == game.resource_layer.amounts).all(), step
+            rewards = [player.reward for player in game.players]
+            np.testing.assert_allclose(batched_game.rewards[n], rewards)
@@ -0,0 +1,58 @@
+import numpy as np
+
+from project.env.collision import resolve_collisions
+
+
+def sequential_collisions(origins, targets, moving, priority):
+    # The per-player loop of Game.collision_check that resolve_collisions replaced,
+    # with the highest priority winning a contested cell instead of a shuffle
+    moved = list(moving)
+    blocked_positions = set()
+    collided_position_dict = {}
+
+    def position(player):
+        return targets[player] if moved[player] else origins[player]
+
+    def undo(player):
+        moved[player] = False
+        blocked_positions.add(origins[player])
+        for collided in collided_position_dict.pop(origins[player], []):
+            undo(collided)
+
+    for player in range(len(origins)):
+        pos = position(player)
+        if moved[player]:
+            if pos in blocked_positions:
+                undo(player)
+            else:
+                collided_position_dict.setdefault(pos, []).append(player)
+        else:
+            blocked_positions.add(pos)
+            for collided in collided_position_dict.pop(pos, []):
+                undo(collided)
+    for collided_position in list(collided_position_dict):
+        players = collided_position_dict.get(collided_position)
+        if players:
+            players.sort(key=lambda player: priority[player])
+            collided_position_dict[collided_position] = [players.pop()]
+            for player in players:
+                undo(player)
+    return np.array(moved, dtype=bool)
+
+
+def test_matches_the_sequential_loop_on_random_scenes():
+    rng = np.random.default_rng(0)
+    steps = np.array([(0, 1), (0, -1), (1, 0), (-1, 0)])
+    for _ in range(3000):
+        height, width = rng.integers(2, 6, size=2)
+        num = int(rng.integers(1, height * width + 1))
+        cells = rng.choice(height * width, size=num, replace=False)
+        positions = np.stack((cells // width, cells % width), axis=1)
+        moved = (positions + steps[rng.integers(4, size=num)]) % (height, width)
+        origins = cells
+        targets = moved[:, 0] * width + moved[:, 1]
+        moving = rng.random(num) < 0.7
+        priority = rng.random(num)
+        expected = sequential_collisions(origins, targets, moving, priority)
+        actual = resolve_collisions(origins, targets, moving, priority)
+        assert np.array_equal(actual, expected), (origins, targets, moving, priority)
@@ -0,0 +1,30 @@
+from pydoc import locate
+
+import numpy as np
+
+from project.env.environment import Environment
+
+
+def test_step_results_stay_as_they_were_returned(task_config):
+    config_name = task_config('exploration')
+    env = Environment(config_name)
+    env_handler = locate(env.config_loader.task['env_handler'])(config_name)
+    obs, info = env.reset(seed=0)
+    env_handler.on_reset(obs, info)
+    agent_obs, *_ = env_handler.on_update(obs, {}, {}, {}, info)
+    action_rng = np.random.default_rng(0)
+    returned = []
+    for _ in range(30):
+        actions = {
+            name: int(action_rng.choice(np.flatnonzero(agent_obs[name]['action_mask'])))
+            for name in sorted(agent_obs)
+        }
+        obs, rewards, terminateds, truncateds, infos = env.step(env_handler.on_predict(actions))
+        returned.append(((rewards, dict(rewards)), (terminateds, dict(terminateds))))
+        agent_obs, *_ = env_handler.on_update(obs, rewards, terminateds, truncateds, infos)
+        truncateds['__all__'] = True
+        assert terminateds['__all__'] is False
+    assert any(reward for (_, rewards), _ in returned for reward in rewards.values())
+    for pairs in returned:
+        for values, copy in pairs:
+            assert values == copy
@@ -0,0 +1,72 @@
+import multiprocessing as mp
+from pydoc import locate
+
+import numpy as np
+import pytest
+
+from project.env.environment import Environment
+from project.tasks.llm.llm_env_wrapper import LLMEnvWrapper
+from project.utils.parallel_env_pool import ParallelEnvPool, random_actions
+from project.utils.replay import digest
+
+
+@pytest.mark.parametrize('start_method', ['fork', 'spawn'])
+def test_pool_steps_like_serial_environments(task_config, start_method):
+    if start_method not in mp.get_all_start_methods():
+        pytest.skip(f'{start_method} is not available here')
+    # Short episodes, so that the pool is reset along the way
+    config_name = task_config('contract', max_length=8)
+    pool = ParallelEnvPool(config_name, 2, raw_obs=True, start_method=start_method)
+    envs = [Environment(config_name) for _ in range(2)]
+    env_handlers = [
+        locate(env.config_loader.task['env_handler'])(config_loader=env.config_loader) for env in envs
+    ]
+    rng = np.random.default_rng(0)
+    try:
+        for seed in (5, 9):
+            obs, raw_obs, infos = pool.reset(seed=seed)
+            for m, (env, env_handler) in enumerate(zip(envs, env_handlers)):
+                serial_obs, info = env.reset(seed=seed + m)
+                env_handler.on_reset(serial_obs, info)
+                batch = env_handler.on_update_batch(serial_obs, {}, {}, {}, info)
+                assert digest(raw_obs[m]) == digest(serial_obs)
+                assert infos[m] == info
+                for key in obs:
+                    assert np.array_equal(obs[key][m], batch[0][key]), key
+            for _ in range(8):
+                actions = random_actions(obs['action_mask'], rng)
+                obs, reward, terminated, truncated, raw_obs, infos = pool.step(actions)
+                for m, (env, env_handler) in enumerate(zip(envs, env_handlers)):
+                    step = env.step(env_handler.on_predict_batch(actions[m]))
+                    batch = env_handler.on_update_batch(*step)
+                    assert digest(raw_obs[m]) == digest(step[0])
+                    assert infos[m] == step[4]
+                    for key in obs:
+                        assert np.array_equal(obs[key][m], batch[0][key]), key
+                    assert np.array_equal(reward[m], batch[1])
+                    ended = step[2]['__all__']
+                    assert np.array_equal(terminated[m], batch[2] | ended)
+            assert terminated.all()
+    finally:
+        pool.close()
+    assert all(not process.is_alive() for process in pool._processes)
+
+
+def test_llm_wrapper_plays_several_environments_at_once():
+    env = LLMEnvWrapper(num_envs=2)
+    serial = [Environment('./config/main.json') for _ in range(2)]
+    try:
+        obs, infos = env.reset(seed=3)
+        for m, serial_env in enumerate(serial):
+            serial_obs, info = serial_env.reset(seed=3 + m)
+            assert digest(obs[m]) == digest(serial_obs)
+            assert infos[m] == info
+        actions = [{name: [('move_up', {})] for name in obs[0]}, {}]
+        for _ in range(3):
+            obs, rewards, terminateds, truncateds, infos = env.step(actions)
+            for m, serial_env in enumerate(serial):
+                step = serial_env.step(actions[m])
+                assert digest(obs[m]) == digest(step[0])
+                assert (rewards[m], terminateds[m], truncateds[m], infos[m]) == step[1:]
+    finally:
+        env.close()
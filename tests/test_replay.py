@@ -0,0 +1,26 @@
+import json
+import os
+
+import pytest
+
+from project.utils.replay import replay_check, rollout
+
+# Step digests of `rollout(config, seed=0, steps=30)` for every task, recorded
+# with the dict observations on the tree before the entity classes were
+# slotted. The refactors from there on must keep the game's behaviour, and
+# so these digests.
+with open(os.path.join(os.path.dirname(__file__), 'data', 'rollouts.json')) as f:
+    ROLLOUTS = json.load(f)
+
+
+@pytest.mark.parametrize('task', sorted(ROLLOUTS))
+def test_rollout_matches_the_recorded_digests(task_config, task):
+    digests = rollout(task_config(task), seed=0, steps=30)
+    assert len(digests) == len(ROLLOUTS[task])
+    for step, (actual, expected) in enumerate(zip(digests, ROLLOUTS[task])):
+        assert actual == expected, f'{task} diverged at step {step}'
+
+
+@pytest.mark.parametrize('task', ['contract', 'social_structure_dynamic'])
+def test_seeded_episode_replays(task_config, task):
+    assert replay_check(task_config(task), seed=3, steps=30) is None
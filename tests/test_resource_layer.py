@@ -0,0 +1,39 @@
+import numpy as np
+
+from project.utils.config_loader import ConfigLoader
+from project.utils.game_editor import GameEditor
+
+
+def test_pick_takes_the_top_of_the_stack(task_config):
+    config = ConfigLoader(task_config('exploration')).config
+    game = GameEditor(config=config).generate_game(np.random.default_rng(0))
+    layer = game.resource_layer
+    player = game.players[0]
+    x, y = player.position
+    for name in layer.names_at(player.position):
+        layer.provide(name, player.position, layer.amount(name, player.position))
+    assert player.amount('hammer') == 0
+
+    layer.lay('wood', player.position, 1)
+    layer.lay('stone', player.position, 4)
+    assert layer.stack_at(player.position) == ['stone', 'wood']
+    assert game.resource_dict[player.position].name == 'stone'
+    wood, stone = player.amount('wood'), player.amount('stone')
+    player._act_pick()
+    assert (player.amount('wood'), player.amount('stone')) == (wood, stone + 1)
+    player._act_pick_by_name('wood')
+    player._act_pick()
+    assert (player.amount('wood'), player.amount('stone')) == (wood + 1, stone + 2)
+
+    # Picking by name brings a resource on top, even one the player cannot take
+    layer.lay('wood', player.position, 1)
+    assert layer.stack_at(player.position) == ['wood', 'stone']
+    player._act_pick_by_name('stone')
+    assert layer.stack_at(player.position) == ['stone', 'wood']
+    layer.lay('coal', player.position, 1)
+    player._act_pick_by_name('coal')
+    assert layer.stack_at(player.position) == ['coal', 'stone', 'wood']
+    wood = player.amount('wood')
+    player._act_pick()
+    assert layer.amount('coal', player.position) == 1
+    assert (player.amount('coal'), player.amount('wood')) == (0, wood)
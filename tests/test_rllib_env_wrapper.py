@@ -0,0 +1,24 @@
+from argparse import Namespace
+
+from project.agent import env_handler
+from project.env.environment import Environment
+from project.RLlib.wrapper.rllib_env_wrapper import RllibEnvWrapper, get_spaces_and_model_config
+from project.utils.task_cache import TaskCache
+
+
+def test_spaces_come_from_the_task_cache_alone(task_config, monkeypatch):
+    config_name = task_config('contract')
+    env_config = {'env_dir': config_name, 'task_cache': TaskCache(config_name)}
+    args = Namespace(lstm_state_size=32, select_group=False)
+
+    def no_environment(*args, **kwargs):
+        raise AssertionError('spaces must not build an Environment')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(env_handler, '_task_spaces', {})
+        patch.setattr(Environment, '__init__', no_environment)
+        model_config, observation_space, action_space = get_spaces_and_model_config(env_config, args)
+    env = RllibEnvWrapper(env_config)
+    assert observation_space == env.observation_space
+    assert action_space == env.action_space
+    assert sorted(model_config) == sorted(observation_space)
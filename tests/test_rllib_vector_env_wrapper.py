@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from project.RLlib.wrapper.rllib_env_wrapper import RllibEnvWrapper
+from project.RLlib.wrapper.rllib_vector_env_wrapper import RllibVectorEnvWrapper
+from project.utils.replay import digest
+
+
+def same_obs(a, b):
+    assert a.keys() == b.keys()
+    for env_id in a:
+        for _id in a[env_id]:
+            for key in a[env_id][_id]:
+                assert np.array_equal(a[env_id][_id][key], b[env_id][_id][key]), (env_id, _id, key)
+
+
+@pytest.mark.parametrize('task', ['contract', 'social_structure_dynamic'])
+def test_steps_like_one_wrapper_per_game(task_config, task):
+    # Short episodes, so that games are reset along the way
+    config = {'env_dir': task_config(task, max_length=15)}
+    env = RllibVectorEnvWrapper(config, num_envs=3)
+    singles = [RllibEnvWrapper(config) for _ in range(3)]
+    env.reset(seed=7)
+    # The k-th game of the vector is seeded like a single environment reset from seed + k
+    single_obs = {env_id: single.reset(seed=7 + env_id)[0] for env_id, single in enumerate(singles)}
+    obs, *_ = env.poll()
+    rng = np.random.default_rng(0)
+    for _ in range(40):
+        same_obs(obs, single_obs)
+        actions = {
+            env_id: {_id: int(rng.choice(np.flatnonzero(agent_obs[_id]['action_mask']))) for _id in agent_obs}
+            for env_id, agent_obs in obs.items()
+        }
+        env.send_actions(actions)
+        obs, rewards, terminateds, *_ = env.poll()
+        for env_id, single in enumerate(singles):
+            single_obs[env_id], reward, terminated, *_ = single.step(actions[env_id])
+            assert rewards[env_id] == reward
+            assert terminateds[env_id] == terminated
+            if terminated['__all__']:
+                obs[env_id] = env.try_reset(env_id)[0][env_id]
+                single_obs[env_id] = single.reset()[0]
+
+
+def test_seeded_wrappers_with_a_world_pool_start_alike(task_config):
+    config = {'env_dir': task_config('contract'), 'world_pool_size': 3}
+    first_obs = []
+    for _ in range(2):
+        env = RllibVectorEnvWrapper(config, num_envs=3)
+        # Games wait for the seed instead of generating worlds that would be thrown away
+        assert all(game.episode == -1 for game in env.envs)
+        obs, _ = env.reset(seed=5)
+        first_obs.append(obs)
+        env.stop()
+    same_obs(*first_obs)
+
+
+def test_first_poll_resets_unseeded_games(task_config):
+    env = RllibVectorEnvWrapper({'env_dir': task_config('contract')}, num_envs=2)
+    obs, *_ = env.poll()
+    assert sorted(obs) == [0, 1]
+    assert all(sorted(obs[env_id]) == sorted(env.agent_ids) for env_id in obs)
+
+
+def test_async_wrapper_reports_overlap_since_a_snapshot(task_config):
+    env = RllibVectorEnvWrapper({'env_dir': task_config('contract'), 'async_step': True}, num_envs=2)
+    obs, *_ = env.poll()
+    for _ in range(4):
+        env.send_actions({env_id: {_id: 4 for _id in obs[env_id]} for env_id in obs})
+        obs, *_ = env.poll()
+    since = env.timings()
+    assert env.overlap(since) == 0.0
+    assert 0.0 <= env.overlap() <= 1.0
+    with pytest.raises(RuntimeError):
+        env.step_batch(np.zeros((2, len(env.agent_ids)), dtype=np.int64))
+    env.stop()
+
+
+def play(config, num_envs, steps, reset_pending=(1, 4)):
+    # Trajectory of every game, with actions drawn from the game and its step alone
+    env = RllibVectorEnvWrapper(config, num_envs=num_envs)
+    env.reset(seed=11)
+    trajectories = {env_id: [] for env_id in range(num_envs)}
+    counts = dict.fromkeys(range(num_envs), 0)
+
+    def act(env_id, agent_obs):
+        rng = np.random.default_rng([env_id, counts[env_id]])
+        counts[env_id] += 1
+        env.send_actions({env_id: {
+            _id: int(rng.choice(np.flatnonzero(agent_obs[_id]['action_mask']))) for _id in agent_obs
+        }})
+
+    while min(counts.values()) < steps:
+        obs, rewards, terminateds, truncateds, *_ = env.poll()
+        for env_id in obs:
+            trajectories[env_id].append((digest(obs[env_id]), rewards[env_id], terminateds[env_id], truncateds[env_id]))
+            if terminateds[env_id]['__all__']:
+                obs[env_id] = env.try_reset(env_id)[0][env_id]
+                trajectories[env_id].append(digest(obs[env_id]))
+            if counts[env_id] < steps:
+                act(env_id, obs[env_id])
+            if (env_id, counts[env_id]) == reset_pending:
+                # Reset a game right after its actions were sent, while it may still be stepping
+                obs[env_id] = env.try_reset(env_id)[0][env_id]
+                trajectories[env_id].append(digest(obs[env_id]))
+                act(env_id, obs[env_id])
+    env.stop()
+    return trajectories
+
+
+def test_async_stepping_plays_like_sync_stepping(task_config):
+    # Short episodes, so that games are reset along the way
+    config = {'env_dir': task_config('contract', max_length=6)}
+    sync = play(config, num_envs=4, steps=14)
+    assert sync == play(dict(config, async_step=True), num_envs=4, steps=14)
+    assert all(sum(isinstance(entry, str) for entry in trajectory) >= 2 for trajectory in sync.values())
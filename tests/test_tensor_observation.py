@@ -0,0 +1,45 @@
+from pydoc import locate
+
+import numpy as np
+import pytest
+
+from project.env.environment import Environment
+
+
+def rollout(config_name, obs_mode, seed, steps):
+    '''Grids and inventories of every agent at every step, with random valid actions drawn from `seed`.'''
+    env = Environment(config_name, obs_mode=obs_mode)
+    env_handler = locate(env.config_loader.task['env_handler'])(config_loader=env.config_loader)
+    action_rng = np.random.default_rng(seed)
+    obs, info = env.reset(seed=seed)
+    env_handler.on_reset(obs, info)
+    agent_obs, *_ = env_handler.on_update(obs, {}, {}, {}, info)
+    outputs = []
+    for _ in range(steps):
+        outputs.append({
+            name: (agent_obs[name]['grid_observation'].copy(), agent_obs[name]['inventory'].copy())
+            for name in sorted(agent_obs)
+        })
+        actions = {
+            name: int(action_rng.choice(np.flatnonzero(agent_obs[name]['action_mask'])))
+            for name in sorted(agent_obs)
+        }
+        obs, rewards, terminateds, truncateds, infos = env.step(env_handler.on_predict(actions))
+        agent_obs, *_ = env_handler.on_update(obs, rewards, terminateds, truncateds, infos)
+    return outputs
+
+
+@pytest.mark.parametrize('task, seed', [
+    ('exploration', 0),
+    ('contract', 0),
+    ('social_structure_connection', 4),
+    ('social_structure_dynamic', 1),
+])
+def test_tensor_obs_match_dict_obs(task_config, task, seed):
+    config_name = task_config(task)
+    dict_outputs = rollout(config_name, 'dict', seed, 30)
+    tensor_outputs = rollout(config_name, 'tensor', seed, 30)
+    for step, (expected, actual) in enumerate(zip(dict_outputs, tensor_outputs)):
+        for name in expected:
+            assert np.array_equal(expected[name][0], actual[name][0]), (step, name)
+            assert np.array_equal(expected[name][1], actual[name][1]), (step, name)
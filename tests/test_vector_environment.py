@@ -0,0 +1,21 @@
+import numpy as np
+
+from project.env.vector_environment import VectorEnvironment
+
+
+def test_worlds_derive_from_the_episode_seed_and_their_index(task_config):
+    env = VectorEnvironment(task_config('exploration'), num_envs=3)
+    env.reset(seed=3)
+    episode_seed = int(np.random.default_rng(3).integers(2**63))
+    for index in range(3):
+        game = env.game_editor.generate_game(np.random.default_rng([episode_seed, index]))
+        positions = np.array([player.position for player in game.players])
+        assert (env.batched_game.positions[index] == positions).all()
+        assert (env.batched_game.resources[index] == game.resource_layer.amounts).all()
+    # Worlds of an episode differ, and a seeded reset generates them again
+    positions = env.batched_game.positions.copy()
+    assert not (positions[0] == positions[1]).all()
+    env.reset()
+    assert not (env.batched_game.positions == positions).all()
+    env.reset(seed=3)
+    assert (env.batched_game.positions == positions).all()
@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+from project.env.environment import Environment
+from project.utils.replay import digest
+
+
+def episodes(config_name, resets=4, wait=0.0, close=False, **kwargs):
+    env = Environment(config_name, **kwargs)
+    if close:
+        env.world_pool.close()
+    digests = []
+    for episode in range(resets):
+        obs, _ = env.reset(seed=5 if episode == 0 else None)
+        digests.append(digest(obs))
+        # Gives the replenishing thread time to get ahead of the draws
+        time.sleep(wait)
+    env.world_pool.close()
+    return digests
+
+
+@pytest.mark.parametrize('replenish', [False, True])
+def test_seeded_pool_draws_the_same_worlds(task_config, replenish):
+    config_name = task_config('contract')
+    kwargs = {'world_pool_size': 3, 'replenish_world_pool': replenish}
+    first = episodes(config_name, **kwargs)
+    assert episodes(config_name, wait=0.05, **kwargs) == first
+    if replenish:
+        # A closed pool generates its worlds in `draw` instead of waiting for them
+        assert episodes(config_name, close=True, **kwargs) == first
+
+
+def test_reset_seed_decides_the_worlds(task_config):
+    env = Environment(task_config('contract'), world_pool_size=3)
+    first = [digest(env.reset(seed=seed)[0]) for seed in (1, 2, 1)]
+    assert first[0] == first[2] != first[1]